@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.text import slugify
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from boards.serializers import DEFAULT_SLUG, BoardSerializer, ListSerializer
+from functions.async_db_actions import AsyncDBActions
+from functions.getToken import getTokenFromMiddleware
+from helpers import board_cache, board_versions
+from helpers.board_helpers import (
+  aget_board_by_slug, aget_boards_page, aget_full_boards_data, aiter_boards_json,
+  parse_fields, parse_page_params, wants_stream,
+)
+
+
+# ASGI-native versions of the board views.
+# Reads and writes go through AsyncDBActions so a worker can keep many Supabase requests in flight,
+# and reads that don't depend on each other are made concurrently. Writes use the serializers'
+# asave(), which shares slug allocation and cache invalidation with save().
+# Enabled with ASYNC_BOARD_VIEWS (see boards/urls.py).
+
+
+def _not_modified(etag):
+  response = HttpResponseNotModified()
+  response['ETag'] = etag
+  return response
+
+
+def _json_body(request):
+  try:
+    return json.loads(request.body or b'{}')
+  except ValueError:
+    return {}
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCreateBoardView(View):
+  async def post(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.")
+
+      body = _json_body(request)
+      data = {
+        'name': body.get('name'),
+        'creator_id': user_id
+      }
+
+      serializer = BoardSerializer(data=data)
+      if serializer.is_valid():
+        board = await serializer.asave()
+        return JsonResponse({'message': 'Board created successfully', 'board': board.data}, status=status.HTTP_201_CREATED)
+      return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to create board: {e}")
+
+      return JsonResponse({"message": "Failed to create board"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncGetBoardsView(View):
+  async def get(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.", code=status.HTTP_403_FORBIDDEN)
+
+      # The version counters may live in a shared Django cache: read them off the event loop
+      etag = await sync_to_async(board_versions.user_etag)(user_id, request)
+      if board_versions.not_modified(request, etag):
+        return _not_modified(etag)
+
+      try:
+        page_params = parse_page_params(request.GET)
+      except ValueError:
+        return JsonResponse({"message": "Invalid limit or cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+      try:
+        fields = parse_fields(request.GET)
+      except ValueError:
+        return JsonResponse({"message": "Invalid fields"}, status=status.HTTP_400_BAD_REQUEST)
+
+      if wants_stream(request.GET):
+        first_page = await aget_boards_page(user_id, fields=fields)
+        if not first_page["boards"]:
+          return JsonResponse({"message": first_page["message"]}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(aiter_boards_json(user_id, first_page, fields=fields), content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+      if page_params:
+        data = await aget_boards_page(user_id, *page_params, fields=fields)
+      else:
+        data = await aget_full_boards_data(user_id, fields=fields)
+
+      if not data.get("boards"):
+        return JsonResponse({"message": data["message"]}, status=status.HTTP_400_BAD_REQUEST)
+
+      response = JsonResponse(data, status=status.HTTP_200_OK)
+      response['ETag'] = etag
+      return response
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to get boards: {e}")
+      return JsonResponse({"message": "Failed to get boards"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncGetBoardInfoView(View):
+  async def get(self, request, board_slug: str):
+    db = AsyncDBActions(use_admin=True)
+
+    try:
+      user_id = getTokenFromMiddleware(request)
+
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.")
+
+      etag = None
+      board_id = board_cache.board_id_for_slug(user_id, board_slug)
+      if board_id:
+        etag = await sync_to_async(board_versions.board_etag)(board_id, request)
+        if board_versions.not_modified(request, etag):
+          return _not_modified(etag)
+
+      try:
+        fields = parse_fields(request.GET)
+      except ValueError:
+        return JsonResponse({"message": "Invalid fields"}, status=status.HTTP_400_BAD_REQUEST)
+
+      board = await aget_board_by_slug(db, user_id, board_slug, fields)
+
+      if not board:
+        return JsonResponse({"message": "No board found"}, status=status.HTTP_400_BAD_REQUEST)
+
+      response = JsonResponse(board, status=status.HTTP_200_OK)
+      if etag and str(board['id']) == str(board_id):
+        response['ETag'] = etag
+      return response
+
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to get board: {e}")
+      return JsonResponse({"message": "Failed to get board"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncUpdateBoardView(View):
+  async def put(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+    except AuthenticationFailed as e:
+      return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    body = _json_body(request)
+    updated_board = body.get('updatedBoard') or {}
+    board_id = body.get('boardId')
+
+    # A rename needs the slugs taken under the new name, which doesn't depend on the board: read both at once
+    db = AsyncDBActions(use_admin=True)
+    base_slug = (slugify(updated_board['name']) or DEFAULT_SLUG) if updated_board.get('name') else None
+    reads = [db.get('boards', board_id)]
+    if base_slug:
+      reads.append(BoardSerializer.slug_query(db, base_slug).execute())
+    board, *slugs = await asyncio.gather(*reads)
+
+    if not board.data:
+      return JsonResponse({"message": "Board not found"}, status=status.HTTP_400_BAD_REQUEST)
+
+    for i in board.data:
+      if i['creator_id'] != user_id:
+        return JsonResponse({"message": "You are not authorized to update this board"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    data = {
+      **board.data[0],
+      **updated_board
+    }
+
+    serializer = BoardSerializer(board.data[0], data=data)
+    if serializer.is_valid():
+      board = await serializer.asave(db, slug_lookup=(base_slug, slugs[0]) if slugs else None)
+      return JsonResponse({'message': 'Board updated successfully', 'board': board.data}, status=status.HTTP_200_OK)
+    return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCreateListView(View):
+  async def post(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.")
+
+      body = _json_body(request)
+      data = {
+        'title': body.get('title'),
+        'board_id': body.get('boardId'),
+        'position': body.get('position')
+      }
+
+      serializer = ListSerializer(data=data)
+      if serializer.is_valid():
+        list_obj = await serializer.asave()
+        return JsonResponse({'message': 'List created successfully', 'list': list_obj.data}, status=status.HTTP_201_CREATED)
+      return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to create list: {e}")
+
+      return JsonResponse({"message": "Failed to create list"}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,256 @@
+import json
+import time
+import uuid
+from pathlib import Path
+import jwt
+from django.test import Client
+from functions.db_actions import use_backend
+from functions.fake_supabase import FakeSupabaseClient
+from functions.supabase_client import secret
+from functions.workspace_generator import WorkspaceSpec, generate_workspace
+from helpers import board_cache
+from helpers.board_sync import now_iso
+
+
+# Endpoint benchmarks for the board views.
+# Each workspace size is generated into a FakeSupabaseClient and every endpoint is driven through
+# the Django test client, so the numbers include routing, middleware, serializers and JSON encoding.
+# Round trips per request are deterministic and are the hard regression gate; latencies depend on
+# the machine and are only compared against the baseline when a tolerance is given.
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+
+DEFAULT_SPECS = [
+    WorkspaceSpec(boards=2, lists=3, cards=5, subtasks=2, comments=1),
+    WorkspaceSpec(boards=10, lists=5, cards=10, subtasks=2, comments=1),
+    WorkspaceSpec(boards=40, lists=6, cards=15, subtasks=2, comments=1),
+]
+DEFAULT_ITERATIONS = 10
+
+
+class BenchmarkContext:
+    """
+    What the scenarios need to build their requests: the client, the owner and the generated rows.
+    """
+    def __init__(self, client: Client, backend: FakeSupabaseClient, user_id: str, workspace: dict):
+        self.client = client
+        self.backend = backend
+        self.user_id = user_id
+        self.workspace = workspace
+        self.started_at = now_iso()
+
+    def board(self, iteration: int) -> dict:
+        boards = self.workspace['boards']
+        return boards[iteration % len(boards)]
+
+
+def _get_boards(ctx, iteration):
+    # Cold read: the tree cache is dropped so every request rebuilds it from the backend
+    board_cache.invalidate_user(ctx.user_id)
+    return ctx.client.get('/boards/get-boards/')
+
+
+def _get_boards_cached(ctx, iteration):
+    return ctx.client.get('/boards/get-boards/')
+
+
+def _get_board_info(ctx, iteration):
+    return ctx.client.get(f"/boards/get-board-info/{ctx.board(iteration)['slug']}")
+
+
+def _create_board(ctx, iteration):
+    return ctx.client.post('/boards/create-board/', {'name': 'Benchmark board'}, content_type='application/json')
+
+
+def _update_board(ctx, iteration):
+    payload = {'boardId': ctx.board(iteration)['id'], 'updatedBoard': {'description': f'revision {iteration}'}}
+    return ctx.client.put('/boards/update-board/', payload, content_type='application/json')
+
+
+def _create_list(ctx, iteration):
+    payload = {'title': f'List {iteration}', 'boardId': ctx.board(iteration)['id'], 'position': 1}
+    return ctx.client.post('/boards/add-list/', payload, content_type='application/json')
+
+
+def _batch_onboarding(ctx, iteration):
+    # A new board with five default lists in one request
+    operations = [{'op': 'create-board', 'data': {'name': 'Onboarding'}}] + [
+        {'op': 'add-list', 'data': {'title': title, 'boardId': '$0', 'position': position}}
+        for position, title in enumerate(['Backlog', 'Todo', 'Doing', 'Review', 'Done'], start=1)
+    ]
+    return ctx.client.post('/boards/batch/', {'operations': operations}, content_type='application/json')
+
+
+def _create_card(ctx, iteration):
+    list_item = ctx.workspace['lists'][iteration % len(ctx.workspace['lists'])]
+    payload = {'title': f'Card {iteration}', 'listId': list_item['id']}
+    return ctx.client.post('/boards/add-card/', payload, content_type='application/json')
+
+
+def _move_card(ctx, iteration):
+    # Drag-and-drop: a card dropped between the first two cards of the next list on its board
+    cards = ctx.workspace['cards']
+    card = cards[iteration % len(cards)]
+    board_id = next(list_item['board_id'] for list_item in ctx.workspace['lists'] if list_item['id'] == card['list_id'])
+    lists = [list_item['id'] for list_item in ctx.workspace['lists'] if list_item['board_id'] == board_id]
+    target_id = lists[(lists.index(card['list_id']) + 1) % len(lists)]
+    neighbours = sorted((other for other in cards if other['list_id'] == target_id), key=lambda other: other['rank'])[:2]
+
+    move = {'cardId': card['id'], 'listId': target_id}
+    if len(neighbours) == 2:
+        move.update(prevId=neighbours[0]['id'], nextId=neighbours[1]['id'])
+    response = ctx.client.post('/boards/move-cards/', {'moves': [move]}, content_type='application/json')
+    if response.status_code == 200:
+        card.update(list_id=target_id, rank=response.json()['cards'][0]['rank'])
+    return response
+
+
+def _changes_since(ctx, iteration):
+    return ctx.client.get('/boards/changes-since/', {'since': ctx.started_at})
+
+
+# Scenario name -> request builder; run in this order against the same workspace
+SCENARIOS = {
+    'get-boards': _get_boards,
+    'get-boards-cached': _get_boards_cached,
+    'get-board-info': _get_board_info,
+    'create-board': _create_board,
+    'update-board': _update_board,
+    'create-list': _create_list,
+    'batch-onboarding': _batch_onboarding,
+    'create-card': _create_card,
+    'move-card': _move_card,
+    'changes-since': _changes_since,
+}
+
+
+def percentile(values: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of the values (0 < pct <= 100).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_scenario(ctx: BenchmarkContext, scenario, iterations: int) -> dict:
+    """
+    Sends `iterations` requests for one scenario and summarises them.
+
+    Returns:
+        dict: requests, errors, rps, p50/p95/p99 latency in ms and mean/max round trips per request.
+    """
+    latencies = []
+    round_trips = []
+    errors = 0
+    started = time.perf_counter()
+    for iteration in range(iterations):
+        ctx.backend.reset_calls()
+        request_started = time.perf_counter()
+        response = scenario(ctx, iteration)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        round_trips.append(ctx.backend.round_trips)
+        if response.status_code >= 300:
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': iterations,
+        'errors': errors,
+        'rps': round(iterations / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'round_trips_mean': round(sum(round_trips) / len(round_trips), 2) if round_trips else 0,
+        'round_trips_max': max(round_trips, default=0),
+    }
+
+
+def run_benchmarks(specs: list = None, iterations: int = DEFAULT_ITERATIONS, latency: float = 0.0, scenarios: list = None) -> dict:
+    """
+    Runs every scenario against a fresh synthetic workspace of each size.
+
+    Args:
+        specs (list): WorkspaceSpec sizes to run, smallest first. Defaults to DEFAULT_SPECS.
+        iterations (int): Requests per scenario and size.
+        latency (float): Simulated network latency per round trip, in seconds.
+        scenarios (list): Names from SCENARIOS to run. Defaults to all of them.
+
+    Returns:
+        dict: "<scenario>@<boards>x<lists>x<cards>" -> the run_scenario() summary.
+    """
+    results = {}
+    for spec in specs or DEFAULT_SPECS:
+        backend = FakeSupabaseClient(latency=latency, seed=0, unique={'boards': ['slug']})
+        user_id = str(uuid.uuid4())
+        workspace = generate_workspace(backend, user_id, spec)
+        token = jwt.encode({'sub': user_id, 'exp': int(time.time()) + 3600}, secret, algorithm='HS256')
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+        ctx = BenchmarkContext(client, backend, user_id, workspace)
+
+        with use_backend(backend):
+            # Untimed first request, so imports and lazy setup don't land in the first scenario
+            client.get('/boards/get-boards/')
+            for name in scenarios or SCENARIOS:
+                results[f'{name}@{spec.label}'] = run_scenario(ctx, SCENARIOS[name], iterations)
+        board_cache.invalidate_user(user_id)
+    return results
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> dict:
+    if not Path(path).exists():
+        return {}
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def write_baseline(results: dict, path: Path = BASELINE_PATH):
+    baseline = {
+        key: {'round_trips_max': result['round_trips_max'], 'p95_ms': result['p95_ms']}
+        for key, result in sorted(results.items())
+    }
+    with open(path, 'w') as baseline_file:
+        json.dump(baseline, baseline_file, indent=2)
+        baseline_file.write('\n')
+
+
+def compare_to_baseline(results: dict, baseline: dict, latency_tolerance: float = None) -> list:
+    """
+    Lists the regressions of the results against the stored baseline.
+
+    Any request that needs more round trips than the baseline allows is a regression. With a
+    latency_tolerance (e.g. 0.5 for +50%), a p95 slower than the baseline by more than that is too.
+    Failed requests are always reported.
+
+    Returns:
+        list: Human-readable descriptions, empty when nothing regressed.
+    """
+    regressions = []
+    for key, result in results.items():
+        if result['errors']:
+            regressions.append(f"{key}: {result['errors']}/{result['requests']} requests failed")
+        expected = baseline.get(key)
+        if not expected:
+            continue
+        if result['round_trips_max'] > expected['round_trips_max']:
+            regressions.append(
+                f"{key}: {result['round_trips_max']} round trips per request (baseline {expected['round_trips_max']})"
+            )
+        if latency_tolerance is not None and result['p95_ms'] > expected['p95_ms'] * (1 + latency_tolerance):
+            regressions.append(f"{key}: p95 {result['p95_ms']}ms (baseline {expected['p95_ms']}ms)")
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    """
+    Renders the results as a fixed-width table.
+    """
+    header = f"{'scenario':<32}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'trips':>8}{'max':>6}{'errors':>8}"
+    lines = [header, '-' * len(header)]
+    for key, result in results.items():
+        lines.append(
+            f"{key:<32}{result['rps']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            f"{result['round_trips_mean']:>8}{result['round_trips_max']:>6}{result['errors']:>8}"
+        )
+    return '\n'.join(lines)
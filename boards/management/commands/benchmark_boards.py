@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from boards import benchmarks
+from functions.workspace_generator import WorkspaceSpec
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the board endpoints against synthetic workspaces of growing size and "
+        "compares round trips (and optionally latency) with the stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default=None,
+            help="Comma-separated workspace sizes as BOARDSxLISTSxCARDS, e.g. '5x4x10,50x8x40'.",
+        )
+        parser.add_argument('--subtasks', type=int, default=2, help="Subtasks per card.")
+        parser.add_argument('--comments', type=int, default=1, help="Comments per card.")
+        parser.add_argument('--iterations', type=int, default=benchmarks.DEFAULT_ITERATIONS, help="Requests per scenario and size.")
+        parser.add_argument('--latency', type=float, default=0.0, help="Simulated latency per round trip, in milliseconds.")
+        parser.add_argument('--scenario', action='append', choices=list(benchmarks.SCENARIOS), help="Only run this scenario (repeatable).")
+        parser.add_argument('--latency-tolerance', type=float, default=None, help="Also fail when p95 exceeds the baseline by this fraction, e.g. 0.5.")
+        parser.add_argument('--write-baseline', action='store_true', help="Store these results as the new baseline.")
+
+    def handle(self, *args, **options):
+        specs = None
+        if options['sizes']:
+            try:
+                specs = [
+                    WorkspaceSpec(*(int(part) for part in size.lower().split('x')), options['subtasks'], options['comments'])
+                    for size in options['sizes'].split(',')
+                ]
+            except (TypeError, ValueError):
+                raise CommandError("--sizes must look like '5x4x10,50x8x40'")
+
+        results = benchmarks.run_benchmarks(
+            specs, options['iterations'], options['latency'] / 1000, options['scenario'],
+        )
+        self.stdout.write(benchmarks.format_results(results))
+
+        if options['write_baseline']:
+            benchmarks.write_baseline(results)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {benchmarks.BASELINE_PATH}"))
+            return
+
+        regressions = benchmarks.compare_to_baseline(results, benchmarks.load_baseline(), options['latency_tolerance'])
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -3,6 +3,7 @@ from django.db import models
 from django.utils.text import slugify
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings # For AUTH_USER_MODEL
+from functions.ranking import rank_between, rank_for_index
 
 
 # Board models
@@ -15,6 +16,7 @@ class Board(models.Model):
     favorite = models.BooleanField(default=False)
     color = models.CharField(max_length=25, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -39,30 +41,34 @@ class List(models.Model):
     board = models.ForeignKey(Board, on_delete=models.CASCADE)
     title = models.CharField(max_length=20, null=False, blank=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     position = models.IntegerField(default=0)
+    # Fractional sort key (functions/ranking.py); moving a list only rewrites its own rank
+    rank = models.CharField(max_length=64, blank=True, default='', db_index=True)
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if self.pk is None:
-            # New list, add it to the end
-            max_position = List.objects.filter(board=self.board).aggregate(models.Max('position'))['position__max']
-            self.position = (max_position or 0) + 1
+        siblings = List.objects.filter(board=self.board).exclude(pk=self.pk).order_by('rank', 'position')
+        if self._state.adding:
+            # New list, add it to the end unless it already has a rank
+            if not self.rank:
+                last = siblings.last()
+                self.rank = rank_between(last.rank if last else None, None)
+                self.position = siblings.count() + 1
         else:
-            # Existing list, update positions if necessary
-            old_position = List.objects.get(pk=self.pk).position
-            if old_position != self.position:
-                if old_position < self.position:
-                    List.objects.filter(board=self.board, position__gt=old_position, position__lte=self.position).update(position=models.F('position') - 1)
-                else:
-                    List.objects.filter(board=self.board, position__lt=old_position, position__gte=self.position).update(position=models.F('position') + 1)
+            # Existing list, give it a rank between its new neighbours if it moved
+            old_position = List.objects.filter(pk=self.pk).values_list('position', flat=True).first()
+            if old_position != self.position or not self.rank:
+                ranks = [rank for rank in siblings.values_list('rank', flat=True) if rank]
+                self.rank = rank_for_index(ranks, self.position - 1)
         super().save(*args, **kwargs)
 
     class Meta:
         db_table = 'lists'
-        ordering = ['position']
+        ordering = ['rank', 'position']
 
 
 class Card(models.Model):
@@ -76,12 +82,40 @@ class Card(models.Model):
 
     due_date = models.DateTimeField(auto_now_add=False, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Fractional sort key within the list (functions/ranking.py); moving a card only rewrites its own row
+    rank = models.CharField(max_length=64, blank=True, default='', db_index=True)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.rank:
+            # New card, add it to the end of its list
+            last = Card.objects.filter(list=self.list).exclude(rank='').order_by('rank').last()
+            self.rank = rank_between(last.rank if last else None, None)
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'cards'
+        ordering = ['rank', 'created_at']
+        indexes = [models.Index(fields=['list', 'rank'])]
+
+
+class Tombstone(models.Model):
+    # Left behind when a board, list or card is deleted, so delta syncs (changes-since) can report it
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    table_name = models.CharField(max_length=20)
+    record_id = models.UUIDField()
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    board_id = models.UUIDField(blank=True, null=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.table_name}:{self.record_id}"
+
+    class Meta:
+        db_table = 'tombstones'
 
 
 class Subtask(models.Model):
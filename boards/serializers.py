@@ -1,9 +1,33 @@
 from rest_framework import serializers
 from django.db import models
 from django.utils.text import slugify
+from asgiref.sync import sync_to_async
+from functions.async_db_actions import AsyncDBActions
 from functions.db_actions import DBActions
+from functions.ranking import needs_rebalance, rank_for_index
+from helpers import board_cache
+from helpers.board_helpers import board_changed, rebalance_card_ranks, rebalance_list_ranks, sort_by_rank
+from helpers.board_sync import stamp
+from helpers.card_helpers import rank_for_new_card
 from .models import Board, List
+import asyncio
+import re
+import threading
 import uuid
+from postgrest.exceptions import APIError
+
+
+# Postgres error code raised when a unique constraint (e.g. boards.slug) is violated
+UNIQUE_VIOLATION = '23505'
+SLUG_ALLOCATION_ATTEMPTS = 5
+# Most slugs read to find a free suffix; past that (or after losing a race) a random suffix is used
+SLUG_LOOKUP_LIMIT = 100
+# Base of the slug of a board whose name has no sluggable characters (e.g. only emoji)
+DEFAULT_SLUG = 'board'
+
+
+def _slug_pattern(base_slug):
+    return re.compile(rf"^{re.escape(base_slug)}(?:-(\d+))?$")
 
 
 # board serializers
@@ -15,6 +39,7 @@ class BoardSerializer(serializers.Serializer):
     creator_id = serializers.UUIDField(required=True)
     description = serializers.CharField(required=False, default='', allow_blank=True)
     created_at = serializers.DateTimeField(read_only=True)
+    updated_at = serializers.DateTimeField(read_only=True)
     favorite = serializers.BooleanField(default=False)
     color = serializers.CharField(required=False, default='', allow_blank=True)
     image = serializers.CharField(required=False, default='', allow_blank=True)
@@ -22,53 +47,193 @@ class BoardSerializer(serializers.Serializer):
     def save(self, **kwargs):
         db = DBActions(use_admin=True)
         board_id = self.initial_data.get('id') 
-        validated_data = self.validated_data
-        base_slug = slugify(validated_data['name'])
-        validated_data['slug'] = self.get_unique_slug(db, base_slug, board_id)
-        validated_data['creator_id'] = str(validated_data['creator_id'])  # Ensure creator_id is JSON Serializable
+        validated_data, base_slug = self._prepare()
         # add_to_board = db.get('boards', board_id)
         
+        # Rely on the unique constraint on slug: if another request took the slug
+        # between allocation and write, allocate again without it
+        rejected = set()
+        for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+            validated_data['slug'] = self.get_unique_slug(db, base_slug, board_id, exclude=rejected)
+            try:
+                response = self._write(db, validated_data, board_id)
+                break
+            except APIError as e:
+                self._reject_slug(e, attempt, rejected, validated_data['slug'])
+
+        return self._saved(response, board_id)
+    
+    async def asave(self, db=None, slug_lookup=None):
+        """
+        Async counterpart of save() for the ASGI views, writing through AsyncDBActions.
+        
+        Args:
+            db: AsyncDBActions instance
+            slug_lookup (tuple, optional): (base slug, response of slug_query()) when the caller already
+                read the slugs, e.g. concurrently with the board being renamed; used if the base matches
+        """
+        db = db or AsyncDBActions(use_admin=True)
+        board_id = self.initial_data.get('id') 
+        validated_data, base_slug = self._prepare()
+        
+        rejected = set()
+        for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+            response = slug_lookup[1] if slug_lookup and slug_lookup[0] == base_slug and not rejected else None
+            validated_data['slug'] = await self.aget_unique_slug(db, base_slug, board_id, exclude=rejected, response=response)
+            try:
+                response = await self._write(db, validated_data, board_id)
+                break
+            except APIError as e:
+                self._reject_slug(e, attempt, rejected, validated_data['slug'])
+
+        # Cache invalidation may go to a shared Django cache, so it runs off the event loop
+        return await sync_to_async(self._saved)(response, board_id)
+    
+    def _prepare(self):
+        # The row to write (without its slug) and the base of its slug
+        validated_data = self.validated_data
+        validated_data['creator_id'] = str(validated_data['creator_id'])  # Ensure creator_id is JSON Serializable
+        stamp(validated_data)
+        return validated_data, slugify(validated_data['name']) or DEFAULT_SLUG
+    
+    @staticmethod
+    def _write(db, validated_data, board_id):
+        # The update or insert of the board (a coroutine for AsyncDBActions)
         if board_id:
             return db.update('boards', validated_data, board_id)
-        else:
-            return db.create("boards", validated_data)
+        return db.create("boards", validated_data)
+    
+    @staticmethod
+    def _reject_slug(error, attempt, rejected, slug):
+        # Re-raises the write error unless the slug lost a race and there is an attempt left
+        if error.code != UNIQUE_VIOLATION or attempt == SLUG_ALLOCATION_ATTEMPTS - 1:
+            raise error
+        rejected.add(slug)
     
-    def get_unique_slug(self, db, base_slug, board_id=None):
+    def _saved(self, response, board_id):
+        # Invalidates the owner's cached boards and moves the slug index to the saved slug
+        validated_data = self.validated_data
+        saved_id = response.data[0]['id'] if response and response.data else board_id
+        board_changed(saved_id, validated_data['creator_id'])
+        previous_slug = self.instance.get('slug') if isinstance(self.instance, dict) else None
+        if previous_slug and previous_slug != validated_data['slug']:
+            board_cache.forget_slug(validated_data['creator_id'], previous_slug)
+        if saved_id:
+            board_cache.remember_slug(validated_data['creator_id'], validated_data['slug'], saved_id)
+        return response
+    
+    def get_unique_slug(self, db, base_slug, board_id=None, exclude=()):
         """
-        Generate a unique slug by checking for conflicts in the database.
-        If a conflict is found, appends a number to make it unique.
+        Generate a unique slug from the slugs already taken in the database.
+        If a conflict is found, appends the lowest free number to make it unique
+        (e.g. `my-board`, `my-board-1`, `my-board-2`).
+        
+        Only `base_slug` and `base_slug-*` are read, at most SLUG_LOOKUP_LIMIT of them in one query,
+        and the suffix is picked in memory. When more are taken, or a slug just lost a race to a
+        concurrent save (`exclude`), a random suffix is used instead so the next write doesn't
+        collide again. When updating a board whose current slug already derives from the base,
+        it is kept without querying.
         
         Args:
             db: DBActions instance
-            base_slug (str): The base slug to check
+            base_slug (str): The base slug to check; DEFAULT_SLUG when empty
             board_id (str, optional): The current board ID (to exclude from uniqueness check during updates)
+            exclude (iterable, optional): Slugs to treat as taken (e.g. ones that just lost a race)
         
         Returns:
             str: A unique slug that doesn't exist in the database
         """
-        slug = base_slug
-        counter = 1
+        base_slug = base_slug or DEFAULT_SLUG
+        slug = self._slug_without_lookup(base_slug, board_id, exclude)
+        if slug:
+            return slug
+        return self._free_slug(self.slug_query(db, base_slug).execute(), base_slug, board_id)
+    
+    async def aget_unique_slug(self, db, base_slug, board_id=None, exclude=(), response=None):
+        """
+        Async counterpart of get_unique_slug; `response` is an earlier result of slug_query() to use
+        instead of querying.
+        """
+        base_slug = base_slug or DEFAULT_SLUG
+        slug = self._slug_without_lookup(base_slug, board_id, exclude)
+        if slug:
+            return slug
+        if response is None:
+            response = await self.slug_query(db, base_slug).execute()
+        return self._free_slug(response, base_slug, board_id)
+    
+    @staticmethod
+    def slug_query(db, base_slug):
+        # The slugs that could collide with base_slug and its numbered variants (DBActions or AsyncDBActions)
+        return (
+            db.query('boards')
+            .select('id', 'slug')
+            .or_(f"slug.eq.{base_slug},slug.like.{base_slug}-%")
+            .order('slug')
+            .limit(SLUG_LOOKUP_LIMIT)
+        )
+    
+    def _slug_without_lookup(self, base_slug, board_id, exclude):
+        # The board's current slug when it still fits the base, a random one after a lost race, else None
+        pattern = _slug_pattern(base_slug)
+        current_slug = self.instance.get('slug') if board_id and isinstance(self.instance, dict) else None
+        if current_slug and pattern.match(current_slug) and current_slug not in exclude:
+            return current_slug
+        if exclude:
+            return f"{base_slug}-{uuid.uuid4().hex[:8]}"
+        return None
+    
+    @staticmethod
+    def _free_slug(response, base_slug, board_id):
+        pattern = _slug_pattern(base_slug)
+        rows = response.data if response and response.data else []
+        
+        taken = set()
+        for row in rows:
+            match = pattern.match(row['slug'] or '')
+            if not match:
+                continue
+            # If updating and the existing slug is the current board's slug, it's OK
+            if board_id and str(row['id']) == str(board_id):
+                return row['slug']
+            taken.add(int(match.group(1) or 0))
         
-        while True:
-            # Check if slug already exists
-            response = db.get_by_field('boards', 'slug', slug)
-            
-            if response and response.data:
-                # If updating and the existing slug is the current board's slug, it's OK
-                if board_id and len(response.data) == 1 and response.data[0]['id'] == board_id:
-                    return slug
-                # Otherwise, generate a new slug with counter
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            else:
-                # Slug doesn't exist, we can use it
-                return slug
+        if 0 not in taken:
+            return base_slug
+        if len(rows) >= SLUG_LOOKUP_LIMIT:
+            # Some taken suffixes weren't read
+            return f"{base_slug}-{uuid.uuid4().hex[:8]}"
+        counter = 1
+        while counter in taken:
+            counter += 1
+        return f"{base_slug}-{counter}"
 
     class Meta:
-        fields = ['id', 'slug', 'name', 'creator_id', 'description', 'created_at', 'favorite', 'color']
-        read_only_fields = ['slug', 'created_at']
+        fields = ['id', 'slug', 'name', 'creator_id', 'description', 'created_at', 'updated_at', 'favorite', 'color']
+        read_only_fields = ['slug', 'created_at', 'updated_at']
+
+
+
+# The board's other lists in rank order, and whether the list already sits at the position with a rank
+def _list_slot(response, list_id, position):
+    lists = sort_by_rank(response.data if response and response.data else [])
+    current_index = next((index for index, list_item in enumerate(lists) if str(list_item['id']) == str(list_id)), None)
+    keep = current_index is not None and current_index == position - 1 and bool(lists[current_index].get('rank'))
+    return [list_item for index, list_item in enumerate(lists) if index != current_index], keep
 
 
+# Boards created before ranks existed have unranked lists, which get ranks once (rebalance_list_ranks)
+def _needs_ranks(others):
+    return any(not list_item.get('rank') for list_item in others)
+
+
+# The rank that puts the list at the 1-based position among the others; `ranked` are the board's
+# lists as rebalance_list_ranks returned them, when the others needed ranks first
+def _rank_at(others, list_id, position, ranked=None):
+    if ranked is not None:
+        others = [list_item for list_item in ranked if str(list_item['id']) != str(list_id)]
+    return rank_for_index([list_item['rank'] for list_item in others], position - 1)
+
 
 # List Serializers
 class ListSerializer(serializers.Serializer):
@@ -76,75 +241,139 @@ class ListSerializer(serializers.Serializer):
     board_id = serializers.UUIDField(required=True)
     title = serializers.CharField(required=True)
     position = serializers.IntegerField(required=True)
+    rank = serializers.CharField(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
+    updated_at = serializers.DateTimeField(read_only=True)
     
     def save(self, **kwargs):
         db = DBActions(use_admin=True)
         list_id = self.initial_data.get('id') 
+        validated_data = self._prepare()
+        
+        # Place the list with a fractional rank so only this row is written (see functions/ranking.py)
+        rank = self._rank_for_position(db, validated_data['board_id'], list_id, validated_data['position'])
+        response = self._write(db, self._placed(validated_data, rank), list_id)
+        self._saved(rank, db=db)
+        return response
+    
+    async def asave(self, db=None):
+        """
+        Async counterpart of save() for the ASGI views, writing through AsyncDBActions.
+        The board's lists and, when it isn't cached, the board's owner are read concurrently.
+        """
+        db = db or AsyncDBActions(use_admin=True)
+        list_id = self.initial_data.get('id') 
+        validated_data = self._prepare()
+        board_id = validated_data['board_id']
+        
+        owner = board_cache.board_owner(board_id)
+        reads = [db.get_many('lists', 'board_id', board_id)]
+        if owner is None:
+            reads.append(db.get('boards', board_id))
+        lists, *board = await asyncio.gather(*reads)
+        if board and board[0] and board[0].data:
+            owner = str(board[0].data[0]['creator_id'])
+            board_cache.remember_owner(board_id, owner)
+        
+        others, keep = _list_slot(lists, list_id, validated_data['position'])
+        rank = None
+        if not keep:
+            ranked = await sync_to_async(rebalance_list_ranks, thread_sensitive=False)(board_id) if _needs_ranks(others) else None
+            rank = _rank_at(others, list_id, validated_data['position'], ranked)
+
+        response = await self._write(db, self._placed(validated_data, rank), list_id)
+        # Cache invalidation may go to a shared Django cache, so it runs off the event loop
+        await sync_to_async(self._saved)(rank, owner)
+        return response
+    
+    def _prepare(self):
         validated_data = self.validated_data
         validated_data['board_id'] = str(validated_data['board_id'])  # Ensure board_id is JSON Serializable
-        
+        return validated_data
+    
+    @staticmethod
+    def _placed(validated_data, rank):
+        if rank:
+            validated_data['rank'] = rank
+        return stamp(validated_data)
+    
+    @staticmethod
+    def _write(db, validated_data, list_id):
+        # The update or insert of the list (a coroutine for AsyncDBActions)
         if list_id:
-            # Handle position change repositioning
-            old_list = db.get('lists', str(list_id))
-            if old_list and old_list.data:
-                old_position = old_list.data[0].get('position')
-                new_position = validated_data.get('position')
-                
-                if old_position != new_position:
-                    self._reposition_lists(db, validated_data['board_id'], old_position, new_position)
-            
             return db.update('lists', validated_data, str(list_id))
-        else:
-            return db.create("lists", validated_data)
+        return db.create("lists", validated_data)
     
-    def _reposition_lists(self, db, board_id, old_position, new_position):
+    def _saved(self, rank, owner=None, db=None):
+        board_id = self.validated_data['board_id']
+        if rank and needs_rebalance(rank):
+            threading.Thread(target=rebalance_list_ranks, args=(board_id,), daemon=True).start()
+        board_changed(board_id, owner, db=db)
+    
+    def _rank_for_position(self, db, board_id, list_id, position):
         """
-        Automatically reposition all lists when a list's position changes.
+        Compute the rank that puts the list at the given position of its board.
         
-        Example: If list moves from position 4 to position 2:
-        - Position 2 becomes 3
-        - Position 3 becomes 4
+        Example: If list moves from position 4 to position 2, it gets a rank between
+        the ranks of the lists currently at positions 1 and 2; no other list is rewritten.
         
         Args:
             db: DBActions instance
             board_id (str): The board ID
-            old_position (int): The old position of the list
-            new_position (int): The new position of the list
+            list_id (str, optional): The ID of the list being moved, None for a new list
+            position (int): The 1-based target position
+        
+        Returns:
+            str or None: The new rank, or None when the list keeps its current slot.
+        """
+        others, keep = _list_slot(db.get_many('lists', 'board_id', str(board_id)), list_id, position)
+        if keep:
+            return None
+        ranked = rebalance_list_ranks(board_id, db) if _needs_ranks(others) else None
+        return _rank_at(others, list_id, position, ranked)
+
+    class Meta:
+        fields = ['id', 'board_id', 'title', 'position', 'rank', 'created_at', 'updated_at']
+        read_only_fields = ['rank', 'created_at', 'updated_at']
+
+
+# Card Serializers
+class CardSerializer(serializers.Serializer):
+    id = serializers.UUIDField(read_only=True)
+    list_id = serializers.UUIDField(required=True)
+    title = serializers.CharField(required=True, max_length=30)
+    description = serializers.CharField(required=False, default='', allow_blank=True, max_length=200)
+    image_url = serializers.CharField(required=False, default=None, allow_null=True)
+    priority = serializers.ChoiceField(choices=['High', 'Medium', 'Low'], required=False, default='', allow_blank=True)
+    due_date = serializers.DateTimeField(required=False, default=None, allow_null=True)
+    rank = serializers.CharField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    updated_at = serializers.DateTimeField(read_only=True)
+
+    def save(self, board_id=None, prev_id=None, next_id=None, position=None, **kwargs):
         """
-        # Get all lists in this board
-        response = db.get_many('lists', 'board_id', str(board_id))
-        
-        if not response or not response.data:
-            return
-        
-        lists = response.data
-        updates = []
-        
-        # If moving to a lower position (e.g., 4 to 2), shift others down
-        if new_position < old_position:
-            for list_item in lists:
-                pos = list_item['position']
-                if new_position <= pos < old_position:
-                    updates.append({
-                        'id': list_item['id'],
-                        'position': pos + 1
-                    })
-        
-        # If moving to a higher position (e.g., 2 to 4), shift others up
-        elif new_position > old_position:
-            for list_item in lists:
-                pos = list_item['position']
-                if old_position < pos <= new_position:
-                    updates.append({
-                        'id': list_item['id'],
-                        'position': pos - 1
-                    })
-        
-        # Batch update all affected lists in one call
-        if updates:
-            db.batch_update('lists', updates)
+        Creates the card at the given place of its list (see helpers/card_helpers.py): between the cards
+        `prev_id` and `next_id`, at the 1-based `position`, or at the end. Only the new row is written.
+        
+        Args:
+            board_id (str): The board of the list, already checked to belong to the user
+        """
+        db = DBActions(use_admin=True)
+        validated_data = self.validated_data
+        validated_data['list_id'] = str(validated_data['list_id'])  # Ensure list_id is JSON Serializable
+        if validated_data.get('due_date'):
+            validated_data['due_date'] = validated_data['due_date'].isoformat()
+        
+        validated_data['rank'] = rank_for_new_card(db, validated_data['list_id'], board_id, prev_id, next_id, position)
+        stamp(validated_data)
+        response = db.create('cards', validated_data)
+        
+        if needs_rebalance(validated_data['rank']):
+            threading.Thread(target=rebalance_card_ranks, args=(validated_data['list_id'], board_id), daemon=True).start()
+        
+        board_changed(board_id, db=db)
+        return response
 
     class Meta:
-        fields = ['id', 'board_id', 'title', 'position', 'created_at']
-        read_only_fields = ['created_at']
\ No newline at end of file
+        fields = ['id', 'list_id', 'title', 'description', 'image_url', 'priority', 'due_date', 'rank', 'created_at', 'updated_at']
+        read_only_fields = ['rank', 'created_at', 'updated_at']
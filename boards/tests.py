@@ -1,3 +1,937 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase
+from boards import async_views, benchmarks, views
+from boards.serializers import SLUG_LOOKUP_LIMIT, BoardSerializer, ListSerializer
+from functions import ranking
+from functions.async_db_actions import AsyncDBActions
+from functions.db_actions import DBActions, use_backend
+from functions.single_flight import AsyncSingleFlight, SingleFlight
+from functions.fake_supabase import FakeSupabaseClient
+from functions.workspace_generator import WorkspaceSpec, generate_workspace
+from helpers import board_batch, board_cache, board_helpers, board_sync, card_helpers
 
-# Create your tests here.
+
+class WorkspaceGeneratorTests(SimpleTestCase):
+    def test_generates_every_level(self):
+        backend = FakeSupabaseClient()
+        spec = WorkspaceSpec(boards=3, lists=2, cards=4, subtasks=2, comments=1)
+        rows = generate_workspace(backend, 'user-1', spec)
+
+        self.assertEqual(len(rows['boards']), 3)
+        self.assertEqual(len(rows['lists']), 6)
+        self.assertEqual(len(rows['cards']), 24)
+        self.assertEqual(len(rows['subtasks']), 48)
+        self.assertEqual(len(rows['comments']), 24)
+        self.assertEqual(sum(len(table) for table in backend.tables.values()), spec.total_rows)
+        self.assertEqual(len({board['slug'] for board in rows['boards']}), 3)
+
+    def test_is_deterministic(self):
+        spec = WorkspaceSpec(boards=2, lists=2, cards=2)
+        first = generate_workspace(FakeSupabaseClient(), 'user-1', spec, seed=7)
+        second = generate_workspace(FakeSupabaseClient(), 'user-1', spec, seed=7)
+        self.assertEqual(first, second)
+
+
+class BoardTreeTests(SimpleTestCase):
+    def test_reads_page_past_the_response_cap(self):
+        # 2 x 3 x 200 = 12000 cards, more than one response holds
+        backend = FakeSupabaseClient()
+        generate_workspace(backend, 'user-paging', WorkspaceSpec(boards=2, lists=3, cards=200))
+        with use_backend(backend):
+            tree = board_helpers.get_full_boards_data('user-paging', use_cache=False)
+            changes = board_sync.get_changes_since('user-paging')
+
+        cards = [card for board in tree['boards'] for list_item in board['lists'] for card in list_item['cards']]
+        self.assertEqual(len(cards), 1200)
+        self.assertEqual(len({card['id'] for card in cards}), 1200)
+        self.assertEqual(len(changes['cards']), 1200)
+
+    def test_tree_loaded_across_a_write_is_not_cached(self):
+        backend = FakeSupabaseClient()
+        generate_workspace(backend, 'user-race', WorkspaceSpec(boards=1, lists=1, cards=1))
+        table = backend.table
+
+        def table_with_write(name):
+            if name == 'lists':
+                # A write lands between the boards read and the lists read
+                board_helpers.board_changed(user_id='user-race')
+            return table(name)
+
+        with use_backend(backend):
+            backend.table = table_with_write
+            board_helpers.get_full_boards_data('user-race')
+            self.assertIsNone(board_cache.get_boards('user-race'))
+
+            backend.table = table
+            board_helpers.get_full_boards_data('user-race')
+            self.assertIsNotNone(board_cache.get_boards('user-race'))
+
+    def test_cache_hits_share_the_tree_without_a_round_trip(self):
+        backend = FakeSupabaseClient()
+        generate_workspace(backend, 'user-hits', WorkspaceSpec(boards=2, lists=2, cards=2))
+        with use_backend(backend):
+            board_helpers.board_changed(user_id='user-hits')
+            first = board_helpers.get_full_boards_data('user-hits')
+            backend.reset_calls()
+            second = board_helpers.get_full_boards_data('user-hits')
+
+        self.assertIs(second, first)
+        self.assertEqual(backend.round_trips, 0)
+
+
+class GetInTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient()
+        generate_workspace(self.backend, 'user-in', WorkspaceSpec(boards=1, lists=2, cards=1))
+
+    def test_no_values_match_nothing_without_a_round_trip(self):
+        with use_backend(self.backend):
+            response = DBActions(use_admin=True).get_in('lists', 'board_id', [])
+            async_response = asyncio.run(AsyncDBActions(use_admin=True).get_in('lists', 'board_id', iter([])))
+
+        self.assertEqual(response.data, [])
+        self.assertEqual(async_response.data, [])
+        self.assertEqual(self.backend.round_trips, 0)
+
+    def test_failed_chunk_gives_no_response(self):
+        board_id = self.backend.tables['boards'][0]['id']
+        self.backend._execute = lambda query: None
+        with use_backend(self.backend):
+            self.assertIsNone(DBActions(use_admin=True).get_in('lists', 'board_id', [board_id]))
+            self.assertIsNone(asyncio.run(AsyncDBActions(use_admin=True).get_in('lists', 'board_id', [board_id])))
+
+
+class QueryTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient(max_rows=10)
+        self.backend.seed('tasks', [
+            {'id': f'task-{index:02d}', 'title': f'Task {index}', 'points': index % 5, 'due': None if index % 3 else f'2026-10-{index + 1:02d}'}
+            for index in range(25)
+        ])
+
+    def query(self):
+        return DBActions(use_admin=True).query('tasks')
+
+    def test_filters_order_and_limit_run_as_one_request(self):
+        with use_backend(self.backend):
+            response = self.query().select('id', 'points').between('points', 1, 3).like('title', 'Task 1%').order('points', desc=True).order('id').limit(4).execute()
+
+        self.assertEqual(response.data, [
+            {'id': 'task-13', 'points': 3},
+            {'id': 'task-18', 'points': 3},
+            {'id': 'task-12', 'points': 2},
+            {'id': 'task-17', 'points': 2},
+        ])
+        self.assertEqual(self.backend.round_trips, 1)
+
+    def test_null_checks_and_or(self):
+        with use_backend(self.backend):
+            due = self.query().select('id').not_null('due').execute()
+            undated = self.query().select('id').is_null('due').or_('points.eq.0,id.eq.task-01').execute()
+
+        self.assertEqual([row['id'] for row in due.data], [f'task-{index:02d}' for index in range(0, 25, 3)])
+        self.assertEqual({row['id'] for row in undated.data}, {'task-01', 'task-05', 'task-10', 'task-20'})
+
+    def test_first_and_count(self):
+        with use_backend(self.backend):
+            first = self.query().eq('points', 4).order('id', desc=True).first()
+            missing = self.query().eq('id', 'task-99').first()
+            counted = self.query().select('id').eq('points', 0).count().limit(2).execute()
+
+        self.assertEqual(first['id'], 'task-24')
+        self.assertIsNone(missing)
+        self.assertEqual(len(counted.data), 2)
+        self.assertEqual(counted.count, 5)
+
+    def test_all_pages_past_the_response_cap(self):
+        with use_backend(self.backend):
+            response = self.query().select('id').all(page_size=10)
+
+        self.assertEqual([row['id'] for row in response.data], [f'task-{index:02d}' for index in range(25)])
+        self.assertEqual(self.backend.round_trips, 3)
+
+    def test_async_query_matches(self):
+        with use_backend(self.backend):
+            sync_rows = self.query().select('id').gte('points', 3).order('id').execute().data
+            async_rows = asyncio.run(AsyncDBActions(use_admin=True).query('tasks').select('id').gte('points', 3).order('id').execute()).data
+
+        self.assertEqual(async_rows, sync_rows)
+
+
+class FieldSelectionTests(SimpleTestCase):
+    def test_parses_columns_per_level(self):
+        fields = board_helpers.parse_fields({'fields': 'name, lists.title,cards.title,cards.due'})
+
+        self.assertEqual(fields, {
+            'boards': 'id,created_at,slug,creator_id,name',
+            'lists': 'id,board_id,rank,position,title',
+            'cards': 'id,list_id,title,due',
+        })
+        self.assertEqual(board_helpers.columns_for(fields, 'lists'), 'id,board_id,rank,position,title')
+
+    def test_unmentioned_and_star_levels_keep_every_column(self):
+        fields = board_helpers.parse_fields({'fields': 'name,lists.*'})
+
+        self.assertEqual(board_helpers.columns_for(fields, 'lists'), '*')
+        self.assertEqual(board_helpers.columns_for(fields, 'cards'), '*')
+        self.assertIsNone(board_helpers.parse_fields({}))
+        self.assertEqual(board_helpers.columns_for(None, 'boards'), '*')
+
+    def test_rejects_unknown_levels_and_column_names(self):
+        for raw in ('subtasks.title', 'name;drop', 'lists.Title', 'cards.'):
+            with self.assertRaises(ValueError, msg=raw):
+                board_helpers.parse_fields({'fields': raw})
+
+    def test_projected_tree_selects_only_the_fields(self):
+        backend = FakeSupabaseClient()
+        user_id = str(uuid.uuid4())
+        generate_workspace(backend, user_id, WorkspaceSpec(boards=2, lists=2, cards=2))
+        fields = board_helpers.parse_fields({'fields': 'name,lists.title,cards.title'})
+        with use_backend(backend):
+            tree = board_helpers.get_full_boards_data(user_id, fields=fields)
+
+        board = tree['boards'][0]
+        # creator_id is selected for the ownership checks but not returned
+        self.assertEqual(set(board), {'id', 'created_at', 'slug', 'name', 'lists'})
+        self.assertEqual(set(board['lists'][0]), {'id', 'board_id', 'rank', 'position', 'title', 'cards'})
+        self.assertEqual(set(board['lists'][0]['cards'][0]), {'id', 'list_id', 'title'})
+        # A partial tree is never cached as the user's tree
+        self.assertIsNone(board_cache.get_boards(user_id))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def run_concurrently(self, count, fn):
+        results = []
+
+        def call():
+            try:
+                results.append(fn())
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_overlapping_calls_share_one_result(self):
+        flight = SingleFlight()
+        runs = []
+
+        def slow():
+            runs.append(1)
+            time.sleep(0.1)
+            return {'value': len(runs)}
+
+        results = self.run_concurrently(5, lambda: flight.do('key', slow))
+        self.assertEqual(len(runs), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.stats(), {'calls': 1, 'shared': 4, 'in_flight': 0})
+
+        # Nothing is cached once the call has returned
+        flight.do('key', slow)
+        self.assertEqual(len(runs), 2)
+
+    def test_errors_reach_every_caller_and_are_not_kept(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise ConnectionError("down")
+
+        results = self.run_concurrently(3, lambda: flight.do('key', failing))
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(flight.do('key', lambda: 'ok'), 'ok')
+
+    def test_forgotten_calls_are_not_joined(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def first():
+            started.set()
+            release.wait()
+            return 'stale'
+
+        thread = threading.Thread(target=flight.do, args=('key', first))
+        thread.start()
+        started.wait()
+        # A write lands while the first read is in flight
+        flight.forget(lambda key: key == 'key')
+        self.assertEqual(flight.do('key', lambda: 'fresh'), 'fresh')
+        release.set()
+        thread.join()
+
+    def test_async_callers_share_a_task_a_cancelled_caller_leaves_running(self):
+        flight = AsyncSingleFlight()
+        runs = []
+
+        async def slow():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def scenario():
+            cancelled = asyncio.ensure_future(flight.do('key', slow))
+            await asyncio.sleep(0)
+            waiting = [flight.do('key', slow) for _ in range(3)]
+            cancelled.cancel()
+            return await asyncio.gather(*waiting)
+
+        self.assertEqual(asyncio.run(scenario()), ['value'] * 3)
+        self.assertEqual(len(runs), 1)
+
+    def test_concurrent_board_reads_make_one_fetch(self):
+        backend = FakeSupabaseClient(latency=0.02)
+        generate_workspace(backend, 'user-flight', WorkspaceSpec(boards=2, lists=2, cards=2))
+        with use_backend(backend):
+            board_cache.invalidate_user('user-flight')
+            results = self.run_concurrently(6, lambda: board_helpers.get_full_boards_data('user-flight', use_cache=False))
+
+        self.assertEqual(backend.round_trips, 3)
+        self.assertTrue(all(len(result['boards']) == 2 for result in results))
+
+
+class RankingTests(SimpleTestCase):
+    def test_ranks_sort_between_their_neighbours(self):
+        ranks = ['i']
+        # Repeatedly inserting at the front, the back and into one gap
+        for _ in range(50):
+            ranks.insert(0, ranking.rank_between(None, ranks[0]))
+            ranks.append(ranking.rank_between(ranks[-1], None))
+            ranks.insert(2, ranking.rank_between(ranks[1], ranks[2]))
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(len(set(ranks)), len(ranks))
+
+    def test_appends_grow_slowly(self):
+        rank = None
+        for _ in range(200):
+            rank = ranking.rank_between(rank, None)
+        self.assertFalse(ranking.needs_rebalance(rank))
+
+    def test_many_rows_dropped_into_one_gap(self):
+        ranks = ranking.ranks_between('a', 'b', 100)
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertTrue(all('a' < rank < 'b' for rank in ranks))
+        self.assertLess(max(len(rank) for rank in ranks), 6)
+
+    def test_rank_for_index_clamps_the_slot(self):
+        ranks = ranking.spread_ranks(3)
+        self.assertLess(ranking.rank_for_index(ranks, -5), ranks[0])
+        self.assertGreater(ranking.rank_for_index(ranks, 99), ranks[-1])
+        self.assertTrue(ranks[0] < ranking.rank_for_index(ranks, 1) < ranks[1])
+
+    def test_malformed_or_reversed_keys_are_rejected(self):
+        for before, after in (('b', 'a'), ('a', 'a'), ('a0', None), ('A', None)):
+            with self.assertRaises(ValueError):
+                ranking.rank_between(before, after)
+
+    def test_spread_ranks_are_short_and_ordered(self):
+        ranks = ranking.spread_ranks(1000)
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(len(set(ranks)), 1000)
+        self.assertTrue(all(len(rank) <= 2 for rank in ranks))
+
+
+class RankRebalanceTests(SimpleTestCase):
+    def test_rebalance_keeps_edits_made_meanwhile(self):
+        backend = FakeSupabaseClient()
+        rows = generate_workspace(backend, 'user-rebalance', WorkspaceSpec(boards=1, lists=1, cards=3))
+        list_id = rows['lists'][0]['id']
+        edited = rows['cards'][1]['id']
+        rpc = backend.rpc
+
+        def rpc_after_edit(function, params=None, **kwargs):
+            # Someone renames a card between the rebalance's read and its write
+            next(card for card in backend.tables['cards'] if card['id'] == edited)['title'] = 'Renamed'
+            return rpc(function, params, **kwargs)
+
+        backend.rpc = rpc_after_edit
+        with use_backend(backend):
+            updates = board_helpers.rebalance_card_ranks(list_id, rows['boards'][0]['id'])
+
+        self.assertEqual([set(update) for update in updates], [{'id', 'rank', 'updated_at'}] * 3)
+        cards = {card['id']: card for card in backend.tables['cards']}
+        self.assertEqual(cards[edited]['title'], 'Renamed')
+        self.assertEqual([cards[update['id']]['rank'] for update in updates], [update['rank'] for update in updates])
+
+    def test_moving_a_list_writes_only_that_list(self):
+        backend = FakeSupabaseClient()
+        rows = generate_workspace(backend, 'user-lists', WorkspaceSpec(boards=1, lists=4, cards=0))
+        board_id = rows['boards'][0]['id']
+        board_cache.forget_board(board_id)
+        moved = board_helpers.sort_by_rank(rows['lists'])[3]
+        serializer = ListSerializer(data={'id': moved['id'], 'board_id': board_id, 'title': moved['title'], 'position': 1})
+        serializer.is_valid(raise_exception=True)
+        with use_backend(backend):
+            backend.reset_calls()
+            serializer.save()
+
+        writes = [call for call in backend.calls if call[1] != 'select']
+        self.assertEqual([call[:2] for call in writes], [('lists', 'update')])
+        ordered = board_helpers.sort_by_rank([row for row in backend.tables['lists'] if row['board_id'] == board_id])
+        self.assertEqual(ordered[0]['id'], moved['id'])
+
+    def test_lists_written_before_ranks_are_ranked_once(self):
+        backend = FakeSupabaseClient()
+        backend.seed('boards', [{'id': 'b1', 'name': 'Old', 'slug': 'old', 'creator_id': 'user-old'}])
+        backend.seed('lists', [
+            {'id': f'l{position}', 'board_id': 'b1', 'title': f'List {position}', 'position': position}
+            for position in (2, 1, 3)
+        ])
+        with use_backend(backend):
+            ranked = board_helpers.rebalance_list_ranks('b1')
+
+        self.assertEqual([row['id'] for row in ranked], ['l1', 'l2', 'l3'])
+        stored = {row['id']: row for row in backend.tables['lists']}
+        self.assertEqual([row['id'] for row in board_helpers.sort_by_rank(list(stored.values()))], ['l1', 'l2', 'l3'])
+        self.assertEqual(stored['l2']['title'], 'List 2')
+
+    def test_batch_update_skips_missing_rows(self):
+        backend = FakeSupabaseClient()
+        backend.seed('cards', [{'id': 'c1', 'title': 'A', 'rank': 'i'}])
+        with use_backend(backend):
+            results = DBActions(use_admin=True).batch_update('cards', [{'id': 'c1', 'rank': 'k'}, {'id': 'c2', 'rank': 'm'}, {'rank': 'n'}])
+
+        self.assertEqual([result['ok'] for result in results], [True, False, False])
+        self.assertEqual(backend.tables['cards'], [{'id': 'c1', 'title': 'A', 'rank': 'k', 'created_at': backend.tables['cards'][0]['created_at']}])
+
+
+class MoveCardsTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient()
+        self.rows = generate_workspace(self.backend, 'user-move', WorkspaceSpec(boards=1, lists=2, cards=3))
+        # Generated ids repeat between workspaces, so owners cached by other tests would be stale
+        for board in self.rows['boards']:
+            board_cache.forget_board(board['id'])
+        self.source, self.target = (list_item['id'] for list_item in self.rows['lists'])
+
+    def list_order(self, list_id):
+        cards = [card for card in self.backend.tables['cards'] if card['list_id'] == list_id]
+        return [card['id'] for card in board_helpers.sort_by_rank(cards)]
+
+    def test_moves_several_cards_between_neighbours_of_another_list(self):
+        moving = self.list_order(self.source)[:2]
+        prev_id, next_id = self.list_order(self.target)[:2]
+        rpc = self.backend.rpc
+
+        def rpc_after_edit(function, params=None, **kwargs):
+            # A card's content is edited while the move is in flight
+            next(card for card in self.backend.tables['cards'] if card['id'] == moving[0])['title'] = 'Edited'
+            return rpc(function, params, **kwargs)
+
+        self.backend.rpc = rpc_after_edit
+        with use_backend(self.backend):
+            moved = card_helpers.move_cards('user-move', [{'cardIds': moving, 'listId': self.target, 'prevId': prev_id, 'nextId': next_id}])
+
+        self.assertEqual([card['id'] for card in moved], moving)
+        self.assertEqual(self.list_order(self.target)[:4], [prev_id, *moving, next_id])
+        self.assertEqual(len(self.list_order(self.source)), 1)
+        edited = next(card for card in self.backend.tables['cards'] if card['id'] == moving[0])
+        self.assertEqual(edited['title'], 'Edited')
+
+    def test_rejects_boards_of_other_users(self):
+        card_id = self.list_order(self.source)[0]
+        with use_backend(self.backend), self.assertRaises(card_helpers.CardError) as raised:
+            card_helpers.move_cards('someone-else', [{'cardId': card_id, 'listId': self.target}])
+        self.assertEqual(raised.exception.status, 401)
+
+    def test_stale_neighbours_conflict(self):
+        card_id = self.list_order(self.source)[0]
+        first, second, third = self.list_order(self.target)
+        with use_backend(self.backend), self.assertRaises(card_helpers.CardError) as raised:
+            # The client's view of the list has the two neighbours the other way round
+            card_helpers.move_cards('user-move', [{'cardId': card_id, 'listId': self.target, 'prevId': third, 'nextId': first}])
+        self.assertEqual(raised.exception.status, 409)
+
+
+class BoardSlugTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.backend = FakeSupabaseClient(unique={'boards': ['slug']})
+
+    def seed_slugs(self, slugs):
+        self.backend.seed('boards', [{'name': slug, 'slug': slug, 'creator_id': self.user_id} for slug in slugs])
+
+    def create(self, name):
+        serializer = BoardSerializer(data={'name': name, 'creator_id': self.user_id})
+        serializer.is_valid(raise_exception=True)
+        with use_backend(self.backend):
+            return serializer.save().data[0]['slug']
+
+    def test_picks_the_lowest_free_suffix(self):
+        self.seed_slugs(['todo', 'todo-1', 'todo-3', 'todo-list', 'todos'])
+        self.assertEqual(self.create('Todo'), 'todo-2')
+
+    def test_name_without_slug_characters_gets_the_default_base(self):
+        self.assertEqual(self.create('!!!'), 'board')
+        self.assertEqual(self.create('🙂'), 'board-1')
+
+    def test_random_suffix_when_more_slugs_are_taken_than_read(self):
+        self.seed_slugs(['todo'] + [f'todo-{index}' for index in range(1, SLUG_LOOKUP_LIMIT + 10)])
+        slug = self.create('Todo')
+        self.assertRegex(slug, r'^todo-[0-9a-f]{8}$')
+        self.assertEqual(self.backend.calls_for('boards'), 2)
+
+    def test_random_suffix_after_losing_a_race(self):
+        self.seed_slugs(['todo'])
+        query = self.backend.table
+        requests = []
+
+        def table_after_race(name):
+            # Another request takes todo-1 between the lookup and the insert
+            requests.append(name)
+            if requests.count('boards') == 2:
+                self.seed_slugs(['todo-1'])
+            return query(name)
+
+        self.backend.table = table_after_race
+        slug = self.create('Todo')
+        self.assertRegex(slug, r'^todo-[0-9a-f]{8}$')
+
+
+class BoardPagingTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient()
+        self.user_id = str(uuid.uuid4())
+        generate_workspace(self.backend, self.user_id, WorkspaceSpec(boards=7, lists=2, cards=2))
+
+    def walk(self, limit):
+        pages = []
+        cursor = None
+        with use_backend(self.backend):
+            while True:
+                pages.append(board_helpers.get_boards_page(self.user_id, limit, cursor))
+                cursor = pages[-1]['next_cursor']
+                if not cursor:
+                    return pages
+
+    def by_id(self, boards):
+        return sorted(boards, key=lambda board: board['id'])
+
+    def test_cursors_walk_every_board_once(self):
+        pages = self.walk(3)
+
+        self.assertEqual([len(page['boards']) for page in pages], [3, 3, 1])
+        boards = [board for page in pages for board in page['boards']]
+        self.assertEqual(len({board['id'] for board in boards}), 7)
+        self.assertEqual([board['created_at'] for board in boards], sorted(board['created_at'] for board in boards))
+        self.assertTrue(all(len(board['lists']) == 2 for board in boards))
+
+    def test_page_costs_the_same_round_trips_at_any_depth(self):
+        first = self.walk(3)[0]
+        with use_backend(self.backend):
+            self.backend.reset_calls()
+            board_helpers.get_boards_page(self.user_id, 3, first['next_cursor'])
+
+        # Boards, then lists and cards of the page
+        self.assertEqual(self.backend.round_trips, 3)
+
+    def test_page_params(self):
+        self.assertIsNone(board_helpers.parse_page_params({}))
+        self.assertEqual(board_helpers.parse_page_params({'limit': '5'}), (5, None))
+        with self.assertRaises(ValueError):
+            board_helpers.parse_page_params({'cursor': 'not-a-cursor'})
+        with self.assertRaises(ValueError):
+            board_helpers.parse_page_params({'limit': 'many'})
+
+    def test_stream_matches_the_full_tree(self):
+        with use_backend(self.backend):
+            full = board_helpers.get_full_boards_data(self.user_id, use_cache=False)
+            streamed = json.loads(''.join(board_helpers.iter_boards_json(self.user_id, page_size=3)))
+
+            async def astream():
+                return ''.join([chunk async for chunk in board_helpers.aiter_boards_json(self.user_id, page_size=3)])
+
+            astreamed = json.loads(asyncio.run(astream()))
+
+        self.assertEqual(streamed['message'], full['message'])
+        self.assertEqual(self.by_id(streamed['boards']), self.by_id(full['boards']))
+        self.assertEqual(astreamed, streamed)
+
+    def test_view_rejects_a_bad_cursor(self):
+        request = RequestFactory().get('/boards/get-boards/?cursor=not-a-cursor')
+        request.decoded_token = {'sub': self.user_id}
+        with use_backend(self.backend):
+            response = views.GetBoardsView.as_view()(request)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"message": "Invalid limit or cursor"})
+
+
+class BoardEtagTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient()
+        self.user_id = str(uuid.uuid4())
+        self.rows = generate_workspace(self.backend, self.user_id, WorkspaceSpec(boards=2, lists=2, cards=1))
+        self.board = self.rows['boards'][0]
+
+    def get(self, view, path, etag=None, **kwargs):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = RequestFactory().get(path, **headers)
+        request.decoded_token = {'sub': self.user_id}
+        with use_backend(self.backend):
+            self.backend.reset_calls()
+            return view.as_view()(request, **kwargs)
+
+    def get_boards(self, etag=None, path='/boards/get-boards/'):
+        return self.get(views.GetBoardsView, path, etag)
+
+    def get_board(self, etag=None):
+        return self.get(views.GetBoardInfoView, f"/boards/{self.board['slug']}/", etag, board_slug=self.board['slug'])
+
+    def move_list(self):
+        moved = board_helpers.sort_by_rank([row for row in self.rows['lists'] if row['board_id'] == self.board['id']])[1]
+        serializer = ListSerializer(data={'id': moved['id'], 'board_id': self.board['id'], 'title': moved['title'], 'position': 1})
+        serializer.is_valid(raise_exception=True)
+        with use_backend(self.backend):
+            serializer.save()
+
+    def test_unchanged_boards_are_not_modified_without_a_round_trip(self):
+        etag = self.get_boards()['ETag']
+        response = self.get_boards(etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.backend.round_trips, 0)
+
+    def test_write_changes_the_etag(self):
+        etag = self.get_boards()['ETag']
+        self.move_list()
+        response = self.get_boards(etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_selects_another_representation(self):
+        etag = self.get_boards()['ETag']
+        response = self.get_boards(etag, '/boards/get-boards/?fields=id,name')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_board_etag_once_the_slug_is_known(self):
+        board_cache.forget_slug(self.user_id, self.board['slug'])
+        self.assertFalse(self.get_board().has_header('ETag'))
+
+        etag = self.get_board()['ETag']
+        self.assertEqual(self.get_board(etag).status_code, 304)
+        self.assertEqual(self.backend.round_trips, 0)
+
+        self.move_list()
+        self.assertEqual(self.get_board(etag).status_code, 200)
+
+
+class ChangesSinceTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient()
+        self.user_id = str(uuid.uuid4())
+        self.rows = generate_workspace(self.backend, self.user_id, WorkspaceSpec(boards=2, lists=2, cards=2))
+        generate_workspace(self.backend, 'someone-else', WorkspaceSpec(boards=1, lists=1, cards=1), seed=1)
+        # Everything was written long before the syncs below
+        for table in board_sync.SYNC_TABLES:
+            for row in self.backend.tables[table]:
+                row['updated_at'] = '2026-01-01T00:00:00+00:00'
+        self.board = self.rows['boards'][0]
+
+    def changes(self, since=None):
+        with use_backend(self.backend):
+            return board_sync.get_changes_since(self.user_id, since)
+
+    def ago(self, seconds):
+        return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+    def test_full_sync_returns_the_users_rows(self):
+        changes = self.changes()
+
+        self.assertTrue(changes['full'])
+        self.assertEqual({board['id'] for board in changes['boards']}, {board['id'] for board in self.rows['boards']})
+        self.assertEqual(len(changes['lists']), 4)
+        self.assertEqual(len(changes['cards']), 8)
+        self.assertNotIn('creator_id', changes['boards'][0])
+        self.assertEqual(changes['deleted'], {'boards': [], 'lists': [], 'cards': []})
+
+    def test_delta_returns_only_what_was_written_since(self):
+        watermark = board_sync.parse_watermark(self.changes()['watermark'])
+        moved = board_helpers.sort_by_rank([row for row in self.rows['lists'] if row['board_id'] == self.board['id']])[1]
+        serializer = ListSerializer(data={'id': moved['id'], 'board_id': self.board['id'], 'title': moved['title'], 'position': 1})
+        serializer.is_valid(raise_exception=True)
+        with use_backend(self.backend):
+            serializer.save()
+
+        changes = self.changes(watermark)
+        self.assertFalse(changes['full'])
+        self.assertEqual(changes['boards'], [])
+        self.assertEqual([list_item['id'] for list_item in changes['lists']], [moved['id']])
+        self.assertEqual(changes['cards'], [])
+
+    def test_writes_just_before_the_watermark_are_sent_again(self):
+        card = self.rows['cards'][0]
+        self.backend.tables['cards'][0]['updated_at'] = self.ago(board_sync.SYNC_OVERLAP_SECONDS - 2).isoformat()
+
+        self.assertEqual([row['id'] for row in self.changes(self.ago(0))['cards']], [card['id']])
+        self.assertEqual(self.changes(self.ago(-(board_sync.SYNC_OVERLAP_SECONDS + 2)))['cards'], [])
+
+    def test_deleted_board_is_reported_to_its_owner(self):
+        watermark = board_sync.parse_watermark(self.changes()['watermark'])
+        request = RequestFactory().delete(f"/boards/delete-board/{self.board['id']}")
+        request.decoded_token = {'sub': self.user_id}
+        with use_backend(self.backend):
+            response = views.DeleteBoardView.as_view()(request, board_id=self.board['id'])
+            others = board_sync.get_changes_since('someone-else', watermark)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.changes(watermark)['deleted']['boards'], [self.board['id']])
+        self.assertEqual(others['deleted']['boards'], [])
+
+    def test_watermarks(self):
+        self.assertIsNone(board_sync.parse_watermark(''))
+        # A '+' in the query string arrives as a space
+        self.assertEqual(board_sync.parse_watermark('2026-10-18T10:00:00 02:00'), datetime(2026, 10, 18, 8, tzinfo=timezone.utc))
+        self.assertEqual(board_sync.parse_watermark('2026-10-18T10:00:00'), datetime(2026, 10, 18, 10, tzinfo=timezone.utc))
+        with self.assertRaises(ValueError):
+            board_sync.parse_watermark('yesterday')
+
+        request = RequestFactory().get('/boards/changes-since/?since=yesterday')
+        request.decoded_token = {'sub': self.user_id}
+        self.assertEqual(views.ChangesSinceView.as_view()(request).status_code, 400)
+
+
+class SlugIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.backend = FakeSupabaseClient(unique={'boards': ['slug']})
+        self.backend.seed('boards', [
+            {'name': 'Todo', 'slug': 'todo', 'creator_id': self.user_id},
+            {'name': 'Done', 'slug': 'done', 'creator_id': self.user_id},
+        ])
+        self.todo, self.done = self.backend.tables['boards']
+        self.filtered = []
+        execute = self.backend._execute
+
+        def recording_execute(query):
+            self.filtered.append(sorted(column for column, _ in query.filters))
+            return execute(query)
+
+        self.backend._execute = recording_execute
+
+    def lookup(self, slug, user_id=None):
+        with use_backend(self.backend):
+            return board_helpers.get_board_by_slug(DBActions(use_admin=True), user_id or self.user_id, slug)
+
+    def test_known_slug_is_read_by_id(self):
+        self.assertEqual(self.lookup('todo')['id'], self.todo['id'])
+        self.assertEqual(board_cache.board_id_for_slug(self.user_id, 'todo'), self.todo['id'])
+
+        self.assertEqual(self.lookup('todo')['id'], self.todo['id'])
+        self.assertEqual(self.filtered, [['creator_id', 'slug'], ['id']])
+
+    def test_stale_entry_falls_back_to_the_slug(self):
+        # Another worker renamed the boards: 'todo' is now the other one
+        board_cache.remember_slug(self.user_id, 'todo', self.todo['id'])
+        self.todo['slug'], self.done['slug'] = 'done', 'todo'
+
+        self.assertEqual(self.lookup('todo')['id'], self.done['id'])
+        self.assertEqual(self.filtered, [['id'], ['creator_id', 'slug']])
+        self.assertEqual(board_cache.board_id_for_slug(self.user_id, 'todo'), self.done['id'])
+
+    def test_other_users_board_is_not_returned(self):
+        other_user = str(uuid.uuid4())
+        board_cache.remember_slug(other_user, 'todo', self.todo['id'])
+
+        self.assertIsNone(self.lookup('todo', other_user))
+        self.assertIsNone(board_cache.board_id_for_slug(other_user, 'todo'))
+
+    def test_rename_moves_the_entry(self):
+        board_cache.remember_slug(self.user_id, 'todo', self.todo['id'])
+        serializer = BoardSerializer(dict(self.todo), data={'id': self.todo['id'], 'name': 'Later', 'creator_id': self.user_id})
+        serializer.is_valid(raise_exception=True)
+        with use_backend(self.backend):
+            serializer.save()
+
+        self.assertIsNone(board_cache.board_id_for_slug(self.user_id, 'todo'))
+        self.assertEqual(board_cache.board_id_for_slug(self.user_id, 'later'), self.todo['id'])
+
+
+class BoardBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient(unique={'boards': ['slug']})
+        self.user_id = str(uuid.uuid4())
+        self.other = generate_workspace(self.backend, 'someone-else', WorkspaceSpec(boards=1, lists=1, cards=1))
+        for board in self.other['boards']:
+            board_cache.forget_board(board['id'])
+
+    def run_batch(self, operations):
+        with use_backend(self.backend):
+            self.backend.reset_calls()
+            return board_batch.run_batch(self.user_id, operations)
+
+    def test_later_operations_use_ids_created_earlier(self):
+        results = self.run_batch([
+            {'op': 'create-board', 'data': {'name': 'Launch'}},
+            {'op': 'add-list', 'data': {'title': 'Todo', 'boardId': '$0', 'position': 1}},
+            {'op': 'add-list', 'data': {'title': 'Done', 'boardId': '$0', 'position': 2}},
+            {'op': 'add-list', 'data': {'title': 'Doing', 'boardId': '$0', 'position': 2}},
+            {'op': 'add-card', 'data': {'title': 'Plan', 'listId': '$1'}},
+        ])
+
+        self.assertEqual([result['status'] for result in results], [201] * 5)
+        board_id = results[0]['id']
+        lists = board_helpers.sort_by_rank([row for row in self.backend.tables['lists'] if row['board_id'] == board_id])
+        self.assertEqual([row['title'] for row in lists], ['Todo', 'Doing', 'Done'])
+        self.assertEqual(results[4]['data']['list_id'], results[1]['id'])
+        # The three lists go in with one insert, without reading the new board's lists (the select is add-card's)
+        self.assertEqual([call[1] for call in self.backend.calls if call[0] == 'lists'], ['insert', 'select'])
+
+    def test_references_to_failed_or_missing_operations_fail(self):
+        results = self.run_batch([
+            {'op': 'create-board', 'data': {'name': ''}},
+            {'op': 'add-list', 'data': {'title': 'Todo', 'boardId': '$0', 'position': 1}},
+            {'op': 'add-card', 'data': {'title': 'Plan', 'listId': '$7'}},
+            {'op': 'rename-everything', 'data': {}},
+        ])
+        self.assertEqual([result['status'] for result in results], [400, 424, 424, 400])
+        self.assertNotIn('lists', [call[0] for call in self.backend.calls])
+
+    def test_operations_on_boards_of_other_users_are_refused(self):
+        board_id = self.other['boards'][0]['id']
+        list_id = self.other['lists'][0]['id']
+        results = self.run_batch([
+            {'op': 'add-list', 'data': {'title': 'Mine', 'boardId': board_id, 'position': 1}},
+            {'op': 'update-board', 'data': {'boardId': board_id, 'updatedBoard': {'name': 'Taken'}}},
+            {'op': 'add-card', 'data': {'title': 'Mine', 'listId': list_id}},
+            {'op': 'create-board', 'data': {'name': 'Still runs'}},
+        ])
+        self.assertEqual([result['status'] for result in results], [401, 401, 401, 201])
+        self.assertEqual(len([row for row in self.backend.tables['lists'] if row['board_id'] == board_id]), 1)
+        self.assertEqual(len([row for row in self.backend.tables['cards'] if row['list_id'] == list_id]), 1)
+
+    def test_lists_that_failed_to_insert_are_not_ranked_against(self):
+        execute = self.backend._execute
+        failed = []
+
+        def execute_failing_first_list_insert(query):
+            if query.table_name == 'lists' and query.method == 'insert' and not failed:
+                failed.append(query)
+                raise ConnectionError("lists unavailable")
+            return execute(query)
+
+        self.backend._execute = execute_failing_first_list_insert
+        results = self.run_batch([
+            {'op': 'create-board', 'data': {'name': 'Launch'}},
+            {'op': 'add-list', 'data': {'title': 'Lost', 'boardId': '$0', 'position': 1}},
+            {'op': 'update-board', 'data': {'boardId': '$0', 'updatedBoard': {'name': 'Launch 2'}}},
+            {'op': 'add-list', 'data': {'title': 'Todo', 'boardId': '$0', 'position': 2}},
+        ])
+
+        self.assertEqual([result['status'] for result in results], [201, 400, 200, 201])
+        # Ranked as the board's first list, not after the one that was never written
+        self.assertEqual(results[3]['data']['rank'], ranking.rank_for_index([], 0))
+
+    def test_malformed_batches_run_nothing(self):
+        for operations in ([], None, ['create-board'], [{'op': 'add-list', 'data': 'x'}]):
+            with self.assertRaises(ValueError):
+                self.run_batch(operations)
+        self.assertEqual(self.backend.round_trips, 0)
+
+
+class BatchViewTests(SimpleTestCase):
+    def post(self, body, backend):
+        request = RequestFactory().post('/boards/batch/', data=json.dumps(body), content_type='application/json')
+        request.decoded_token = {'sub': str(uuid.uuid4())}
+        with use_backend(backend):
+            return views.BatchView.as_view()(request)
+
+    def test_body_that_is_not_an_object_is_rejected(self):
+        backend = FakeSupabaseClient()
+        for body in ([{'op': 'create-board', 'data': {'name': 'Launch'}}], 'operations', 3):
+            response = self.post(body, backend)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('message', response.data)
+        self.assertEqual(backend.round_trips, 0)
+
+    def test_unexpected_errors_are_json_responses(self):
+        backend = FakeSupabaseClient()
+        with mock.patch.object(views, 'run_batch', side_effect=ConnectionError("boards unavailable")):
+            response = self.post({'operations': [{'op': 'create-board', 'data': {'name': 'Launch'}}]}, backend)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'message': 'Failed to run batch'})
+
+
+class AsyncBoardViewTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient(unique={'boards': ['slug']})
+        self.user_id = str(uuid.uuid4())
+        self.rows = generate_workspace(self.backend, self.user_id, WorkspaceSpec(boards=2, lists=2, cards=1))
+        self.board = self.rows['boards'][0]
+        for board in self.rows['boards']:
+            board_cache.forget_board(board['id'])
+
+    def request(self, method, path, body, user_id=None):
+        request = getattr(AsyncRequestFactory(), method)(path, data=json.dumps(body), content_type='application/json')
+        if user_id:
+            request.decoded_token = {'sub': user_id}
+        return request
+
+    async def test_rename_reads_the_board_and_the_slugs_together(self):
+        request = self.request('put', '/boards/update-board/', {'boardId': self.board['id'], 'updatedBoard': {'name': 'Renamed'}}, self.user_id)
+        with use_backend(self.backend):
+            self.backend.reset_calls()
+            response = await async_views.AsyncUpdateBoardView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['board'][0]['slug'], 'renamed')
+        # The board, the slugs under the new name and the update
+        self.assertEqual(self.backend.calls_for('boards'), 3)
+        self.assertEqual(board_cache.board_id_for_slug(self.user_id, 'renamed'), self.board['id'])
+
+    async def test_update_without_a_token_is_unauthorized(self):
+        request = self.request('put', '/boards/update-board/', {'boardId': self.board['id'], 'updatedBoard': {'name': 'Renamed'}})
+        response = await async_views.AsyncUpdateBoardView.as_view()(request)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_create_list_ranks_it_at_the_position(self):
+        request = self.request('post', '/boards/add-list/', {'title': 'First', 'boardId': self.board['id'], 'position': 1}, self.user_id)
+        with use_backend(self.backend):
+            board_cache.set_boards(self.user_id, {'boards': []})
+            response = await async_views.AsyncCreateListView.as_view()(request)
+
+        self.assertEqual(response.status_code, 201)
+        lists = board_helpers.sort_by_rank([row for row in self.backend.tables['lists'] if row['board_id'] == self.board['id']])
+        self.assertEqual([row['title'] for row in lists][0], 'First')
+        self.assertEqual(len(lists), 3)
+        # The owner was looked up alongside the lists, so the owner's cached tree was dropped
+        self.assertIsNone(board_cache.get_boards(self.user_id))
+
+
+class BoardEndpointBenchmarkTests(SimpleTestCase):
+    """
+    Runs the endpoint benchmarks (boards/benchmarks.py) and fails on regressions against the stored
+    baseline. Round trips are always checked; set BENCHMARK_LATENCY_TOLERANCE (e.g. 0.5) to also
+    check p95 latencies. Refresh the baseline with `python manage.py benchmark_boards --write-baseline`.
+    """
+    def test_no_regressions_against_baseline(self):
+        baseline = benchmarks.load_baseline()
+        if not baseline:
+            self.skipTest("No benchmark baseline stored")
+
+        tolerance = os.environ.get('BENCHMARK_LATENCY_TOLERANCE')
+        results = benchmarks.run_benchmarks(iterations=5)
+        regressions = benchmarks.compare_to_baseline(results, baseline, float(tolerance) if tolerance else None)
+        self.assertEqual(regressions, [], "\n" + benchmarks.format_results(results))
+
+    def test_round_trips_do_not_grow_with_workspace_size(self):
+        specs = [WorkspaceSpec(boards=1, lists=2, cards=2), WorkspaceSpec(boards=8, lists=4, cards=6)]
+        results = benchmarks.run_benchmarks(specs, iterations=2)
+        for name in benchmarks.SCENARIOS:
+            small, large = (results[f'{name}@{spec.label}'] for spec in specs)
+            self.assertEqual(small['round_trips_max'], large['round_trips_max'], name)
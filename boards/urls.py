@@ -1,14 +1,39 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Under ASGI the read and create/update endpoints are served by the async views.
+if settings.ASYNC_BOARD_VIEWS:
+  board_views = {
+    'create-board': async_views.AsyncCreateBoardView,
+    'get-boards': async_views.AsyncGetBoardsView,
+    'update-board': async_views.AsyncUpdateBoardView,
+    'get-board-info': async_views.AsyncGetBoardInfoView,
+    'add-list': async_views.AsyncCreateListView,
+  }
+else:
+  board_views = {
+    'create-board': views.CreateBoardView,
+    'get-boards': views.GetBoardsView,
+    'update-board': views.UpdateBoardView,
+    'get-board-info': views.GetBoardInfoView,
+    'add-list': views.CreateListView,
+  }
 
 urlpatterns = [
   # path('/<str:board_id>', views.BoardView.as_view(), name='board'),
-  path('create-board/', views.CreateBoardView.as_view(), name='create-board'),
-  path('get-boards/', views.GetBoardsView.as_view(), name='get-boards'),
-  path('update-board/', views.UpdateBoardView.as_view(), name='update-board'),
-  path('get-board-info/<str:board_slug>', views.GetBoardInfoView.as_view(), name='get-board-info'),
+  path('create-board/', board_views['create-board'].as_view(), name='create-board'),
+  path('get-boards/', board_views['get-boards'].as_view(), name='get-boards'),
+  path('update-board/', board_views['update-board'].as_view(), name='update-board'),
+  path('get-board-info/<str:board_slug>', board_views['get-board-info'].as_view(), name='get-board-info'),
+  path('changes-since/', views.ChangesSinceView.as_view(), name='changes-since'),
+  path('batch/', views.BatchView.as_view(), name='batch'),
   
   # List endpoints
-  path('add-list/', views.CreateListView.as_view(), name='add-list'),
+  path('add-list/', board_views['add-list'].as_view(), name='add-list'),
   # path('list/<str:list_id>', views.ListView.as_view(), name='list'),
-]
\ No newline at end of file
+  
+  # Card endpoints
+  path('add-card/', views.CreateCardView.as_view(), name='add-card'),
+  path('move-cards/', views.MoveCardsView.as_view(), name='move-cards'),
+]
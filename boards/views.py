@@ -1,8 +1,8 @@
 import code
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views import View
 from functions.db_actions import DBActions
-from boards.serializers import BoardSerializer, ListSerializer
+from boards.serializers import BoardSerializer, CardSerializer, ListSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import AuthenticationFailed
@@ -12,7 +12,14 @@ from rest_framework.permissions import AllowAny
 import jwt
 from functions.getToken import getTokenFromMiddleware
 from functions.supabase_client import supabase_client, supabase_admin, secret
-from helpers.board_helpers import get_board_data, get_full_boards_data
+from helpers.board_helpers import (
+  board_changed, get_board_by_slug, get_board_data, get_boards_page, get_full_boards_data,
+  iter_boards_json, parse_fields, parse_page_params, wants_stream,
+)
+from helpers import board_cache, board_versions
+from helpers.board_sync import get_changes_since, parse_watermark, record_deletion
+from helpers.board_batch import run_batch
+from helpers.card_helpers import CardError, list_boards, move_cards
 import logging
 
 
@@ -59,12 +66,40 @@ class GetBoardsView(APIView):
       if not user_id:
         raise AuthenticationFailed("Token is missing user information.", code=status.HTTP_403_FORBIDDEN)
       
-      data = get_full_boards_data(user_id)
+      # Answer polls with 304 before touching Supabase when nothing changed
+      etag = board_versions.user_etag(user_id, request)
+      if board_versions.not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
       
-      if not data["boards"] or len(data["boards"]) == 0:
+      try:
+        page_params = parse_page_params(request.query_params)
+      except ValueError:
+        return Response({"message": "Invalid limit or cursor"}, status=status.HTTP_400_BAD_REQUEST)
+      
+      # ?fields=id,name,lists.title,cards.title only selects the given columns
+      try:
+        fields = parse_fields(request.query_params)
+      except ValueError:
+        return Response({"message": "Invalid fields"}, status=status.HTTP_400_BAD_REQUEST)
+      
+      # ?stream=1 emits boards as their pages are fetched instead of building the whole tree in memory
+      if wants_stream(request.query_params):
+        first_page = get_boards_page(user_id, fields=fields)
+        if not first_page["boards"]:
+          return Response({"message": first_page["message"]}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(iter_boards_json(user_id, first_page, fields=fields), content_type='application/json')
+        response['ETag'] = etag
+        return response
+      
+      if page_params:
+        data = get_boards_page(user_id, *page_params, fields=fields)
+      else:
+        data = get_full_boards_data(user_id, fields=fields)
+      
+      if not data.get("boards"):
         return Response({"message": data["message"]}, status=status.HTTP_400_BAD_REQUEST)
       
-      return Response(data, status=status.HTTP_200_OK)
+      return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
     except Exception as e:
       logger = logging.getLogger(__name__)
       logger.error(f"Failed to get boards: {e}")
@@ -82,18 +117,27 @@ class GetBoardInfoView(APIView):
           
       if not user_id:
         raise AuthenticationFailed("Token is missing user information.")
-          
-      board = db.get_many('boards', 'creator_id', user_id)
       
-      if not board.data or len(board.data) == 0:
-        return Response({"message": "No board found"}, status=status.HTTP_400_BAD_REQUEST)
-      
-      board.data = [b for b in board.data if b['slug'] == board_slug]
+      # The version must be read before the fetch, so an ETag is only possible for boards the slug index knows
+      etag = None
+      board_id = board_cache.board_id_for_slug(user_id, board_slug)
+      if board_id:
+        etag = board_versions.board_etag(board_id, request)
+        if board_versions.not_modified(request, etag):
+          return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+          
+      try:
+        fields = parse_fields(request.query_params)
+      except ValueError:
+        return Response({"message": "Invalid fields"}, status=status.HTTP_400_BAD_REQUEST)
+          
+      board = get_board_by_slug(db, user_id, board_slug, fields)
       
-      if not board.data or len(board.data) == 0:
+      if not board:
         return Response({"message": "No board found"}, status=status.HTTP_400_BAD_REQUEST)
       
-      return Response(board.data[0], status=status.HTTP_200_OK)
+      headers = {'ETag': etag} if etag and str(board['id']) == str(board_id) else None
+      return Response(board, status=status.HTTP_200_OK, headers=headers)
       
     except Exception as e:
       logger = logging.getLogger(__name__)
@@ -156,6 +200,11 @@ class DeleteBoardView(APIView):
           return Response({"message": "You are not authorized to delete this board"}, status=status.HTTP_401_UNAUTHORIZED)
       
       DBActions(use_admin=True).delete('boards', board_id)
+      # Lists and cards go with the board, so its tombstone is enough for synced clients
+      record_deletion('boards', board_id, user_id, board_id)
+      board_changed(board_id, user_id)
+      board_cache.forget_board(board_id)
+      board_cache.forget_slug(user_id, board.data[0]['slug'])
       return Response({"message": "Board deleted successfully"}, status=status.HTTP_200_OK)
     except Exception as e:
       logger = logging.getLogger(__name__)
@@ -163,6 +212,59 @@ class DeleteBoardView(APIView):
       return Response({"message": "Failed to delete board"}, status=status.HTTP_400_BAD_REQUEST)
     
 
+class ChangesSinceView(APIView):
+  permission_classes = [AllowAny]
+  
+  def get(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+      
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.")
+      
+      # ?since=<watermark of the previous sync>; without it every row is returned (initial sync)
+      try:
+        since = parse_watermark(request.query_params.get('since'))
+      except ValueError:
+        return Response({"message": "Invalid since watermark"}, status=status.HTTP_400_BAD_REQUEST)
+      
+      return Response(get_changes_since(user_id, since), status=status.HTTP_200_OK)
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to get changes: {e}")
+      return Response({"message": "Failed to get changes"}, status=status.HTTP_400_BAD_REQUEST)
+    
+
+class BatchView(APIView):
+  permission_classes = [AllowAny]
+  
+  def post(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+      
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.")
+      
+      # {"operations": [{"op": "create-board", "data": {...}}, {"op": "add-list", "data": {"boardId": "$0", ...}}]}
+      if not isinstance(request.data, dict):
+        return Response({"message": "Request body must be an object with 'operations'"}, status=status.HTTP_400_BAD_REQUEST)
+      try:
+        results = run_batch(user_id, request.data.get('operations'))
+      except ValueError as e:
+        return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+      
+      failed = sum(1 for result in results if not result['ok'])
+      message = "Batch completed" if not failed else f"{failed} of {len(results)} operations failed"
+      return Response(
+        {'message': message, 'results': results},
+        status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_200_OK,
+      )
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to run batch: {e}")
+      return Response({"message": "Failed to run batch"}, status=status.HTTP_400_BAD_REQUEST)
+
+
 # List Views (to be implemented)
 class CreateListView(APIView):
   permission_classes = [AllowAny]
@@ -196,4 +298,73 @@ class CreateListView(APIView):
       logger.error(f"Failed to create list: {e}")
 
       return Response({"message": "Failed to create list"}, status=status.HTTP_400_BAD_REQUEST)
-    
\ No newline at end of file
+
+
+# Card Views
+class CreateCardView(APIView):
+  permission_classes = [AllowAny]
+  serializer_class = CardSerializer
+  
+  def post(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+      
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.")
+      
+      data = {
+        'title': request.data.get('title'),
+        'list_id': request.data.get('listId'),
+        'description': request.data.get('description', ''),
+        'priority': request.data.get('priority', ''),
+        'due_date': request.data.get('dueDate'),
+        'image_url': request.data.get('imageUrl'),
+      }
+      
+      serializer = CardSerializer(data=data)
+      if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+      
+      # Placed between prevId and nextId, at position, or at the end of the list
+      position = request.data.get('position')
+      if position is not None and (not isinstance(position, int) or position < 1):
+        return Response({"message": "position must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+      
+      db = DBActions(use_admin=True)
+      list_id = str(serializer.validated_data['list_id'])
+      board_id = list_boards(db, [list_id], user_id)[list_id]
+      card = serializer.save(
+        board_id=board_id,
+        prev_id=request.data.get('prevId'),
+        next_id=request.data.get('nextId'),
+        position=position,
+      )
+      return Response({'message': 'Card created successfully', 'card': card.data}, status=status.HTTP_201_CREATED)
+    except CardError as e:
+      return Response({"message": str(e)}, status=e.status)
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to create card: {e}")
+      
+      return Response({"message": "Failed to create card"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MoveCardsView(APIView):
+  permission_classes = [AllowAny]
+  
+  def post(self, request):
+    try:
+      user_id = getTokenFromMiddleware(request)
+      
+      if not user_id:
+        raise AuthenticationFailed("Token is missing user information.")
+      
+      # {"moves": [{"cardIds": [...], "listId": ..., "prevId": ..., "nextId": ...}, ...]}
+      cards = move_cards(user_id, request.data.get('moves'))
+      return Response({'message': 'Cards moved successfully', 'cards': cards}, status=status.HTTP_200_OK)
+    except (ValueError, CardError) as e:
+      return Response({"message": str(e)}, status=getattr(e, 'status', status.HTTP_400_BAD_REQUEST))
+    except Exception as e:
+      logger = logging.getLogger(__name__)
+      logger.error(f"Failed to move cards: {e}")
+      return Response({"message": "Failed to move cards"}, status=status.HTTP_400_BAD_REQUEST)
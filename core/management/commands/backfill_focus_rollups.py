@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from functions.db_actions import IN_CHUNK_SIZE, DBActions
+from helpers.focus_rollups import rebuild_rollups, user_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily, weekly and all-time focus rollups (focus_stats) and the users' focus totals "
+        "and streaks from focus_sessions, a batch of users at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', help="Only rebuild this user id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=IN_CHUNK_SIZE, help="Users rebuilt per batch.")
+        parser.add_argument('--dry-run', action='store_true', help="Compute the rollups without writing them.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+
+        db = DBActions(use_admin=True)
+        if not db.supabase:
+            raise CommandError("No database backend is configured")
+
+        totals = {'users': 0, 'sessions': 0, 'rollups': 0}
+        for user_ids in user_batches(db, options['user'], batch_size):
+            counts = rebuild_rollups(user_ids, db, dry_run=options['dry_run'])
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(f"Rebuilt {totals['users']} users so far")
+
+        verb = "Would write" if options['dry_run'] else "Wrote"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['rollups']} rollups for {totals['users']} users from {totals['sessions']} sessions."
+        ))
+
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from functions.db_actions import IN_CHUNK_SIZE, DBActions
+from helpers.focus_rollups import recompute_streaks, user_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes focus_streak, longest_focus_streak and the streak record of users from their daily "
+        "focus rollups, a batch of users at a time. Run backfill_focus_rollups first if the rollups are missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', help="Only recompute this user id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=IN_CHUNK_SIZE, help="Users recomputed per batch.")
+        parser.add_argument('--dry-run', action='store_true', help="Compute the streaks without writing them.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive")
+
+        db = DBActions(use_admin=True)
+        if not db.supabase:
+            raise CommandError("No database backend is configured")
+
+        totals = {'users': 0, 'days': 0}
+        for user_ids in user_batches(db, options['user'], batch_size):
+            counts = recompute_streaks(user_ids, db, dry_run=options['dry_run'])
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(f"Recomputed {totals['users']} users so far")
+
+        verb = "Would update" if options['dry_run'] else "Updated"
+        self.stdout.write(self.style.SUCCESS(f"{verb} the streaks of {totals['users']} users from {totals['days']} days."))
@@ -1,16 +1,73 @@
+import hashlib
+import json
+import logging
+import time
 from rest_framework.authentication import get_authorization_header
 from rest_framework.exceptions import AuthenticationFailed
 import jwt
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
+from functions import db_metrics
+from functions.cache import TTLCache
 from functions.supabase_client import secret  # Supabase secret key
 
+# Routes that don't require a bearer token
+OPEN_ROUTES = frozenset([
+    "/auth/validate-token/",
+    "/auth/login/",
+    "/auth/signup/",
+    "/auth/refresh/",
+    "/add-to-waitlist/",
+    "/auth/google/",
+    "/auth/google/callback/",
+    "/auth/google/callback",
+])
+
+# Tokens that already passed signature verification, keyed by their SHA-256 digest.
+# Each entry expires together with the token's `exp` claim.
+TOKEN_CACHE_MAX_ENTRIES = getattr(settings, 'TOKEN_CACHE_MAX_ENTRIES', 4096)
+TOKEN_CACHE_DEFAULT_TTL = getattr(settings, 'TOKEN_CACHE_DEFAULT_TTL', 60)
+verified_tokens = TTLCache(maxsize=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_DEFAULT_TTL)
+
+
+def token_cache_stats():
+    """
+    Returns hit/miss counters of the verified-token cache.
+    """
+    return verified_tokens.stats()
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verifies and decodes a Supabase access token, reusing earlier verifications of the same token.
+
+    Raises:
+        jwt.ExpiredSignatureError: If the token has expired.
+        jwt.InvalidTokenError: If the token is invalid.
+    """
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    decoded_token = verified_tokens.get(digest)
+    if decoded_token is not None:
+        return decoded_token
+
+    decoded_token = jwt.decode(
+      token, 
+      secret, 
+      algorithms=["HS256"], 
+      options={"verify_aud": False}
+    )
+
+    exp = decoded_token.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else None
+    if ttl is None or ttl > 0:
+        verified_tokens.set(digest, decoded_token, ttl)
+    return decoded_token
+
+
 class TokenValidationMiddleware(MiddlewareMixin):
     def process_request(self, request):
         # Skip validation for open routes
-        open_routes = ["/auth/validate-token/", "/auth/login/", "/auth/signup/", "/auth/refresh/", "/add-to-waitlist/", "/auth/google/", "/auth/google/callback/", "/auth/google/callback"]
-        print("Route: ", request.path)
-        
-        if request.path in open_routes:
+        if request.path in OPEN_ROUTES:
           return None
 
         # Check for Authorization header
@@ -22,16 +79,7 @@ class TokenValidationMiddleware(MiddlewareMixin):
 
         try:
             # Decode the token
-            decoded_token = jwt.decode(
-              token, 
-              secret, 
-              algorithms=["HS256"], 
-              options={"verify_aud": False}
-            )
-            
-            
-            request.decoded_token = decoded_token
-        
+            request.decoded_token = decode_token(token)
         
         except jwt.ExpiredSignatureError:
             raise AuthenticationFailed("Token has expired.")
@@ -39,3 +87,39 @@ class TokenValidationMiddleware(MiddlewareMixin):
             raise AuthenticationFailed("Invalid token.")
 
         # If valid, continue the request
+
+
+# Emits what DBTimingMiddleware measured; point this logger at a JSON/ELK handler to aggregate it.
+db_timing_logger = logging.getLogger("dayboard.db_timing")
+SERVER_TIMING_ENABLED = getattr(settings, 'SERVER_TIMING_ENABLED', True)
+
+
+class DBTimingMiddleware(MiddlewareMixin):
+    """
+    Accounts for the Supabase round trips made while serving each request (see functions/db_metrics.py).
+
+    Adds a `Server-Timing` header with the total and per table/method database time, and logs one
+    JSON line per request with the round-trip count, response bytes and latencies.
+    Round trips made while a streaming response is consumed happen after the headers are sent
+    and are not included.
+    """
+    def process_request(self, request):
+        request.db_metrics = db_metrics.start()
+
+    def process_response(self, request, response):
+        metrics = getattr(request, 'db_metrics', None)
+        db_metrics.stop()
+        if metrics is None:
+            return response
+
+        if SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = metrics.server_timing()
+
+        summary = metrics.summary()
+        db_timing_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **summary,
+        }))
+        return response
@@ -3,6 +3,7 @@ from django.db import models
 from django.utils.text import slugify
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings # For AUTH_USER_MODEL
+from helpers.focus_streaks import streak_fields
 
 # User model
 class User(AbstractUser):
@@ -23,7 +24,11 @@ class User(AbstractUser):
     # User focus session stats
     focus_streak = models.IntegerField(default=0)
     longest_focus_streak = models.IntegerField(default=0)
+    # Run-length record of the days that counted towards a streak (helpers/focus_streaks.py)
+    focus_days = models.JSONField(default=list, blank=True)
+    # All-time totals, kept in step with the user's 'all' FocusStat rollup (helpers/focus_rollups.py)
     total_time = models.IntegerField(default=0)
+    total_focus_sessions = models.IntegerField(default=0)
     # User preferences
     mins_for_streak = models.IntegerField(default=10)
 
@@ -90,17 +95,25 @@ class FocusSession(models.Model):
     entry_date = models.DateField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
-        if self.minutes_focused >= self.user.mins_for_streak:
-            self.user.focus_streak += 1
-            self.user.focus_streak.save()
-
-        if self.flow:
-            self.focus_length = self.flow.total_time
-
-        if self.path:
+        if self.path and self.path.total_time:
             self.focus_length = self.path.total_time
+
+        adding = self._state.adding
         super().save(*args, **kwargs)
 
+        # A new session adds focus time to its day; the streak moves once the day reaches mins_for_streak
+        if adding:
+            user = self.user
+            day_total = FocusSession.objects.filter(user=user, entry_date=self.entry_date).aggregate(total=models.Sum('minutes_focused'))['total'] or 0
+            changes = streak_fields(
+                {'mins_for_streak': user.mins_for_streak, 'longest_focus_streak': user.longest_focus_streak, 'focus_days': user.focus_days},
+                self.entry_date, day_total - self.minutes_focused, day_total,
+            )
+            if changes:
+                for field, value in changes.items():
+                    setattr(user, field, value)
+                user.save(update_fields=list(changes))
+
     def __str__(self):
         return self.focused_on
 
@@ -109,23 +122,22 @@ class FocusSession(models.Model):
 
 
 class FocusStat(models.Model):
+    # Pre-aggregated focus time of a user for one day, one week (starting Monday) or all time ('all', no date).
+    # Kept up to date as sessions are written and rebuilt by `manage.py backfill_focus_rollups`.
+    PERIODS = [('day', 'Day'), ('week', 'Week'), ('all', 'All time')]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    period = models.CharField(max_length=4, choices=PERIODS, default='day')
+    date = models.DateField(blank=True, null=True)
     total_time = models.IntegerField(default=0)
     total_focus_sessions = models.IntegerField(default=0)
-    focus_session = models.ForeignKey(FocusSession, on_delete=models.CASCADE, blank=True, null=True)
-    date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'focus_stats'
-
-
-
-
-
-
-
-
+        constraints = [models.UniqueConstraint(fields=['user', 'period', 'date'], name='unique_focus_stat_period')]
+        indexes = [models.Index(fields=['user', 'period', 'date'])]
 
 
 class Waitlist(models.Model):
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 import uuid
 from django.utils import timezone
+from functions.db_actions import DBActions
+from helpers.focus_rollups import apply_session
 
 # waitlist serializers
 class WaitlistSerializer(serializers.Serializer):
@@ -29,9 +31,59 @@ class UserSerializer(serializers.Serializer):
 
 
 
+# The users columns a user may change themselves; email and password belong to Supabase Auth
+class UserProfileSerializer(serializers.Serializer):
+    first_name = serializers.CharField(max_length=100)
+    last_name = serializers.CharField(max_length=100)
+
+    class Meta:
+        fields = ['first_name', 'last_name']
+
+
+
 class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
     
     class Meta:
         fields = ['email', 'password']
+
+
+# focus session serializers
+class FocusSessionSerializer(serializers.Serializer):
+    id = serializers.UUIDField(read_only=True)
+    user_id = serializers.UUIDField(required=True)
+    focus_length = serializers.IntegerField(required=False, default=25, min_value=0)
+    start_time = serializers.TimeField(required=False, default=None, allow_null=True)
+    focused_on = serializers.CharField(required=False, default='', allow_blank=True, max_length=100)
+    block_id = serializers.UUIDField(required=False, default=None, allow_null=True)
+    path_id = serializers.UUIDField(required=False, default=None, allow_null=True)
+    minutes_focused = serializers.IntegerField(required=True, min_value=0)
+    entry_date = serializers.DateField(required=False, default=None, allow_null=True)
+
+    def save(self, **kwargs):
+        """
+        Writes the session and adds it to the user's day, week and all-time rollups (helpers/focus_rollups.py)
+        in one transaction, so a failed save can be retried without counting the session twice.
+
+        Returns:
+            list: The inserted session row.
+        """
+        db = DBActions(use_admin=True)
+        validated_data = self.validated_data
+        for field in ('user_id', 'block_id', 'path_id'):
+            if validated_data.get(field):
+                validated_data[field] = str(validated_data[field])  # Ensure ids are JSON Serializable
+        if validated_data.get('start_time'):
+            validated_data['start_time'] = validated_data['start_time'].isoformat()
+        # The client's local date, so sessions count towards the day the user saw
+        validated_data['entry_date'] = (validated_data.get('entry_date') or timezone.localdate()).isoformat()
+
+        session, _ = apply_session(
+            validated_data['user_id'], validated_data['entry_date'], validated_data['minutes_focused'],
+            db=db, session=dict(validated_data),
+        )
+        return [session] if session else []
+
+    class Meta:
+        fields = ['id', 'user_id', 'focus_length', 'start_time', 'focused_on', 'block_id', 'path_id', 'minutes_focused', 'entry_date']
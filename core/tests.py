@@ -1,3 +1,739 @@
-from django.test import TestCase
+import json
+import threading
+import time
+import types
+import uuid
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import jwt
+from django.test import Client, SimpleTestCase
+from gotrue.errors import AuthApiError, AuthRetryableError
+
+from functions import db_metrics
+from functions import supabase_client
+from functions.db_actions import DBActions, use_backend
+from functions.fake_supabase import FakeSupabaseClient
+from functions.http_pool import MeteredTransport, PoolSettings, pool_stats
+from functions.workspace_generator import WorkspaceSpec, generate_workspace
+from functions.supabase_client import secret
+from django.core.cache import caches
+from core import middleware
+from helpers import auth_helpers, focus_analytics, focus_rollups, user_helpers
+
+
+def auth_client(user_id):
+    token = jwt.encode({'sub': user_id, 'exp': int(time.time()) + 3600}, secret, algorithm='HS256')
+    return Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+class VerifiedTokenCacheTests(SimpleTestCase):
+    def setUp(self):
+        middleware.verified_tokens.clear()
+
+    def token(self, expires_in, key=secret):
+        return jwt.encode({'sub': str(uuid.uuid4()), 'exp': int(time.time()) + expires_in}, key, algorithm='HS256')
+
+    def test_a_token_is_verified_once(self):
+        token = self.token(3600)
+        with mock.patch.object(middleware.jwt, 'decode', wraps=jwt.decode) as decode:
+            first = middleware.decode_token(token)
+            second = middleware.decode_token(token)
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(first, second)
+
+    def test_cached_tokens_expire_with_their_exp_claim(self):
+        token = self.token(1)
+        middleware.decode_token(token)
+        time.sleep(1.2)
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            middleware.decode_token(token)
+
+    def test_rejected_tokens_are_not_cached(self):
+        for token, error in ((self.token(-10), jwt.ExpiredSignatureError), (self.token(3600, key='not-the-secret'), jwt.InvalidSignatureError)):
+            for _ in range(2):
+                with self.assertRaises(error):
+                    middleware.decode_token(token)
+        self.assertEqual(len(middleware.verified_tokens), 0)
+
+
+class ServerTimingTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSupabaseClient()
+        self.user_id = str(uuid.uuid4())
+        generate_workspace(self.backend, self.user_id, WorkspaceSpec(boards=2, lists=2, cards=2))
+
+    def get_boards(self):
+        with use_backend(self.backend), self.assertLogs('dayboard.db_timing', level='INFO') as logs:
+            response = auth_client(self.user_id).get('/boards/get-boards/')
+        return response, json.loads(logs.records[-1].getMessage())
+
+    def test_request_round_trips_are_reported(self):
+        response, logged = self.get_boards()
+
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[0-9.]+;desc="3 queries", app;dur=[0-9.]+')
+        for name in ('boards.select', 'lists.select', 'cards.select'):
+            self.assertRegex(timing, rf'db\.{name};dur=[0-9.]+;desc="1 call"')
+        self.assertEqual(logged['path'], '/boards/get-boards/')
+        self.assertEqual(logged['status'], 200)
+        self.assertEqual(logged['round_trips'], 3)
+        self.assertEqual(set(logged['calls']), {'boards.select', 'lists.select', 'cards.select'})
+
+    def test_header_can_be_turned_off(self):
+        with mock.patch.object(middleware, 'SERVER_TIMING_ENABLED', False):
+            response, logged = self.get_boards()
+
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(logged['round_trips'], 3)
+
+    def test_round_trips_outside_a_request_are_not_recorded(self):
+        self.get_boards()
+        self.assertIsNone(db_metrics.current())
+        db_metrics.record('boards', 'select', 0.01)
+        self.assertIsNone(db_metrics.current())
+
+    def test_summary_and_header_list_the_slowest_calls(self):
+        metrics = db_metrics.RequestMetrics()
+        metrics.record('cards', 'select', 0.002, size=100)
+        metrics.record('cards', 'select', 0.003, size=50)
+        metrics.record('boards', 'update', 0.010, failed=True)
+        summary = metrics.summary()
+
+        self.assertEqual(summary['round_trips'], 3)
+        self.assertEqual(summary['bytes'], 150)
+        self.assertEqual(summary['db_ms'], 15.0)
+        self.assertEqual(summary['calls']['boards.update'], {'count': 1, 'bytes': 0, 'ms': 10.0, 'errors': 1})
+        self.assertEqual(
+            metrics.server_timing(max_entries=1).split(', ')[::2],
+            ['db;dur=15.0;desc="3 queries"', 'db.boards.update;dur=10.0;desc="1 call"'],
+        )
+
+
+class _RestHandler(BaseHTTPRequestHandler):
+    # Keep-alive PostgREST stand-in answering every read with the same rows
+    protocol_version = 'HTTP/1.1'
+    body = b'[{"id": "1", "name": "Todo"}]'
+
+    def do_GET(self):
+        # postgrest sends an (empty JSON) body with reads; it must be consumed to keep the connection usable
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _RestHandler)
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.transport = MeteredTransport(supabase_client.pool_settings)
+        self.client = supabase_client.PooledClient.create(self.url, supabase_client.service_role_key, transport=self.transport)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_settings_configure_the_pool(self):
+        settings = PoolSettings(max_connections=8, max_keepalive=4, keepalive_expiry=15.0, connect_timeout=2.0, pool_timeout=3.0)
+
+        self.assertEqual(settings.limits, httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=15.0))
+        self.assertEqual(settings.timeout, httpx.Timeout(connect=2.0, read=30.0, write=30.0, pool=3.0))
+        self.assertEqual(self.client.postgrest.session.timeout, supabase_client.pool_settings.timeout)
+
+    def test_connection_outlives_the_postgrest_client(self):
+        self.client.table('boards').select('*').execute()
+        # supabase-py drops its postgrest client after every auth event
+        self.client._postgrest = None
+        response = self.client.table('boards').select('*').execute()
+
+        self.assertEqual(response.data, [{'id': '1', 'name': 'Todo'}])
+        self.assertEqual(self.transport.metrics.requests, 2)
+        self.assertEqual(self.transport.metrics.connections_opened, 1)
+        self.assertEqual(self.transport.metrics.errors, 0)
+        stats = pool_stats()
+        self.assertGreaterEqual(stats['requests'], 2)
+        self.assertGreaterEqual(stats['idle_connections'], 1)
+
+    def test_response_bytes_are_counted_for_the_request(self):
+        metrics = db_metrics.start()
+        try:
+            with use_backend(self.client):
+                DBActions(use_admin=True).get('boards', '1')
+        finally:
+            db_metrics.stop()
+
+        self.assertEqual(metrics.summary()['calls']['boards.select']['bytes'], len(_RestHandler.body))
+
+
+class FocusRollupTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.backend = FakeSupabaseClient()
+        self.backend.seed('users', [{'id': self.user_id, 'email': 'focus@example.com', 'mins_for_streak': 10, 'focus_days': []}])
+
+    def user(self):
+        return next(row for row in self.backend.tables['users'] if row['id'] == self.user_id)
+
+    def rollup(self, period, start=None):
+        row_id = focus_rollups.rollup_id(self.user_id, period, start)
+        return next((row for row in self.backend.tables.get('focus_stats', []) if row['id'] == row_id), {})
+
+    def apply(self, day, minutes):
+        with use_backend(self.backend):
+            return focus_rollups.apply_session(self.user_id, day, minutes)
+
+    def test_sessions_add_up_per_day_week_and_all_time(self):
+        sunday, monday = date(2026, 10, 18), date(2026, 10, 19)
+        self.apply(sunday, 20)
+        self.apply(sunday, 5)
+        self.apply(monday, 30)
+
+        self.assertEqual(self.rollup('day', sunday)['total_time'], 25)
+        self.assertEqual(self.rollup('day', sunday)['total_focus_sessions'], 2)
+        self.assertEqual(self.rollup('day', monday)['total_time'], 30)
+        # Sunday closes a week and Monday opens the next one
+        self.assertEqual(self.rollup('week', date(2026, 10, 12))['total_time'], 25)
+        self.assertEqual(self.rollup('week', monday)['total_time'], 30)
+        self.assertEqual(self.rollup('all')['total_focus_sessions'], 3)
+        self.assertEqual((self.user()['total_time'], self.user()['total_focus_sessions']), (55, 3))
+
+    def test_concurrent_sessions_are_all_counted(self):
+        day = date(2026, 10, 18)
+        threads = [threading.Thread(target=self.apply, args=(day, 5)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.rollup('day', day)['total_time'], 40)
+        self.assertEqual(self.user()['total_focus_sessions'], 8)
+        # Exactly one of them made the day qualify
+        self.assertEqual(self.user()['focus_days'], [['2026-10-18', '2026-10-18']])
+        self.assertEqual(self.backend.round_trips, 8)
+
+    def test_streak_counts_days_that_reach_the_threshold(self):
+        self.apply(date(2026, 10, 15), 6)
+        self.assertEqual(self.user().get('focus_streak', 0), 0)
+        # The second session of the day makes it qualify
+        self.apply(date(2026, 10, 15), 6)
+        self.apply(date(2026, 10, 16), 10)
+        self.apply(date(2026, 10, 16), 10)
+        self.assertEqual(self.user()['focus_streak'], 2)
+        self.assertEqual(self.user()['focus_days'], [['2026-10-15', '2026-10-16']])
+
+        # A day without focus ends the streak
+        self.apply(date(2026, 10, 18), 15)
+        self.assertEqual(self.user()['focus_streak'], 1)
+        self.assertEqual(self.user()['longest_focus_streak'], 2)
+
+    def test_removing_a_session_never_goes_negative(self):
+        day = date(2026, 10, 18)
+        self.apply(day, 10)
+        self.apply(day, -25)
+        self.assertEqual(self.rollup('day', day)['total_time'], 0)
+        self.assertEqual(self.user()['total_time'], 0)
+
+
+class FocusAnalyticsTests(SimpleTestCase):
+    today = date(2026, 10, 18)
+
+    def analytics(self, rows, weeks=4):
+        return focus_analytics.compute_analytics(focus_analytics.SessionColumns(rows), self.today, weeks)
+
+    def test_no_sessions_give_zeroed_figures(self):
+        data = self.analytics([])
+        self.assertEqual((data['sessions'], data['total_time']), (0, 0))
+        self.assertEqual(data['heatmap']['minutes'], [0] * focus_analytics.HEATMAP_DAYS)
+        self.assertEqual(data['distribution'], [[0] * 24] * 7)
+        self.assertEqual(data['weekly_trend']['minutes'], [0] * 4)
+        self.assertEqual(data['daily_trend']['rolling_7d'], [0.0] * 28)
+        self.assertEqual((data['blocks'], data['paths']), ([], []))
+        # Plain Python values, so the response can be rendered
+        json.dumps(data)
+
+    def test_sessions_land_in_their_day_week_and_hour(self):
+        data = self.analytics([
+            {'entry_date': '2026-10-18', 'start_time': '09:30:00', 'minutes_focused': 30, 'block_id': 'b1'},
+            {'entry_date': '2026-10-12', 'start_time': None, 'minutes_focused': 20, 'block_id': 'b1', 'path_id': 'p1'},
+            {'entry_date': '2026-10-11', 'start_time': '23:00:00', 'minutes_focused': 10},
+            # Outside the heatmap and the weekly trend
+            {'entry_date': '2024-01-01', 'start_time': '08:00:00', 'minutes_focused': 5},
+            {'entry_date': '2026-10-25', 'start_time': '08:00:00', 'minutes_focused': 7},
+        ])
+        self.assertEqual(data['heatmap']['minutes'][-8:], [10, 20, 0, 0, 0, 0, 0, 30])
+        # Monday 12th and Sunday 18th share a week; Sunday 11th closes the one before
+        self.assertEqual(data['weekly_trend']['minutes'][-2:], [10, 50])
+        self.assertEqual(data['distribution'][6][9], 30)
+        self.assertEqual(data['distribution'][6][23], 10)
+        self.assertEqual(data['by_hour'][9], 30)
+        self.assertEqual(data['blocks'], [{'id': 'b1', 'total_time': 50, 'sessions': 2}])
+        self.assertEqual(data['paths'], [{'id': 'p1', 'total_time': 20, 'sessions': 1}])
+
+    def test_results_are_cached_until_a_session_is_written(self):
+        user_id = str(uuid.uuid4())
+        backend = FakeSupabaseClient()
+        backend.seed('users', [{'id': user_id, 'focus_days': []}])
+        with use_backend(backend):
+            empty = focus_analytics.get_focus_analytics(user_id, today=self.today)
+            backend.reset_calls()
+            self.assertIs(focus_analytics.get_focus_analytics(user_id, today=self.today), empty)
+            self.assertEqual(backend.round_trips, 1)
+
+            focus_rollups.apply_session(user_id, self.today, 25, session={'user_id': user_id, 'entry_date': self.today.isoformat(), 'minutes_focused': 25})
+            self.assertEqual(focus_analytics.get_focus_analytics(user_id, today=self.today)['total_time'], 25)
+
+
+class FocusSessionViewTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.backend = FakeSupabaseClient()
+        self.backend.seed('users', [{'id': self.user_id, 'email': 'session@example.com', 'mins_for_streak': 10, 'focus_days': []}])
+
+    def post_session(self, minutes):
+        return auth_client(self.user_id).post(
+            '/focus/sessions/',
+            data=json.dumps({'minutes_focused': minutes, 'entry_date': '2026-10-18'}),
+            content_type='application/json',
+        )
+
+    def test_saves_the_session_with_its_rollups(self):
+        with use_backend(self.backend):
+            response = self.post_session(25)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['session'][0]['minutes_focused'], 25)
+        self.assertEqual(len(self.backend.tables['focus_sessions']), 1)
+        self.assertEqual(self.backend.calls_for('apply_focus_session'), 1)
+
+    def test_streak_is_written_with_the_session(self):
+        with use_backend(self.backend):
+            response = self.post_session(25)
+
+        self.assertEqual(response.status_code, 201)
+        user = self.backend.tables['users'][0]
+        self.assertEqual((user['focus_streak'], user['focus_days']), (1, [['2026-10-18', '2026-10-18']]))
+        # No separate write of the streak columns that could fail after the session was saved
+        self.assertEqual(self.backend.round_trips, 1)
+
+    def test_failed_write_saves_nothing(self):
+        def failing_rpc(call):
+            raise ConnectionError("focus_stats unavailable")
+
+        self.backend._execute_rpc = failing_rpc
+        with use_backend(self.backend):
+            response = self.post_session(25)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.backend.tables.get('focus_sessions', []), [])
+        self.assertEqual(self.backend.tables['users'][0]['focus_days'], [])
+
+
+class RebuildRollupTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.backend = FakeSupabaseClient()
+        self.backend.seed('users', [{
+            'id': self.user_id, 'email': 'rebuild@example.com', 'first_name': 'Ada',
+            'mins_for_streak': 10, 'focus_days': [], 'total_time': 999,
+        }])
+        self.backend.seed('focus_sessions', [
+            {'user_id': self.user_id, 'entry_date': day, 'minutes_focused': minutes}
+            for day, minutes in (('2026-10-16', 12), ('2026-10-17', 4), ('2026-10-17', 8), ('2026-10-18', 3))
+        ])
+
+    def user(self):
+        return next(row for row in self.backend.tables['users'] if row['id'] == self.user_id)
+
+    def test_rebuild_writes_only_totals_and_streaks(self):
+        rpc = self.backend.rpc
+
+        def rpc_after_edit(function, params=None, **kwargs):
+            # The user renames themselves while the rebuild runs
+            self.user()['first_name'] = 'Grace'
+            return rpc(function, params, **kwargs)
+
+        self.backend.rpc = rpc_after_edit
+        with use_backend(self.backend):
+            counts = focus_rollups.rebuild_rollups([self.user_id])
+
+        self.assertEqual(counts['sessions'], 4)
+        user = self.user()
+        self.assertEqual((user['total_time'], user['total_focus_sessions']), (27, 4))
+        self.assertEqual(user['focus_days'], [['2026-10-16', '2026-10-17']])
+        self.assertEqual(user['longest_focus_streak'], 2)
+        self.assertEqual(user['first_name'], 'Grace')
+
+    def test_recompute_streaks_after_the_threshold_changed(self):
+        with use_backend(self.backend):
+            focus_rollups.rebuild_rollups([self.user_id])
+            self.user()['mins_for_streak'] = 3
+            focus_rollups.recompute_streaks([self.user_id])
+
+        self.assertEqual(self.user()['focus_days'], [['2026-10-16', '2026-10-18']])
+        self.assertEqual(self.user()['focus_streak'], 3)
+        self.assertEqual(self.user()['total_time'], 27)
+
+
+class ProfileCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.backend = FakeSupabaseClient(latency=0.02)
+        self.backend.seed('users', [{'id': self.user_id, 'email': 'Ada@example.com', 'first_name': 'Ada', 'last_name': 'L'}])
+
+    def get_user(self, user_id=None):
+        with use_backend(self.backend):
+            return user_helpers.get_user(user_id or self.user_id)
+
+    def test_profile_is_read_once(self):
+        with use_backend(self.backend):
+            responses = [auth_client(self.user_id).get('/user/') for _ in range(3)]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertEqual(responses[-1].json()[0]['first_name'], 'Ada')
+        self.assertEqual(self.backend.calls_for('users'), 1)
+        self.assertEqual(user_helpers.user_id_for_email('ada@EXAMPLE.com'), self.user_id)
+
+    def test_concurrent_reads_share_one_request(self):
+        threads = [threading.Thread(target=self.get_user) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.backend.calls_for('users'), 1)
+
+    def test_missing_user_is_cached_until_remembered(self):
+        missing_id = str(uuid.uuid4())
+        self.assertIsNone(self.get_user(missing_id))
+        self.assertIsNone(self.get_user(missing_id))
+        self.assertEqual(self.backend.calls_for('users'), 1)
+
+        user_helpers.remember_user({'id': missing_id, 'first_name': 'Grace'})
+        self.assertEqual(self.get_user(missing_id)['first_name'], 'Grace')
+        self.assertEqual(self.backend.calls_for('users'), 1)
+
+    def test_invalidation_refetches(self):
+        self.get_user()
+        self.backend.tables['users'][0]['first_name'] = 'Grace'
+        user_helpers.invalidate_user(self.user_id)
+
+        self.assertEqual(self.get_user()['first_name'], 'Grace')
+        self.assertEqual(self.backend.calls_for('users'), 2)
+
+    def test_read_overlapping_an_invalidation_is_not_cached(self):
+        execute = self.backend._execute
+
+        def execute_then_write(query):
+            response = execute(query)
+            # The row changes while the read is on its way back
+            user_helpers.invalidate_user(self.user_id)
+            return response
+
+        self.backend._execute = execute_then_write
+        self.get_user()
+        self.backend._execute = execute
+        self.get_user()
+
+        self.assertEqual(self.backend.calls_for('users'), 2)
+
+    def test_shared_cache_alias(self):
+        with mock.patch.object(user_helpers, 'USER_CACHE_ALIAS', 'default'):
+            row = self.get_user()
+            self.assertEqual(caches['default'].get(f'users:profile:{self.user_id}'), row)
+
+            user_helpers.invalidate_user(self.user_id)
+            self.assertIsNone(caches['default'].get(f'users:profile:{self.user_id}'))
+
+
+class UpdateUserTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id = str(uuid.uuid4())
+        self.backend = FakeSupabaseClient()
+        self.backend.seed('users', [{'id': self.user_id, 'email': 'ada@example.com', 'first_name': 'Ada', 'last_name': 'L'}])
+        user_helpers.invalidate_user(self.user_id)
+
+    def put(self, body):
+        with use_backend(self.backend):
+            return auth_client(self.user_id).put('/update_user/', data=json.dumps(body), content_type='application/json')
+
+    def test_only_names_are_written(self):
+        response = self.put({'first_name': 'Grace', 'email': 'other@example.com', 'password': 'hunter22'})
+
+        self.assertEqual(response.status_code, 200)
+        row = self.backend.tables['users'][0]
+        self.assertEqual((row['first_name'], row['last_name'], row['email']), ('Grace', 'L', 'ada@example.com'))
+        self.assertNotIn('password', row)
+        self.assertEqual(user_helpers.get_user(self.user_id)['first_name'], 'Grace')
+
+    def test_requires_a_name(self):
+        self.assertEqual(self.put({'password': 'hunter22'}).status_code, 400)
+        self.assertEqual(self.backend.round_trips, 0)
+
+    def test_failed_write_is_a_json_error(self):
+        table = self.backend.table
+
+        def failing_users_table(name):
+            if name == 'users':
+                raise ConnectionError("users unavailable")
+            return table(name)
+
+        self.backend.table = failing_users_table
+        response = self.put({'first_name': 'Grace'})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json(), {'error': 'Failed to update user'})
+
+
+class FakeSignupAuth:
+    """
+    Stands in for supabase_client.auth with an in-memory user registry.
+
+    `lost_signups` sign-ups register the user but fail with a gateway error, as if the response was lost;
+    `failed_sign_ins` sign-ins fail with a connection error before reaching Supabase.
+    """
+    def __init__(self, lost_signups=0, failed_sign_ins=0, reject_sign_ins=False):
+        self.users = {}
+        self.lost_signups = lost_signups
+        self.failed_sign_ins = failed_sign_ins
+        self.reject_sign_ins = reject_sign_ins
+        self.calls = []
+
+    def _session(self, user_id):
+        return types.SimpleNamespace(access_token=f'access-{user_id}', refresh_token=f'refresh-{user_id}')
+
+    def sign_up(self, credentials):
+        self.calls.append('sign_up')
+        if credentials['email'] in self.users:
+            raise AuthApiError('User already registered', 422, 'user_already_exists')
+        user_id = str(uuid.uuid4())
+        self.users[credentials['email']] = (user_id, credentials['password'])
+        if self.lost_signups:
+            self.lost_signups -= 1
+            raise AuthRetryableError('Bad gateway', 502)
+        return types.SimpleNamespace(user=types.SimpleNamespace(id=user_id), session=None)
+
+    def sign_in_with_password(self, credentials):
+        self.calls.append('sign_in')
+        if self.failed_sign_ins:
+            self.failed_sign_ins -= 1
+            raise AuthRetryableError('Connection reset', 0)
+        user = self.users.get(credentials['email'])
+        if self.reject_sign_ins or not user or user[1] != credentials['password']:
+            raise AuthApiError('Invalid login credentials', 400, 'invalid_credentials')
+        return types.SimpleNamespace(user=types.SimpleNamespace(id=user[0]), session=self._session(user[0]))
+
+
+class SignupLoginTests(SimpleTestCase):
+    credentials = {'email': 'new@example.com', 'password': 'pw123456'}
+
+    def setUp(self):
+        self.backend = FakeSupabaseClient(unique={'users': ['id', 'email']})
+        user_helpers._profiles.clear()
+        user_helpers._emails.clear()
+        for name, value in (('AUTH_RETRY_BASE_DELAY', 0), ('AUTH_RETRY_MAX_DELAY', 0)):
+            patcher = mock.patch.object(auth_helpers, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def use_auth(self, auth):
+        patcher = mock.patch.object(auth_helpers, 'supabase_client', types.SimpleNamespace(auth=auth))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return auth
+
+    def post(self, path, body):
+        with use_backend(self.backend):
+            return Client().post(path, data=json.dumps(body), content_type='application/json')
+
+    def signup(self):
+        return self.post('/auth/signup/', {**self.credentials, 'first_name': 'New', 'last_name': 'User'})
+
+    def test_signup_whose_registration_response_was_lost(self):
+        auth = self.use_auth(FakeSignupAuth(lost_signups=1))
+        response = self.signup()
+
+        self.assertEqual(response.status_code, 201)
+        user_id = auth.users[self.credentials['email']][0]
+        self.assertEqual(response.json()['user'][0]['id'], user_id)
+        self.assertEqual(response.json()['access_token'], f'access-{user_id}')
+        self.assertEqual([row['id'] for row in self.backend.tables['users']], [user_id])
+
+    def test_signup_whose_users_insert_response_was_lost(self):
+        self.use_auth(FakeSignupAuth())
+        execute = self.backend._execute
+        lost = []
+
+        def execute_losing_first_insert(query):
+            response = execute(query)
+            if query.table_name == 'users' and query.method == 'insert' and not lost:
+                lost.append(query)
+                raise httpx.ReadError("connection closed")
+            return response
+
+        self.backend._execute = execute_losing_first_insert
+        response = self.signup()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.backend.tables['users']), 1)
+        self.assertEqual(response.json()['user'][0]['id'], self.backend.tables['users'][0]['id'])
+
+    def test_failed_sign_in_is_reported_over_a_failed_insert(self):
+        self.use_auth(FakeSignupAuth(reject_sign_ins=True))
+        table = self.backend.table
+
+        def failing_users_table(name):
+            if name == 'users':
+                raise ConnectionError("users unavailable")
+            return table(name)
+
+        self.backend.table = failing_users_table
+        response = self.signup()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Failed to login user in Supabase Auth'})
+
+    def test_login_retries_a_transient_failure(self):
+        auth = self.use_auth(FakeSignupAuth())
+        self.assertEqual(self.signup().status_code, 201)
+        auth.failed_sign_ins = 1
+        auth.calls.clear()
+
+        response = self.post('/auth/login/', self.credentials)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user'][0]['email'], self.credentials['email'])
+        self.assertEqual(auth.calls, ['sign_in', 'sign_in'])
+
+    def test_wrong_password_is_not_retried(self):
+        auth = self.use_auth(FakeSignupAuth())
+        self.signup()
+        auth.calls.clear()
+
+        response = self.post('/auth/login/', {**self.credentials, 'password': 'wrong-password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(auth.calls, ['sign_in'])
+
+
+class FakeRefreshAuth:
+    """
+    Stands in for supabase_client.auth: each refresh takes `delay` seconds and rotates the token.
+    """
+    def __init__(self, delay=0.1, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def refresh_session(self, refresh_token):
+        with self._lock:
+            self.calls.append(refresh_token)
+            count = len(self.calls)
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("auth unavailable")
+        return types.SimpleNamespace(session=types.SimpleNamespace(access_token=f'access-{count}', refresh_token=f'refresh-{count}'))
+
+
+def session_token(session_id, expires_in=-60, key=secret):
+    return jwt.encode({'sub': 'user', 'session_id': session_id, 'exp': int(time.time()) + expires_in}, key, algorithm='HS256')
+
+
+class RefreshCoalescingTests(SimpleTestCase):
+    def setUp(self):
+        self.auth = FakeRefreshAuth()
+        patcher = mock.patch.object(auth_helpers, 'supabase_client', types.SimpleNamespace(auth=self.auth))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches['default'].clear()
+        auth_helpers._refreshed.clear()
+
+    def refresh_concurrently(self, count, access_token, refresh_token='refresh-0'):
+        results = []
+
+        def refresh():
+            try:
+                results.append(auth_helpers.refresh_tokens(refresh_token, access_token))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=refresh) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_tabs_of_one_session_share_a_refresh(self):
+        # The tabs' access token has expired, which is why they refresh
+        results = self.refresh_concurrently(6, session_token('session-1'))
+        self.assertEqual(len(self.auth.calls), 1)
+        self.assertEqual({result['refresh_token'] for result in results}, {'refresh-1'})
+
+    def test_refresh_without_a_valid_access_token_is_not_shared(self):
+        self.refresh_concurrently(3, None)
+        self.refresh_concurrently(3, session_token('session-1', key='not-the-secret'))
+        self.assertEqual(len(self.auth.calls), 6)
+
+    def test_failures_reach_every_waiter_and_are_not_reused(self):
+        self.auth.fail = True
+        results = self.refresh_concurrently(4, session_token('session-1'))
+        self.assertEqual(len(self.auth.calls), 1)
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+
+        self.auth.fail = False
+        self.assertEqual(auth_helpers.refresh_tokens('refresh-0', session_token('session-1'))['refresh_token'], 'refresh-2')
+
+    def test_shared_cache_coalesces_across_workers_per_session(self):
+        key = auth_helpers._refresh_key('refresh-0', 'session-1')
+        with mock.patch.object(auth_helpers, 'REFRESH_CACHE_ALIAS', 'default'):
+            # Separate workers don't share the in-process flight, only the cache
+            first = auth_helpers._refresh(key, 'refresh-0')
+            second = auth_helpers._refresh(key, 'refresh-0')
+            # A replay of the rotated token without the session's access token gets nothing cached
+            replayed = auth_helpers.refresh_tokens('refresh-0')
+        self.assertEqual(first, second)
+        self.assertEqual(replayed['refresh_token'], 'refresh-2')
+        self.assertEqual(len(self.auth.calls), 2)
+
+    def test_without_a_shared_cache_results_are_kept_in_the_worker(self):
+        # A tab that wakes up just after the others' refresh finished gets its tokens
+        first = auth_helpers.refresh_tokens('refresh-0', session_token('session-1'))
+        late = auth_helpers.refresh_tokens('refresh-0', session_token('session-1'))
+        self.assertEqual(late, first)
+        self.assertEqual(len(self.auth.calls), 1)
+        # Other sessions don't
+        self.assertEqual(auth_helpers.refresh_tokens('refresh-0', session_token('session-2'))['refresh_token'], 'refresh-2')
+
+    def test_kept_results_expire(self):
+        with mock.patch.object(auth_helpers, 'REFRESH_RESULT_TTL', 0.05):
+            auth_helpers.refresh_tokens('refresh-0', session_token('session-1'))
+            time.sleep(0.1)
+            auth_helpers.refresh_tokens('refresh-0', session_token('session-1'))
+        self.assertEqual(len(self.auth.calls), 2)
+
+    def test_view_shares_refreshes_of_tabs_sending_their_access_token(self):
+        access_token = session_token('session-1')
+        statuses = []
+
+        def post():
+            response = Client(HTTP_AUTHORIZATION=f'Bearer {access_token}').post(
+                '/auth/refresh/', data=json.dumps({'refresh_token': 'refresh-0'}), content_type='application/json',
+            )
+            statuses.append((response.status_code, response.json()['refresh_token']))
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(set(statuses), {(200, 'refresh-1')})
+        self.assertEqual(len(self.auth.calls), 1)
@@ -18,6 +18,11 @@ urlpatterns = [
   
   path('add-to-waitlist/', views.WaitlistView.as_view(), name='add-to-waitlist'),
   
+  # Focus endpoints
+  path('focus/sessions/', views.FocusSessionView.as_view(), name='focus-sessions'),
+  path('focus/stats/', views.FocusStatsView.as_view(), name='focus-stats'),
+  path('focus/analytics/', views.FocusAnalyticsView.as_view(), name='focus-analytics'),
+  
   # Image endpoints
   # path('get-images/', views.GetImagesView.as_view(), name='get-images')
 ]
\ No newline at end of file
@@ -5,7 +5,7 @@ from urllib.parse import urlencode
 from django.conf import settings
 from functions.db_actions import DBActions
 from core.models import User, Waitlist
-from core.serializers import UserLoginSerializer, UserSerializer, WaitlistSerializer
+from core.serializers import FocusSessionSerializer, UserLoginSerializer, UserProfileSerializer, UserSerializer, WaitlistSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import AuthenticationFailed
@@ -13,10 +13,19 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 import jwt
+import logging
 import requests
 from functions.supabase_client import supabase_client, supabase_admin, secret
+from functions.getToken import getTokenFromMiddleware
+from helpers.auth_helpers import AuthFlowError, log_in, refresh_tokens, sign_up
+from helpers.focus_analytics import get_focus_analytics
+from helpers.focus_rollups import get_rollups
+from helpers.focus_streaks import current_streak
+from helpers.user_helpers import get_user, invalidate_user, remember_user
 from django.shortcuts import redirect
 
+logger = logging.getLogger(__name__)
+
 
 # JWT Token validation
 class ValidateTokenView(APIView):
@@ -63,15 +72,15 @@ class UserView(APIView):
         if not user_id:
             raise AuthenticationFailed("Token is missing user information.")
 
-        # Fetch user details from the database
-        response = DBActions(use_admin=True).get('users', user_id)
+        # Fetch user details (from the profile cache, or shared with concurrent requests for the same user)
+        row = get_user(user_id)
 
         # Check if the user exists
-        if not response.data or len(response.data) == 0:
+        if row is None:
             raise AuthenticationFailed("User not found in Supabase.")
 
-        # Return the user data
-        user = response.data
+        # Return the user data, with the streak as of today (it lapses once a day is missed)
+        user = [{**row, 'focus_streak': current_streak(row)}]
         return Response(user)
     
     
@@ -102,61 +111,30 @@ class CreateUserView(APIView):
         try:
             serializer = self.serializer_class(data=request.data)
             if serializer.is_valid():
-                email = serializer.validated_data['email']
-                password = serializer.validated_data['password']
-
-                # Register user with Supabase Auth
-                # print("Registering user with Supabase Auth")
-                response = supabase_client.auth.sign_up({
-                    'email': email,
-                    'password': password,
-                    'options': {
-                        'data': {
-                            'displayName': serializer.validated_data['first_name'] + serializer.validated_data['last_name']
-                        }
-                    }
-                })
-
-                if response and response.user:
-                    user_id = response.user.id  # Get the user's ID from Supabase Auth
-
-                    # Prepare data for users table
-                    data = serializer.validated_data
-                    data.pop('password')  # Remove sensitive data
-                    data['id'] = user_id  # Link user ID from Auth
-
-                    # Insert into the users table - use admin client to bypass RLS
-                    user = DBActions(use_admin=True).create('users', data)
-
-                    login_response = supabase_client.auth.sign_in_with_password({
-                        'email': email,
-                        'password': password
-                    })
-
-                    if login_response and login_response.session:
-                        access_token = login_response.session.access_token
-                        refresh_token = login_response.session.refresh_token
-                        result = {
-                            'user': user.data,
-                            'access_token': access_token,
-                            'refresh_token': refresh_token
-                        }
-                        return Response(result, status=status.HTTP_201_CREATED)
-                    else:
-                        return Response(
-                            {"error": "Failed to login user in Supabase Auth"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                else:
-                    return Response(
-                        {"error": "Failed to sign up user in Supabase Auth"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+                # Prepare data for users table
+                data = dict(serializer.validated_data)
+                email = data['email']
+                password = data.pop('password')  # Remove sensitive data
+
+                # Register user with Supabase Auth, insert the users row and log in (see helpers/auth_helpers.py)
+                try:
+                    user, session = sign_up(email, password, data)
+                except AuthFlowError as e:
+                    return Response({"error": str(e)}, status=e.status)
+
+                result = {
+                    'user': [user],
+                    'access_token': session.access_token,
+                    'refresh_token': session.refresh_token
+                }
+                return Response(result, status=status.HTTP_201_CREATED)
             else:
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             print(f"Failed to create user: {e}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class LoginUser(APIView):
     permission_classes = [AllowAny]
     serializer_class = UserLoginSerializer
@@ -167,38 +145,23 @@ class LoginUser(APIView):
             email = serializer.validated_data['email']
             password = serializer.validated_data['password']
 
-            # Log in the user with Supabase Auth
-            response = supabase_client.auth.sign_in_with_password({
-                'email': email,
-                'password': password
-            })
-
-            # Check if login was successful
-            if response and response.session:
-                user_id = response.user.id  # Supabase Auth User ID
-                
-                # Fetch user data from table
-                user = DBActions(use_admin=True).get('users', user_id)
-
-                # Handle the response correctly
-                if user.data:
-                    # Extract tokens from the session object
-                    access_token = response.session.access_token
-                    refresh_token = response.session.refresh_token 
-
-                    # Return the necessary data
-                    result = {
-                        'user': user.data,  # Data from your 'users' table
-                        'access_token': access_token,
-                        'refresh_token': refresh_token,
-                    }
-                    return Response(result, status=status.HTTP_200_OK)
-            
-            # Handle login failure
-            return Response(
-                {"error": "Failed to login user"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            # Log in the user with Supabase Auth while their profile is read from the users table
+            try:
+                user, session = log_in(email, password)
+            except AuthFlowError:
+                # Handle login failure
+                return Response(
+                    {"error": "Failed to login user"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Return the necessary data
+            result = {
+                'user': [user],  # Data from your 'users' table
+                'access_token': session.access_token,
+                'refresh_token': session.refresh_token,
+            }
+            return Response(result, status=status.HTTP_200_OK)
 
         # Handle invalid serializer data
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -228,20 +191,90 @@ class LogoutUser(APIView):
 
 
 class UpdateUser(APIView):
+  permission_classes = [AllowAny]
   model = User
-  serializer_class = UserSerializer
+  serializer_class = UserProfileSerializer
 
   def put(self, request, *args, **kwargs):
-    serializer = UserSerializer(request.user, data=request.data, partial=True)
-    if serializer.is_valid():
+    user_id = getTokenFromMiddleware(request)
+    serializer = self.serializer_class(data=request.data, partial=True)
+    if not serializer.is_valid():
+      return Response(serializer.errors, status=400)
+    data = serializer.validated_data
+    if not data:
+      return Response({"error": "Nothing to update"}, status=400)
+
+    try:
       # Update user in Supabase - use admin client to bypass RLS
-      data = serializer.validated_data
-      response = DBActions(use_admin=True).update('users', data, request.user.id)
-    #   response = supabase_admin.table('users').update(data).eq('id', request.user.id).execute()
-      if response.status_code == 200:
-        return Response(response.data, status=200)
-      return Response(response.json(), status=response.status_code)
-    return Response(serializer.errors, status=400)
+      response = DBActions(use_admin=True).update('users', data, user_id)
+    #   response = supabase_admin.table('users').update(data).eq('id', user_id).execute()
+    except Exception as e:
+      logger.error(f"Failed to update user {user_id}: {e}")
+      return Response({"error": "Failed to update user"}, status=500)
+    finally:
+      invalidate_user(user_id)
+
+    if response and response.data:
+      remember_user(response.data[0])
+      return Response(response.data, status=200)
+    return Response({"error": "Failed to update user"}, status=400)
+
+
+# Focus session endpoints
+class FocusSessionView(APIView):
+    permission_classes = [AllowAny]
+    serializer_class = FocusSessionSerializer
+
+    def post(self, request):
+        user_id = getTokenFromMiddleware(request)
+
+        data = request.data.copy()
+        data['user_id'] = user_id
+        serializer = self.serializer_class(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = serializer.save()
+            return Response({'message': 'Focus session saved', 'session': session}, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error(f"Failed to save focus session: {e}")
+            return Response({"error": "Failed to save focus session"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class FocusStatsView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        user_id = getTokenFromMiddleware(request)
+
+        # ?days=30&weeks=12: how many of the latest daily and weekly rollups to return
+        try:
+            days = int(request.query_params.get('days', 30))
+            weeks = int(request.query_params.get('weeks', 12))
+        except ValueError:
+            return Response({"error": "days and weeks must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= days <= 366 and 1 <= weeks <= 104):
+            return Response({"error": "days must be 1-366 and weeks 1-104"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_rollups(user_id, days, weeks), status=status.HTTP_200_OK)
+
+
+class FocusAnalyticsView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        user_id = getTokenFromMiddleware(request)
+
+        # ?weeks=12: length of the weekly trend
+        try:
+            weeks = int(request.query_params.get('weeks', 12))
+        except ValueError:
+            return Response({"error": "weeks must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= weeks <= 104:
+            return Response({"error": "weeks must be 1-104"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_focus_analytics(user_id, weeks), status=status.HTTP_200_OK)
 
 
 # Refresh token endpoint
@@ -262,15 +295,17 @@ class RefreshTokenView(APIView):
             if not refresh_token:
                 return JsonResponse({"error": "Refresh token is required"}, status=400)
 
-            # Call Supabase to refresh the session
-            response = supabase_client.auth.refresh_session(refresh_token)
-            
-            # Return the new response.session details
-            return JsonResponse({
-                "access_token": response.session.access_token,
-                "refresh_token": response.session.refresh_token,
-            }, status=status.HTTP_200_OK)
+            # Call Supabase to refresh the session (shared with concurrent refreshes of the same token
+            # by tabs that send their access token, expired or not, along with it)
+            auth_header = request.headers.get('Authorization', '')
+            access_token = auth_header.split(" ", 1)[1] if auth_header.startswith("Bearer ") else None
+            tokens = refresh_tokens(refresh_token, access_token)
 
+            # Return the new session details
+            return JsonResponse(tokens, status=status.HTTP_200_OK)
+
+        except AuthFlowError as e:
+            return JsonResponse({"error": str(e)}, status=e.status)
         except Exception as e:
             # Return error if Supabase call fails or any unexpected error occurs
             return JsonResponse({"error": str(e)}, status=500)
@@ -334,6 +369,7 @@ class GoogleCallback(View):
         try: 
             user = DBActions(use_admin=True).get_by_field('users', 'email', email)
             if user.data:
+                remember_user(user.data[0])
                 # Existing user -> Login using Google ID token
                 login_resp = supabase_client.auth.sign_in_with_id_token({
                     "provider": "google",
@@ -341,7 +377,7 @@ class GoogleCallback(View):
                 })
 
                 if login_resp and login_resp.session:
-                    user_id = user.data.get("id") if isinstance(user.data, dict) else None
+                    user_id = user.data[0].get("id")
                     access_token = login_resp.session.access_token
                     refresh_token = login_resp.session.refresh_token
                     redirect_url = f"{settings.FRONTEND_URL}?user_id={user_id}&access_token={access_token}&refresh_token={refresh_token}"
@@ -374,6 +410,10 @@ class GoogleCallback(View):
                     "first_name": profile.get("given_name"),
                     "last_name": profile.get("family_name"),
                 })
+                if response and response.data:
+                    remember_user(response.data[0])
+                else:
+                    invalidate_user(new_user_resp.user.id)
 
                 # Log the user in now using ID token
                 login_resp = supabase_client.auth.sign_in_with_id_token({
@@ -382,7 +422,7 @@ class GoogleCallback(View):
                 })
 
                 if login_resp and login_resp.session:
-                    user_id = response.data.get("id") if isinstance(response.data, dict) else None
+                    user_id = new_user_resp.user.id
                     access_token = login_resp.session.access_token
                     refresh_token = login_resp.session.refresh_token
                     redirect_url = f"{settings.FRONTEND_URL}?user_id={user_id}&access_token={access_token}&refresh_token={refresh_token}"
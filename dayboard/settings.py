@@ -58,6 +58,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
+    'core.middleware.DBTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'core.middleware.TokenValidationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -94,6 +95,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'dayboard.wsgi.application'
 
+# Serve the board endpoints with the async views in boards/async_views.py.
+# Only worth enabling when running under an ASGI server (dayboard.asgi:application).
+ASYNC_BOARD_VIEWS = config('ASYNC_BOARD_VIEWS', default=False, cast=bool)
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -122,6 +127,44 @@ if not DEBUG:
 AUTH_USER_MODEL = 'core.User'
 
 
+# Board tree cache (helpers/board_cache.py)
+# Set BOARD_CACHE_ALIAS to a shared CACHES alias to keep the cache consistent across gunicorn workers.
+BOARD_CACHE_TTL = config('BOARD_CACHE_TTL', default=30, cast=int)
+BOARD_CACHE_MAX_ENTRIES = config('BOARD_CACHE_MAX_ENTRIES', default=1024, cast=int)
+BOARD_CACHE_ALIAS = config('BOARD_CACHE_ALIAS', default=None)
+# CACHES alias holding the ETag version counters of the board endpoints (helpers/board_versions.py)
+BOARD_VERSION_CACHE_ALIAS = config('BOARD_VERSION_CACHE_ALIAS', default='default')
+
+# User profile cache (helpers/user_helpers.py); set USER_CACHE_ALIAS to a shared CACHES alias across workers.
+# Ids without a users row are cached for USER_CACHE_MISSING_TTL seconds.
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=5 * 60, cast=int)
+USER_CACHE_MISSING_TTL = config('USER_CACHE_MISSING_TTL', default=30, cast=int)
+USER_CACHE_MAX_ENTRIES = config('USER_CACHE_MAX_ENTRIES', default=4096, cast=int)
+USER_CACHE_ALIAS = config('USER_CACHE_ALIAS', default=None)
+
+# Signup/login orchestration (helpers/auth_helpers.py): transient Supabase failures are retried up to
+# AUTH_RETRY_ATTEMPTS times with jittered exponential backoff capped at AUTH_RETRY_MAX_DELAY seconds.
+AUTH_RETRY_ATTEMPTS = config('AUTH_RETRY_ATTEMPTS', default=3, cast=int)
+AUTH_RETRY_BASE_DELAY = config('AUTH_RETRY_BASE_DELAY', default=0.2, cast=float)
+AUTH_RETRY_MAX_DELAY = config('AUTH_RETRY_MAX_DELAY', default=2.0, cast=float)
+AUTH_FLOW_WORKERS = config('AUTH_FLOW_WORKERS', default=8, cast=int)
+# Refreshes of the same token are coalesced and their result is reused for REFRESH_RESULT_TTL seconds:
+# within each worker, or across workers through this CACHES alias, which must be shared by them
+# (e.g. Redis; the default cache here is per-process memory).
+REFRESH_CACHE_ALIAS = config('REFRESH_CACHE_ALIAS', default=None)
+REFRESH_RESULT_TTL = config('REFRESH_RESULT_TTL', default=5, cast=int)
+REFRESH_WAIT_TIMEOUT = config('REFRESH_WAIT_TIMEOUT', default=5.0, cast=float)
+
+# Per-request Supabase round-trip accounting (core.middleware.DBTimingMiddleware).
+# The summary is always logged to the "dayboard.db_timing" logger; this only controls the response header.
+SERVER_TIMING_ENABLED = config('SERVER_TIMING_ENABLED', default=True, cast=bool)
+
+# Per-process cache of the focus analytics (helpers/focus_analytics.py). Entries are keyed by the user's
+# last session write, so the TTL only bounds how long results of stale keys are kept around.
+FOCUS_ANALYTICS_CACHE_TTL = config('FOCUS_ANALYTICS_CACHE_TTL', default=60 * 60, cast=int)
+FOCUS_ANALYTICS_CACHE_MAX_ENTRIES = config('FOCUS_ANALYTICS_CACHE_MAX_ENTRIES', default=1024, cast=int)
+
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
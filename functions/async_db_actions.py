@@ -0,0 +1,193 @@
+import asyncio
+import inspect
+import time
+import weakref
+from postgrest import APIResponse, AsyncPostgrestClient
+from postgrest.utils import AsyncClient as PostgrestHttpClient
+from supabase import AClient, AClientOptions
+from . import db_actions, db_metrics
+from .http_pool import AsyncMeteredTransport
+from .supabase_client import url, anon_key, service_role_key, pool_settings
+
+
+# Async Supabase clients, one pair per running event loop.
+# httpx connections are bound to the loop that opened them, so clients are never shared across loops;
+# the two clients of a loop share one pooled transport (see functions/http_pool.py).
+_clients = weakref.WeakKeyDictionary()
+
+
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    """
+    Async postgrest client whose session sends requests through the loop's AsyncMeteredTransport.
+    """
+    def __init__(self, base_url: str, transport: AsyncMeteredTransport, **kwargs):
+        self.transport = transport
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return PostgrestHttpClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=pool_settings.timeout,
+            follow_redirects=True,
+            transport=self.transport,
+        )
+
+
+class PooledAsyncClient(AClient):
+    """
+    Async counterpart of supabase_client.PooledClient (postgrest only; auth stays on the sync clients).
+    """
+    def __init__(self, supabase_url: str, supabase_key: str, options: AClientOptions = None, transport: AsyncMeteredTransport = None):
+        self.transport = transport or AsyncMeteredTransport(pool_settings)
+        super().__init__(supabase_url, supabase_key, options)
+
+    @classmethod
+    async def create(cls, supabase_url: str, supabase_key: str, options: AClientOptions = None, transport: AsyncMeteredTransport = None):
+        client = cls(supabase_url, supabase_key, options, transport)
+        client.options.headers.update(client._get_auth_headers())
+        return client
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return PooledAsyncPostgrestClient(rest_url, self.transport, headers=headers, schema=schema, verify=verify, proxy=proxy)
+
+
+async def get_async_client(use_admin: bool = False):
+    """
+    Returns the async Supabase client for the running event loop, creating it on first use.
+
+    Args:
+        use_admin (bool): If True, returns the service-role client (bypasses RLS).
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = {'transport': AsyncMeteredTransport(pool_settings)}
+    clients = _clients[loop]
+    if use_admin not in clients:
+        options = AClientOptions(postgrest_client_timeout=pool_settings.timeout)
+        clients[use_admin] = await PooledAsyncClient.create(
+            url, service_role_key if use_admin else anon_key, options, clients['transport'],
+        )
+    return clients[use_admin]
+
+
+class AsyncQuery(db_actions.Query):
+    """
+    Query whose execute() and first() are coroutines; created with `AsyncDBActions.query(table)`.
+    """
+    async def execute(self):
+        return await self.db._execute(self.table, 'select', self.build(await self.db._table(self.table)))
+
+    async def first(self):
+        response = await self.limit(1).execute()
+        return response.data[0] if response and response.data else None
+
+    async def all(self, page_size: int = db_actions.MAX_ROWS):
+        rows = []
+        while True:
+            response = await self._page(len(rows), page_size).execute()
+            if response is None:
+                return None
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                response.data = rows
+                return response
+
+
+class AsyncDBActions:
+    """
+AsyncDBActions mirrors DBActions on top of the async Supabase/postgrest client,
+so ASGI views can await queries and run independent ones concurrently with asyncio.gather.
+
+A backend plugged in with `db_actions.set_backend`/`use_backend` is honoured as well;
+its `execute()` may return either a response or an awaitable.
+
+## Methods:
+    - create(table: str, data: dict)
+    - update(table: str, data: dict, id: str)
+    - delete(table: str, id: str)
+    - query(table: str):
+        Starts a composable AsyncQuery (see db_actions.Query); await its execute().
+    - get(table: str, id: str)
+    - get_many(table: str, field: str, value: str)
+    - get_by_field(table: str, field: str, value: str)
+    - get_where(table: str, filters: dict, columns: str = '*')
+    - get_page(table: str, field: str, value: str, limit: int, after: tuple = None, columns: str = '*')
+    - get_in(table: str, field: str, values: list, columns: str = '*'):
+        Fetches every IN_CHUNK_SIZE chunk of values concurrently, each paged past MAX_ROWS rows;
+        no values give an empty response without a round trip.
+    """
+    def __init__(self, use_admin: bool = False):
+        """
+        Args:
+            use_admin (bool): If True, uses the admin client (bypasses RLS).
+                            Default False uses the authenticated user client.
+        """
+        self.use_admin = use_admin
+        self.supabase = db_actions.get_backend()
+
+    async def _table(self, table: str):
+        if self.supabase is None:
+            self.supabase = await get_async_client(self.use_admin)
+        return self.supabase.table(table)
+
+    async def _execute(self, table: str, method: str, builder):
+        started = time.perf_counter()
+        received = db_metrics.receiving()
+        response = None
+        try:
+            response = builder.execute()
+            if inspect.isawaitable(response):
+                response = await response
+            return response
+        finally:
+            db_metrics.record(table, method, time.perf_counter() - started, received, failed=response is None)
+
+    async def create(self, table: str, data: dict):
+        return await self._execute(table, 'insert', (await self._table(table)).insert(data))
+
+    async def update(self, table: str, data: dict, id: str):
+        return await self._execute(table, 'update', (await self._table(table)).update(data).eq('id', id))
+
+    async def delete(self, table: str, id: str):
+        return await self._execute(table, 'delete', (await self._table(table)).delete().eq('id', id))
+
+    def query(self, table: str) -> AsyncQuery:
+        return AsyncQuery(self, table)
+
+    async def get(self, table: str, id: str):
+        return await self.query(table).eq('id', id).execute()
+
+    async def get_many(self, table: str, field: str, value: str):
+        return await self.query(table).eq(field, value).execute()
+
+    async def get_by_field(self, table: str, field: str, value: str):
+        return await self.query(table).eq(field, value).execute()
+
+    async def get_where(self, table: str, filters: dict, columns: str = '*'):
+        query = self.query(table).select(columns)
+        for field, value in filters.items():
+            query = query.eq(field, value)
+        return await query.execute()
+
+    async def get_page(self, table: str, field: str, value: str, limit: int, after: tuple = None, columns: str = '*'):
+        query = self.query(table).select(columns).eq(field, value)
+        if after:
+            created_at, record_id = after
+            query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt."{record_id}")')
+        return await query.order('created_at').order('id').limit(limit).execute()
+
+    async def get_in(self, table: str, field: str, values: list, columns: str = '*'):
+        values = list(values)
+        if not values:
+            return APIResponse(data=[], count=None)
+        chunks = [values[start:start + db_actions.IN_CHUNK_SIZE] for start in range(0, len(values), db_actions.IN_CHUNK_SIZE)]
+        responses = await asyncio.gather(*[
+            self.query(table).select(columns).in_(field, chunk).all() for chunk in chunks
+        ])
+        if any(chunk_response is None for chunk_response in responses):
+            return None
+        response = responses[-1]
+        response.data = [row for chunk_response in responses for row in (chunk_response.data or [])]
+        return response
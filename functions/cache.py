@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A small thread-safe LRU cache whose entries expire after a time-to-live.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept; the least recently used entry is evicted first.
+        ttl (float): Default lifetime of an entry in seconds.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that found nothing (or an expired entry).
+
+    ## Methods:
+        - get(key, default=None):
+            Returns the cached value, or default when missing or expired.
+        - set(key, value, ttl=None):
+            Stores a value; `ttl` overrides the default lifetime for this entry.
+        - delete(key):
+            Removes an entry if present.
+        - clear():
+            Removes every entry.
+        - stats():
+            Returns hit/miss counters and the current size.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._data),
+            }
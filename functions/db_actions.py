@@ -1,5 +1,199 @@
+import time
+from contextlib import contextmanager
+from postgrest import APIResponse
+from . import db_metrics
 from .supabase_client import supabase_client, supabase_admin
 
+
+# Backend override used instead of the Supabase clients when set.
+# Any object exposing `table(name)` with the postgrest request-builder chain
+# (select/eq/insert/update/delete/.../execute) can be plugged in, e.g. FakeSupabaseClient.
+_backend = None
+
+# Maximum number of values sent in one `in` filter, keeps request URLs well under proxy limits.
+IN_CHUNK_SIZE = 100
+
+# Maximum number of rows sent in one bulk write.
+BATCH_CHUNK_SIZE = 500
+
+# PostgREST returns at most this many rows per response (Supabase's default `max_rows`);
+# reads that may match more must page with Query.all().
+MAX_ROWS = 1000
+
+
+def set_backend(client):
+    """
+    Routes every DBActions instance created afterwards to the given client.
+    Pass None to go back to the Supabase clients.
+    """
+    global _backend
+    _backend = client
+
+
+def get_backend():
+    """
+    Returns the current backend override, or None when the Supabase clients are used.
+    """
+    return _backend
+
+
+@contextmanager
+def use_backend(client):
+    """
+    Context manager that plugs in a backend for the duration of the block.
+    """
+    previous = _backend
+    set_backend(client)
+    try:
+        yield client
+    finally:
+        set_backend(previous)
+
+
+class Query:
+    """
+Query builds a select against one table step by step and runs it as a single request.
+Created with `DBActions.query(table)`; every method returns the query so calls can be chained.
+
+    db.query('cards').select('id', 'title', 'list_id').in_('list_id', ids).order('created_at').limit(50).execute()
+
+## Methods:
+    - select(*columns): Columns to return (default every column).
+    - eq / neq / gt / gte / lt / lte(column, value): Comparison filters.
+    - in_(column, values): Column matches any of the values.
+    - between(column, low, high): low <= column <= high.
+    - is_null(column) / not_null(column)
+    - like(column, pattern): SQL LIKE pattern.
+    - or_(expression): PostgREST logic tree, e.g. 'a.gt.1,and(a.eq.1,b.gt.2)'.
+    - order(column, desc=False): Adds a sort key; may be called several times.
+    - limit(count) / range(start, end): Bounds the rows returned (range is inclusive).
+    - count(): Also return the total number of matching rows in `response.count`.
+    - execute(): Runs the query; returns None when no client is available.
+    - first(): Runs the query with limit 1 and returns the row or None.
+    - all(page_size=MAX_ROWS): Runs the query page by page and returns every matching row.
+    """
+    def __init__(self, db, table: str):
+        self.db = db
+        self.table = table
+        self._columns = '*'
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._range = None
+        self._count = None
+
+    def select(self, *columns: str):
+        names = [name.strip() for column in columns for name in column.split(',') if name.strip()]
+        self._columns = ','.join(names) or '*'
+        return self
+
+    def _filter(self, method: str, *args):
+        self._filters.append((method, args))
+        return self
+
+    def eq(self, column: str, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column: str, value):
+        return self._filter('neq', column, value)
+
+    def gt(self, column: str, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column: str, value):
+        return self._filter('gte', column, value)
+
+    def lt(self, column: str, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column: str, value):
+        return self._filter('lte', column, value)
+
+    def in_(self, column: str, values):
+        return self._filter('in_', column, list(values))
+
+    def between(self, column: str, low, high):
+        return self.gte(column, low).lte(column, high)
+
+    def is_null(self, column: str):
+        return self._filter('is_', column, 'null')
+
+    def not_null(self, column: str):
+        return self._filter('filter', column, 'not.is', 'null')
+
+    def like(self, column: str, pattern: str):
+        return self._filter('like', column, pattern)
+
+    def or_(self, expression: str):
+        return self._filter('or_', expression)
+
+    def order(self, column: str, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        self._range = (start, end)
+        return self
+
+    def count(self, method: str = 'exact'):
+        self._count = method
+        return self
+
+    def build(self, table_builder):
+        """
+        Applies the query to a postgrest table builder (`client.table(name)`) and returns the request builder.
+        """
+        builder = table_builder.select(self._columns, count=self._count) if self._count else table_builder.select(self._columns)
+        for method, args in self._filters:
+            builder = getattr(builder, method)(*args)
+        for column, desc in self._order:
+            builder = builder.order(column, desc=desc)
+        if self._range:
+            builder = builder.range(*self._range)
+        elif self._limit is not None:
+            builder = builder.limit(self._limit)
+        return builder
+
+    def execute(self):
+        if not self.db.supabase:
+            return None
+        return self.db._execute(self.table, 'select', self.build(self.db.supabase.table(self.table)))
+
+    def first(self):
+        response = self.limit(1).execute()
+        return response.data[0] if response and response.data else None
+
+    def _page(self, start: int, page_size: int):
+        # Pages need a total order, so id breaks ties between the query's own sort keys
+        if all(column != 'id' for column, _ in self._order):
+            self._order.append(('id', False))
+        self._range = (start, start + page_size - 1)
+        return self
+
+    def all(self, page_size: int = MAX_ROWS):
+        """
+        Runs the query `page_size` rows at a time until a short page comes back, since a single
+        response stops at MAX_ROWS rows. Costs one round trip per page.
+
+        Returns:
+            The last response, with `data` holding the rows of every page; None when no client is available.
+        """
+        rows = []
+        while True:
+            response = self._page(len(rows), page_size).execute()
+            if response is None:
+                return None
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                response.data = rows
+                return response
+
+
 class DBActions:
     """
 DBActions class provides methods to interact with a Supabase database.
@@ -22,6 +216,22 @@ Attributes:
         Retrieves an entry from the given table with the specified id.
     - list(table: str):
         Retrieves all entries from the given table.
+    - query(table: str):
+        Starts a composable Query (column projection, filters, ordering, limits, counting).
+    - get_in(table: str, field: str, values: list, columns: str = '*'):
+        Retrieves all entries from the given table whose field matches any of the values.
+    - get_where(table: str, filters: dict, columns: str = '*'):
+        Retrieves the entries matching every field/value pair in filters.
+    - get_page(table: str, field: str, value: str, limit: int, after: tuple = None, columns: str = '*'):
+        Retrieves one keyset page of the entries matching field = value, ordered by (created_at, id).
+    - get_by_prefix(table: str, field: str, prefix: str, columns: str = '*'):
+        Retrieves the entries whose field starts with the given prefix.
+    - rpc(function: str, params: dict):
+        Calls a Postgres function (see supabase/migrations).
+    - batch_update(table: str, updates: list):
+        Writes some columns of many existing rows with chunked bulk updates and returns per-row results.
+    - upsert(table: str, rows: list):
+        Inserts or replaces many complete rows with chunked bulk upserts and returns per-row results.
     """
     supabase = None
     def __init__(self, use_admin: bool = False):
@@ -32,14 +242,33 @@ Attributes:
             use_admin (bool): If True, uses the admin client (bypasses RLS). 
                             Default False uses the authenticated user client.
         
+        If a backend was plugged in with `set_backend`/`use_backend`, it is used instead
+        of the Supabase clients.
+        
         If the client instance is not available, an exception is caught and the
         supabase attribute is set to None.
         """
         try:
-            self.supabase = supabase_admin if use_admin else supabase_client
+            if _backend is not None:
+                self.supabase = _backend
+            else:
+                self.supabase = supabase_admin if use_admin else supabase_client
         except Exception as e:
             print(f"Failed to initialize supabase client: {e}")
             self.supabase = None
+    
+    def _execute(self, table: str, method: str, builder):
+        """
+        Sends the request and records the round trip in the current request's metrics (see db_metrics).
+        """
+        started = time.perf_counter()
+        received = db_metrics.receiving()
+        response = None
+        try:
+            response = builder.execute()
+            return response
+        finally:
+            db_metrics.record(table, method, time.perf_counter() - started, received, failed=response is None)
         
     def create(self, table: str, data: dict):
         """
@@ -53,7 +282,7 @@ Attributes:
             The response from the Supabase server, or None if the server is not available.
         """
         if self.supabase:
-            response = self.supabase.table(table).insert(data).execute()
+            response = self._execute(table, 'insert', self.supabase.table(table).insert(data))
             return response
         return None
     
@@ -70,7 +299,7 @@ Attributes:
             The response from the Supabase server, or None if the server is not available.
         """
         if self.supabase:
-            response = self.supabase.table(table).update(data).eq('id', id).execute()
+            response = self._execute(table, 'update', self.supabase.table(table).update(data).eq('id', id))
             return response
         return None
     
@@ -88,10 +317,22 @@ Attributes:
         """
 
         if self.supabase:
-            response = self.supabase.table(table).delete().eq('id', id).execute()
+            response = self._execute(table, 'delete', self.supabase.table(table).delete().eq('id', id))
             return response
         return None
     
+    def query(self, table: str) -> Query:
+        """
+        Starts a composable query on the given table (see Query).
+        
+        Args:
+            table (str): The name of the table to query.
+        
+        Returns:
+            Query: The query builder; nothing is sent until execute() or first().
+        """
+        return Query(self, table)
+    
     def get(self, table: str, id: str):
         """
         Retrieve a record from the specified table by its ID.
@@ -102,10 +343,7 @@ Attributes:
             dict or None: The response from the database if the query is successful, otherwise None.
         """
         
-        if self.supabase:
-            response = self.supabase.table(table).select().eq('id', id).execute()
-            return response
-        return None
+        return self.query(table).eq('id', id).execute()
     
     def get_many(self, table: str, field: str, value: str):
         """
@@ -119,10 +357,7 @@ Attributes:
         Returns:
             dict - or None: The response from the database if the query is successful, otherwise None.
         """
-        if self.supabase:
-            response = self.supabase.table(table).select().eq(field, value).execute()
-            return response
-        return None
+        return self.query(table).eq(field, value).execute()
     
     def get_by_field(self, table: str, field: str, value: str):
         """
@@ -136,30 +371,166 @@ Attributes:
         Returns:
             dict or None: The response from the database if the query is successful, otherwise None.
         """
+        return self.query(table).eq(field, value).execute()
+    
+    def get_in(self, table: str, field: str, values: list, columns: str = '*'):
+        """
+        Retrieves all entries from the given table whose field matches any of the given values.
+        Used to fetch children of many parents in a single round trip (one per IN_CHUNK_SIZE values,
+        plus one per further MAX_ROWS rows matched by a chunk).
+        
+        Args:
+            table (str): The name of the table to query.
+            field (str): The field to filter the entries by.
+            values (list): The values to match the field against.
+        
+        Returns:
+            dict - or None: The response from the database if the query is successful, otherwise None.
+            No values match nothing, so they get an empty response without a round trip.
+        """
         if self.supabase:
-            response = self.supabase.table(table).select().eq(field, value).execute()
+            values = list(values)
+            if not values:
+                return APIResponse(data=[], count=None)
+            response = None
+            rows = []
+            for start in range(0, len(values), IN_CHUNK_SIZE):
+                chunk = values[start:start + IN_CHUNK_SIZE]
+                response = self.query(table).select(columns).in_(field, chunk).all()
+                if response is None:
+                    return None
+                rows.extend(response.data or [])
+            response.data = rows
             return response
         return None
     
-    def batch_update(self, table: str, updates: list):
+    def get_where(self, table: str, filters: dict, columns: str = '*'):
+        """
+        Retrieves the entries from the given table matching every field/value pair.
+        
+        Args:
+            table (str): The name of the table to query.
+            filters (dict): Field -> value equality filters, combined with AND.
+        
+        Returns:
+            dict - or None: The response from the database if the query is successful, otherwise None.
+        """
+        query = self.query(table).select(columns)
+        for field, value in filters.items():
+            query = query.eq(field, value)
+        return query.execute()
+    
+    def get_page(self, table: str, field: str, value: str, limit: int, after: tuple = None, columns: str = '*'):
+        """
+        Retrieves one page of the entries with the specified field and value, ordered by (created_at, id).
+        Pages are keyset based, so fetching a later page costs the same as the first one.
+        
+        Args:
+            table (str): The name of the table to query.
+            field (str): The field to filter the entries by.
+            value (str): The value to filter the entries by.
+            limit (int): The maximum number of entries to return.
+            after (tuple, optional): The (created_at, id) of the last entry of the previous page.
+        
+        Returns:
+            dict - or None: The response from the database if the query is successful, otherwise None.
+        """
+        query = self.query(table).select(columns).eq(field, value)
+        if after:
+            created_at, record_id = after
+            query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt."{record_id}")')
+        return query.order('created_at').order('id').limit(limit).execute()
+    
+    def get_by_prefix(self, table: str, field: str, prefix: str, columns: str = '*'):
+        """
+        Retrieves the entries from the given table whose field starts with the given prefix.
+        `_` in the prefix acts as a single-character wildcard, so callers should re-check matches.
+        
+        Args:
+            table (str): The name of the table to query.
+            field (str): The field to match the prefix against.
+            prefix (str): The prefix to look for.
+            columns (str): Comma-separated columns to return. Defaults to every column.
+        
+        Returns:
+            dict - or None: The response from the database if the query is successful, otherwise None.
+        """
+        return self.query(table).select(columns).like(field, f"{prefix}%").execute()
+    
+    def rpc(self, function: str, params: dict, table: str = None):
+        """
+        Calls a Postgres function exposed by PostgREST (see supabase/migrations).
+        
+        Args:
+            function (str): The name of the function.
+            params (dict): Its named arguments.
+            table (str, optional): The table it writes, for the request metrics (defaults to the function name).
+        
+        Returns:
+            The response from the Supabase server, or None if the server is not available.
+        """
+        if self.supabase:
+            return self._execute(table or function, function, self.supabase.rpc(function, params))
+        return None
+    
+    def _chunked_results(self, updates: list, chunk_size: int, write):
+        # Sends the rows that have an id in chunks through write(rows) and maps the returned rows back by id
+        results = [None] * len(updates)
+        indexes = []
+        for index, update_data in enumerate(updates):
+            if 'id' not in update_data:
+                results[index] = {'id': None, 'ok': False, 'data': None, 'error': "Missing 'id'"}
+            else:
+                indexes.append(index)
+        
+        for start in range(0, len(indexes), chunk_size):
+            chunk = indexes[start:start + chunk_size]
+            rows = [dict(updates[index]) for index in chunk]
+            try:
+                response = write(rows)
+                written = {str(row['id']): row for row in (response.data or [])}
+                for index, row in zip(chunk, rows):
+                    data = written.get(str(row['id']))
+                    results[index] = {'id': row['id'], 'ok': data is not None, 'data': data, 'error': None}
+            except Exception as e:
+                for index, row in zip(chunk, rows):
+                    results[index] = {'id': row['id'], 'ok': False, 'data': None, 'error': str(e)}
+        
+        return results
+    
+    def batch_update(self, table: str, updates: list, chunk_size: int = BATCH_CHUNK_SIZE):
         """
-        Updates multiple records in a single call.
+        Updates multiple existing records with one request per chunk instead of one request per row.
+        
+        Each row only writes the columns it carries, like `update()` does: send the id and the changed
+        columns, never a row read earlier, so concurrent edits of other columns are kept. Runs through
+        the `bulk_update` Postgres function (supabase/migrations). Ids that don't exist are reported
+        as failed rather than inserted. The input dicts are not modified.
         
         Args:
             table (str): The name of the table to update.
-            updates (list): List of dicts, each containing 'id' and other fields to update.
-                           Example: [{'id': '123', 'position': 3}, {'id': '456', 'position': 4}]
+            updates (list): List of dicts, each containing 'id' and the columns to write.
+                           Example: [{'id': '123', 'rank': 'i'}, {'id': '456', 'rank': 'k', 'list_id': '9'}]
+            chunk_size (int): Maximum number of rows sent per request.
         
         Returns:
-            list: List of responses from Supabase for each update.
+            list: One result per input row, in input order:
+                  {'id': ..., 'ok': bool, 'data': row or None, 'error': str or None}
         """
         if not self.supabase or not updates:
             return None
+        return self._chunked_results(updates, chunk_size, lambda rows: self.rpc('bulk_update', {'p_table': table, 'p_rows': rows}, table))
+    
+    def upsert(self, table: str, rows: list, chunk_size: int = BATCH_CHUNK_SIZE):
+        """
+        Inserts or replaces multiple complete records with one bulk upsert on 'id' per chunk.
         
-        responses = []
-        for update_data in updates:
-            record_id = update_data.pop('id')
-            response = self.supabase.table(table).update(update_data).eq('id', record_id).execute()
-            responses.append(response)
+        New rows go through the insert path, so every row must carry all the columns the table requires;
+        use batch_update to change some columns of existing rows.
         
-        return responses
\ No newline at end of file
+        Returns:
+            list: One result per input row, in input order (see batch_update).
+        """
+        if not self.supabase or not rows:
+            return None
+        return self._chunked_results(rows, chunk_size, lambda chunk: self._execute(table, 'upsert', self.supabase.table(table).upsert(chunk, on_conflict='id')))
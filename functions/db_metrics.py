@@ -0,0 +1,146 @@
+import threading
+import time
+from contextvars import ContextVar
+
+
+# Per-request accounting of the database round trips made through DBActions/AsyncDBActions.
+# DBTimingMiddleware starts a RequestMetrics for every request; code running outside a request
+# (management commands, background threads) has no current metrics and records nothing.
+_current = ContextVar('db_metrics', default=None)
+
+# Counts the response bytes of the round trip being made in this context. The transports of
+# functions/http_pool.py add to it as they read the body, so sizes cost nothing to measure.
+_received = ContextVar('db_received', default=None)
+
+
+class RequestMetrics:
+    """
+    Collects the round trips of one request, grouped by table and method.
+
+    Attributes:
+        started (float): perf_counter() value when the request started.
+        calls (dict): (table, method) -> {'count', 'bytes', 'seconds', 'errors'}.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, table: str, method: str, seconds: float, size: int = 0, failed: bool = False):
+        with self._lock:
+            entry = self.calls.setdefault((table, method), {'count': 0, 'bytes': 0, 'seconds': 0.0, 'errors': 0})
+            entry['count'] += 1
+            entry['bytes'] += size
+            entry['seconds'] += seconds
+            entry['errors'] += int(failed)
+
+    @property
+    def round_trips(self) -> int:
+        return sum(entry['count'] for entry in self.calls.values())
+
+    @property
+    def bytes(self) -> int:
+        return sum(entry['bytes'] for entry in self.calls.values())
+
+    @property
+    def seconds(self) -> float:
+        return sum(entry['seconds'] for entry in self.calls.values())
+
+    def summary(self) -> dict:
+        """
+        Returns the totals and the per table/method breakdown, with times in milliseconds.
+        """
+        with self._lock:
+            calls = {
+                f"{table}.{method}": {
+                    'count': entry['count'],
+                    'bytes': entry['bytes'],
+                    'ms': round(entry['seconds'] * 1000, 2),
+                    'errors': entry['errors'],
+                }
+                for (table, method), entry in sorted(self.calls.items())
+            }
+        return {
+            'round_trips': sum(call['count'] for call in calls.values()),
+            'bytes': sum(call['bytes'] for call in calls.values()),
+            'db_ms': round(sum(call['ms'] for call in calls.values()), 2),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'calls': calls,
+        }
+
+    def server_timing(self, max_entries: int = 10) -> str:
+        """
+        Formats the metrics as a Server-Timing header value, e.g.
+        `db;dur=12.5;desc="3 queries", db.boards.select;dur=4.1;desc="1 call"`.
+        The slowest max_entries table/method pairs are listed after the total.
+        """
+        summary = self.summary()
+        queries = 'query' if summary['round_trips'] == 1 else 'queries'
+        metrics = [
+            f'db;dur={summary["db_ms"]};desc="{summary["round_trips"]} {queries}"',
+            f'app;dur={summary["total_ms"]}',
+        ]
+        slowest = sorted(summary['calls'].items(), key=lambda item: item[1]['ms'], reverse=True)[:max_entries]
+        for name, call in slowest:
+            plural = 'call' if call['count'] == 1 else 'calls'
+            metrics.append(f'db.{name};dur={call["ms"]};desc="{call["count"]} {plural}"')
+        return ', '.join(metrics)
+
+
+def start() -> RequestMetrics:
+    """
+    Starts collecting round trips in the current context and returns the collector.
+    """
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def stop():
+    _current.set(None)
+
+
+def current() -> RequestMetrics:
+    """
+    Returns the metrics of the request being served, or None outside a request.
+    """
+    return _current.get()
+
+
+class Received:
+    """
+    Response bytes received by one round trip.
+    """
+    __slots__ = ('bytes',)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+def receiving():
+    """
+    Starts counting the response bytes of a round trip made in the current context.
+    Returns the counter, or None outside a request (nothing is counted then).
+    """
+    if _current.get() is None:
+        return None
+    counter = Received()
+    _received.set(counter)
+    return counter
+
+
+def count_received(size: int):
+    # Called by the transports for every chunk of a response body read
+    counter = _received.get()
+    if counter is not None:
+        counter.bytes += size
+
+
+def record(table: str, method: str, seconds: float, received: Received = None, failed: bool = False):
+    """
+    Records one round trip in the current request, if any, with the bytes counted by `received`.
+    """
+    _received.set(None)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.record(table, method, seconds, received.bytes if received else 0, failed)
@@ -0,0 +1,492 @@
+import copy
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from postgrest.exceptions import APIError
+
+
+class FakeResponse:
+    """
+    Mirrors the parts of postgrest's APIResponse that the codebase reads.
+
+    Attributes:
+        data (list): The rows returned by the query.
+        count (int | None): The total row count when requested with `count='exact'`.
+    """
+    def __init__(self, data: list, count: int = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """
+    An in-memory stand-in for postgrest's request builders.
+
+    Supports the same chain the codebase uses against Supabase:
+    `select/insert/upsert/update/delete`, the common filters, `order`, `limit`,
+    `range` and finally `execute()`, which counts as one round trip.
+    """
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self.client = client
+        self.table_name = table
+        self.method = 'select'
+        self.payload = None
+        self.columns = None
+        self.count = None
+        self.on_conflict = 'id'
+        self.filters = []
+        self.ordering = []
+        self.offset_value = 0
+        self.limit_value = None
+
+    # Operations
+    def select(self, *columns: str, count: str = None, **kwargs):
+        self.method = 'select'
+        self.columns = self._parse_columns(columns)
+        self.count = count
+        return self
+
+    def insert(self, data, **kwargs):
+        self.method = 'insert'
+        self.payload = data
+        return self
+
+    def upsert(self, data, on_conflict: str = '', **kwargs):
+        self.method = 'upsert'
+        self.payload = data
+        self.on_conflict = on_conflict or 'id'
+        return self
+
+    def update(self, data: dict, **kwargs):
+        self.method = 'update'
+        self.payload = data
+        return self
+
+    def delete(self, **kwargs):
+        self.method = 'delete'
+        return self
+
+    # Filters
+    def eq(self, column: str, value):
+        return self._filter(column, lambda v: v is not None and _same(v, value))
+
+    def neq(self, column: str, value):
+        return self._filter(column, lambda v: v is not None and not _same(v, value))
+
+    def gt(self, column: str, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column: str, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column: str, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column: str, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def in_(self, column: str, values):
+        wanted = {str(value) for value in values}
+        return self._filter(column, lambda v: str(v) in wanted)
+
+    def is_(self, column: str, value):
+        if value in (None, 'null'):
+            return self._filter(column, lambda v: v is None)
+        return self._filter(column, lambda v: v is value)
+
+    def or_(self, filters: str, **kwargs):
+        # PostgREST logic tree, e.g. 'a.gt.1,and(a.eq.1,b.gt."x")'
+        self.filters.append((None, _parse_logic('or', filters)))
+        return self
+
+    def filter(self, column: str, operator: str, criteria: str):
+        # Raw PostgREST filter, e.g. filter('due', 'not.is', 'null')
+        predicate = _parse_condition(f'{column}.{operator}.{criteria}')
+        self.filters.append((None, predicate))
+        return self
+
+    def like(self, column: str, pattern: str):
+        regex = _like_to_regex(pattern)
+        return self._filter(column, lambda v: v is not None and regex.fullmatch(str(v)) is not None)
+
+    def ilike(self, column: str, pattern: str):
+        regex = _like_to_regex(pattern, re.IGNORECASE)
+        return self._filter(column, lambda v: v is not None and regex.fullmatch(str(v)) is not None)
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False, **kwargs):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self.limit_value = size
+        return self
+
+    def offset(self, size: int):
+        self.offset_value = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self.offset_value = start
+        self.limit_value = end - start + 1
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+    # Internals
+    def _filter(self, column: str, predicate):
+        self.filters.append((column, predicate))
+        return self
+
+    def _matches(self, row: dict) -> bool:
+        return all(
+            predicate(row) if column is None else predicate(row.get(column))
+            for column, predicate in self.filters
+        )
+
+    @staticmethod
+    def _parse_columns(columns) -> list:
+        names = [name.strip() for column in columns for name in column.split(',') if name.strip()]
+        if not names or '*' in names:
+            return None
+        return names
+
+
+class FakeCall:
+    """
+    Stand-in for postgrest's RPC request builder: `client.rpc(function, params).execute()`.
+    """
+    def __init__(self, client: "FakeSupabaseClient", function: str, params: dict):
+        self.client = client
+        self.function = function
+        self.params = params
+
+    def execute(self):
+        return self.client._execute_rpc(self)
+
+
+class FakeSupabaseClient:
+    """
+    In-process replacement for the Supabase client used by DBActions.
+
+    Rows live in plain per-table lists, so views can be exercised and benchmarked
+    without a live project. Every `execute()` is recorded as a round trip and can be
+    delayed by a configurable latency plus uniform jitter to approximate the network.
+
+    The Postgres functions of supabase/migrations are mirrored by `_rpc_<name>` methods, so
+    `rpc()` calls run against the same in-memory tables.
+
+    Attributes:
+        tables (dict): Table name -> list of stored rows.
+        calls (list): One `(table, method, seconds)` entry per executed query.
+        latency (float): Base delay in seconds added to every round trip.
+        jitter (float): Maximum extra delay in seconds, drawn uniformly per round trip.
+        unique (dict): Table name -> columns that must stay unique (raises APIError 23505).
+        max_rows (int): Most rows a select returns, like PostgREST's `max_rows` (None for no cap).
+
+    ## Usage:
+        fake = FakeSupabaseClient(latency=0.02, jitter=0.01)
+        fake.seed('boards', [{'id': '1', 'name': 'Todo', 'creator_id': 'u1'}])
+        with use_backend(fake):
+            get_full_boards_data('u1')
+        fake.round_trips  # -> 3
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = None, unique: dict = None, max_rows: int = 1000):
+        self.tables = {}
+        self.calls = []
+        self.latency = latency
+        self.jitter = jitter
+        self.unique = unique or {}
+        self.max_rows = max_rows
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, function: str, params: dict = None, **kwargs) -> FakeCall:
+        return FakeCall(self, function, copy.deepcopy(params or {}))
+
+    def seed(self, table: str, rows: list):
+        """
+        Stores rows directly, without counting a round trip.
+        """
+        with self._lock:
+            stored = self.tables.setdefault(table, [])
+            for row in rows:
+                stored.append(self._with_defaults(copy.deepcopy(row)))
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls = []
+
+    @property
+    def round_trips(self) -> int:
+        return len(self.calls)
+
+    def calls_for(self, table: str) -> int:
+        return sum(1 for call in self.calls if call[0] == table)
+
+    def _delay(self) -> float:
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def _execute(self, query: FakeQuery) -> FakeResponse:
+        delay = self._delay()
+        with self._lock:
+            self.calls.append((query.table_name, query.method, delay))
+            rows = self.tables.setdefault(query.table_name, [])
+            handler = getattr(self, f"_run_{query.method}")
+            return handler(query, rows)
+
+    def _execute_rpc(self, call: FakeCall) -> FakeResponse:
+        delay = self._delay()
+        handler = getattr(self, f"_rpc_{call.function}", None)
+        with self._lock:
+            self.calls.append((call.function, 'rpc', delay))
+            if handler is None:
+                raise APIError({
+                    'code': 'PGRST202',
+                    'message': f'Could not find the function public.{call.function}',
+                    'details': None,
+                    'hint': None,
+                })
+            return FakeResponse(handler(**call.params))
+
+    def _rpc_bulk_update(self, p_table: str, p_rows: list) -> list:
+        # Each row only writes the columns it carries; unknown ids are skipped
+        rows = self.tables.setdefault(p_table, [])
+        by_id = {str(row.get('id')): row for row in rows}
+        updated = []
+        for payload in p_rows:
+            row = by_id.get(str(payload.get('id')))
+            if row is None:
+                continue
+            candidate = {**row, **payload}
+            self._check_unique(p_table, rows, candidate, ignore=row)
+            row.update(candidate)
+            updated.append(copy.deepcopy(row))
+        return updated
+
+    def _rpc_apply_focus_session(self, p_user_id, p_rollups: list, p_minutes: int, p_sessions: int, p_session: dict = None,
+                                 p_max_streak_runs: int = None) -> dict:
+        # Inserts the session and increments its rollups in place, then copies the all-time totals onto the user
+        # and moves their streak when the session makes its day qualify
+        from helpers.focus_streaks import streak_fields
+        inserted = None
+        if p_session is not None:
+            inserted = self._with_defaults(copy.deepcopy(p_session))
+            self.tables.setdefault('focus_sessions', []).append(inserted)
+
+        stats = self.tables.setdefault('focus_stats', [])
+        by_id = {str(row.get('id')): row for row in stats}
+        written = []
+        for rollup in p_rollups:
+            row = by_id.get(str(rollup['id']))
+            if row is None:
+                row = {
+                    **rollup,
+                    'total_time': max(0, rollup['total_time']),
+                    'total_focus_sessions': max(0, rollup['total_focus_sessions']),
+                }
+                stats.append(row)
+            else:
+                row['total_time'] = max(0, (row.get('total_time') or 0) + p_minutes)
+                row['total_focus_sessions'] = max(0, (row.get('total_focus_sessions') or 0) + p_sessions)
+                row['updated_at'] = rollup['updated_at']
+            written.append(copy.deepcopy(row))
+
+        profile = None
+        totals = next((row for row in written if row['period'] == 'all'), None)
+        user = next((row for row in self.tables.get('users', []) if str(row.get('id')) == str(p_user_id)), None)
+        if user is not None and totals is not None:
+            user['total_time'] = totals['total_time']
+            user['total_focus_sessions'] = totals['total_focus_sessions']
+            day = next((row for row in written if row['period'] == 'day'), None)
+            if day is not None:
+                user.update(streak_fields(user, day['date'], day['total_time'] - p_minutes, day['total_time']))
+            profile = {
+                key: copy.deepcopy(user.get(key))
+                for key in ('mins_for_streak', 'focus_streak', 'longest_focus_streak', 'focus_days')
+            }
+        return {'session': copy.deepcopy(inserted), 'rollups': written, 'user': profile}
+
+    def _run_select(self, query: FakeQuery, rows: list) -> FakeResponse:
+        matched = [row for row in rows if query._matches(row)]
+        for column, desc in reversed(query.ordering):
+            matched.sort(key=lambda row: _sort_key(row.get(column)), reverse=desc)
+
+        total = len(matched)
+        limit = query.limit_value
+        if self.max_rows is not None:
+            limit = self.max_rows if limit is None else min(limit, self.max_rows)
+        end = None if limit is None else query.offset_value + limit
+        matched = matched[query.offset_value:end]
+
+        if query.columns:
+            data = [{column: copy.deepcopy(row.get(column)) for column in query.columns} for row in matched]
+        else:
+            data = copy.deepcopy(matched)
+        return FakeResponse(data, total if query.count else None)
+
+    def _run_insert(self, query: FakeQuery, rows: list) -> FakeResponse:
+        new_rows = [self._with_defaults(copy.deepcopy(row)) for row in _as_list(query.payload)]
+        for row in new_rows:
+            self._check_unique(query.table_name, rows, row)
+            rows.append(row)
+        return FakeResponse(copy.deepcopy(new_rows))
+
+    def _run_upsert(self, query: FakeQuery, rows: list) -> FakeResponse:
+        keys = [key.strip() for key in query.on_conflict.split(',')]
+        written = []
+        for payload in _as_list(query.payload):
+            existing = next((row for row in rows if all(_same(row.get(key), payload.get(key)) for key in keys)), None)
+            if existing is None:
+                row = self._with_defaults(copy.deepcopy(payload))
+                self._check_unique(query.table_name, rows, row)
+                rows.append(row)
+            else:
+                row = {**existing, **copy.deepcopy(payload)}
+                self._check_unique(query.table_name, rows, row, ignore=existing)
+                existing.update(row)
+                row = existing
+            written.append(row)
+        return FakeResponse(copy.deepcopy(written))
+
+    def _run_update(self, query: FakeQuery, rows: list) -> FakeResponse:
+        updated = []
+        for row in rows:
+            if query._matches(row):
+                candidate = {**row, **copy.deepcopy(query.payload)}
+                self._check_unique(query.table_name, rows, candidate, ignore=row)
+                row.update(candidate)
+                updated.append(row)
+        return FakeResponse(copy.deepcopy(updated))
+
+    def _run_delete(self, query: FakeQuery, rows: list) -> FakeResponse:
+        deleted = [row for row in rows if query._matches(row)]
+        rows[:] = [row for row in rows if not query._matches(row)]
+        return FakeResponse(deleted)
+
+    def _check_unique(self, table: str, rows: list, candidate: dict, ignore: dict = None):
+        for column in self.unique.get(table, []):
+            value = candidate.get(column)
+            if value is None:
+                continue
+            for row in rows:
+                if row is not ignore and _same(row.get(column), value):
+                    raise APIError({
+                        'code': '23505',
+                        'message': f'duplicate key value violates unique constraint "{table}_{column}_key"',
+                        'details': f'Key ({column})=({value}) already exists.',
+                        'hint': None,
+                    })
+
+    @staticmethod
+    def _with_defaults(row: dict) -> dict:
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+        return row
+
+
+def _as_list(payload) -> list:
+    return payload if isinstance(payload, list) else [payload]
+
+
+def _same(left, right) -> bool:
+    # PostgREST compares over the wire as text, so '1' and 1 (or a UUID and its str) match.
+    return left == right or str(left) == str(right)
+
+
+def _sort_key(value):
+    # Nulls sort last, as in Postgres' default ascending order.
+    return (value is None, value if value is not None else 0)
+
+
+def _coerce(current, raw: str):
+    # Filter values arrive as text; compare them with the stored value's type
+    if isinstance(current, bool):
+        return raw == 'true'
+    if isinstance(current, (int, float)):
+        return float(raw)
+    return raw
+
+
+_OPERATORS = {
+    'eq': lambda current, raw: current is not None and current == _coerce(current, raw),
+    'neq': lambda current, raw: current is not None and current != _coerce(current, raw),
+    'gt': lambda current, raw: current is not None and current > _coerce(current, raw),
+    'gte': lambda current, raw: current is not None and current >= _coerce(current, raw),
+    'lt': lambda current, raw: current is not None and current < _coerce(current, raw),
+    'lte': lambda current, raw: current is not None and current <= _coerce(current, raw),
+    'is': lambda current, raw: current is None if raw == 'null' else current is (raw == 'true'),
+    'in': lambda current, raw: str(current) in [value.strip().strip('"') for value in raw.strip('()').split(',')],
+    # PostgREST also accepts `*` for `%` in filter strings
+    'like': lambda current, raw: current is not None and _like_to_regex(raw.replace('*', '%')).fullmatch(str(current)) is not None,
+    'ilike': lambda current, raw: current is not None and _like_to_regex(raw.replace('*', '%'), re.IGNORECASE).fullmatch(str(current)) is not None,
+}
+
+
+def _split_top_level(expression: str) -> list:
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _parse_logic(operator: str, body: str):
+    predicates = [_parse_condition(part.strip()) for part in _split_top_level(body)]
+    combine = all if operator == 'and' else any
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+def _parse_condition(condition: str):
+    negate = condition.startswith('not.')
+    if negate:
+        condition = condition[4:]
+    for operator in ('and', 'or'):
+        if condition.startswith(f'{operator}(') and condition.endswith(')'):
+            predicate = _parse_logic(operator, condition[len(operator) + 1:-1])
+            break
+    else:
+        column, rest = condition.split('.', 1)
+        if rest.startswith('not.'):
+            negate, rest = not negate, rest[4:]
+        operator, raw = rest.split('.', 1)
+        raw = raw[1:-1] if len(raw) > 1 and raw.startswith('"') and raw.endswith('"') else raw
+        compare = _OPERATORS[operator]
+        predicate = lambda row: compare(row.get(column), raw)
+    return (lambda row: not predicate(row)) if negate else predicate
+
+
+def _like_to_regex(pattern: str, flags: int = 0):
+    parts = []
+    for char in pattern:
+        if char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return re.compile(''.join(parts), flags | re.DOTALL)
@@ -0,0 +1,206 @@
+import threading
+import weakref
+import httpx
+from . import db_metrics
+
+
+# Connection pooling for the HTTP clients behind Supabase (postgrest and auth).
+# Every client built by functions/supabase_client.py sends its requests through a MeteredTransport,
+# so keep-alive connections (and their TLS sessions) survive the postgrest clients that supabase-py
+# recreates after each auth event, and HTTP/2 lets concurrent requests share one connection.
+
+
+class PoolSettings:
+    """
+    Limits and timeouts of the Supabase connection pools.
+
+    Attributes:
+        max_connections (int): Connections a pool may open at once.
+        max_keepalive (int): Idle connections kept open for reuse.
+        keepalive_expiry (float): Seconds an idle connection is kept before closing it.
+        http2 (bool): Negotiate HTTP/2 so requests are multiplexed over one connection.
+        connect_timeout / read_timeout / write_timeout / pool_timeout (float): Seconds before giving up.
+            pool_timeout is how long a request waits for a free connection.
+        retries (int): Retries of failed connection attempts (never of sent requests).
+    """
+    def __init__(
+        self,
+        max_connections: int = 50,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 60.0,
+        http2: bool = True,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        write_timeout: float = 30.0,
+        pool_timeout: float = 10.0,
+        retries: int = 1,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        self.retries = retries
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+class PoolMetrics:
+    """
+    Request and connection counters of one transport.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections_opened = 0
+        self._seen = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, pool, failed: bool):
+        with self._lock:
+            self.in_flight -= 1
+            self.errors += int(failed)
+            for connection in _connections(pool):
+                if connection not in self._seen:
+                    self._seen.add(connection)
+                    self.connections_opened += 1
+
+
+def _connections(pool) -> list:
+    return list(getattr(pool, 'connections', []))
+
+
+def _pool_snapshot(pool) -> dict:
+    connections = _connections(pool)
+    return {
+        'connections': len(connections),
+        'idle_connections': sum(1 for connection in connections if connection.is_idle()),
+        'http2_connections': sum(1 for connection in connections if 'HTTP/2' in connection.info()),
+    }
+
+
+class _CountedStream(httpx.SyncByteStream):
+    # Reports the size of each chunk of a response body to the current request's metrics as it's read
+    def __init__(self, stream: httpx.SyncByteStream):
+        self._stream = stream
+
+    def __iter__(self):
+        for chunk in self._stream:
+            db_metrics.count_received(len(chunk))
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+
+
+class _AsyncCountedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream):
+        self._stream = stream
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            db_metrics.count_received(len(chunk))
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """
+    httpx.HTTPTransport that counts requests and the connections its pool opens, and the bytes of
+    the responses read (as sent over the wire, before decompression) for functions/db_metrics.py.
+    The pool is thread-safe, so one transport can be shared by every thread of a worker.
+    """
+    def __init__(self, settings: PoolSettings):
+        super().__init__(http2=settings.http2, limits=settings.limits, retries=settings.retries)
+        self.metrics = PoolMetrics()
+        _transports.add(self)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.metrics.started()
+        failed = True
+        try:
+            response = super().handle_request(request)
+            response.stream = _CountedStream(response.stream)
+            failed = False
+            return response
+        finally:
+            self.metrics.finished(self._pool, failed)
+
+
+class AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    """
+    Async counterpart of MeteredTransport; bound to the event loop that first uses it.
+    """
+    def __init__(self, settings: PoolSettings):
+        super().__init__(http2=settings.http2, limits=settings.limits, retries=settings.retries)
+        self.metrics = PoolMetrics()
+        _transports.add(self)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.metrics.started()
+        failed = True
+        try:
+            response = await super().handle_async_request(request)
+            response.stream = _AsyncCountedStream(response.stream)
+            failed = False
+            return response
+        finally:
+            self.metrics.finished(self._pool, failed)
+
+
+# Every live transport, for pool_stats()
+_transports = weakref.WeakSet()
+
+
+def pool_stats() -> dict:
+    """
+    Totals over every live Supabase transport of this process.
+
+    Returns:
+        dict: transports, requests, errors, in_flight, peak_in_flight, connections_opened
+              (a high ratio of connections_opened to requests means connections aren't reused),
+              and the current connections / idle_connections / http2_connections.
+    """
+    stats = {
+        'transports': 0, 'requests': 0, 'errors': 0, 'in_flight': 0, 'peak_in_flight': 0,
+        'connections_opened': 0, 'connections': 0, 'idle_connections': 0, 'http2_connections': 0,
+    }
+    for transport in list(_transports):
+        metrics = transport.metrics
+        stats['transports'] += 1
+        stats['requests'] += metrics.requests
+        stats['errors'] += metrics.errors
+        stats['in_flight'] += metrics.in_flight
+        stats['peak_in_flight'] = max(stats['peak_in_flight'], metrics.peak_in_flight)
+        stats['connections_opened'] += metrics.connections_opened
+        for key, value in _pool_snapshot(transport._pool).items():
+            stats[key] += value
+    return stats
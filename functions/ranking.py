@@ -0,0 +1,113 @@
+"""
+Fractional (lexicographic) rank keys for ordering rows such as lists and cards.
+
+A rank is a string of base-36 digits read as the fraction 0.d1d2d3..., so ordering rows
+by rank is a plain string sort. A key can always be generated between any two keys,
+which lets a move rewrite only the moved row instead of shifting every sibling.
+Keys grow by about one digit per repeated insert into the same gap; once they get longer
+than MAX_RANK_LENGTH the siblings should be respread with `spread_ranks`.
+
+Only digits and lowercase letters are used so Postgres sorts them the same way
+under the default (non-C) collations.
+"""
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+MAX_RANK_LENGTH = 12
+
+
+def _validate(rank: str):
+    if rank and (rank[-1] == DIGITS[0] or any(char not in DIGITS for char in rank)):
+        raise ValueError(f"Invalid rank key: {rank!r}")
+
+
+def rank_between(before: str = None, after: str = None) -> str:
+    """
+    Returns a rank that sorts strictly between `before` and `after`.
+
+    Args:
+        before (str, optional): The rank of the previous row, None/'' for the start.
+        after (str, optional): The rank of the next row, None/'' for the end.
+
+    Raises:
+        ValueError: If the keys are malformed or `before` does not sort before `after`.
+    """
+    before = before or ''
+    after = after or None
+    _validate(before)
+    _validate(after)
+    if after is not None and before >= after:
+        raise ValueError(f"Cannot rank between {before!r} and {after!r}")
+
+    if after is None and before:
+        # Appending is the common case: step the first digit that has room instead of halving,
+        # so keys grow by one digit every ~BASE appends rather than every few.
+        for index, char in enumerate(before):
+            if char != DIGITS[-1]:
+                return before[:index] + DIGITS[DIGITS.index(char) + 1]
+
+    digits = []
+    index = 0
+    while True:
+        low = DIGITS.index(before[index]) if index < len(before) else 0
+        high = DIGITS.index(after[index]) if after is not None and index < len(after) else BASE
+        if high - low > 1:
+            digits.append(DIGITS[(low + high) // 2])
+            return ''.join(digits)
+        digits.append(DIGITS[low])
+        if high - low == 1:
+            # Anything that continues the lower digit already sorts before `after`.
+            after = None
+        index += 1
+
+
+def rank_for_index(ranks: list, index: int) -> str:
+    """
+    Returns a rank that places a row at `index` among siblings already sorted by rank.
+
+    Args:
+        ranks (list): The sorted ranks of the siblings, excluding the row being placed.
+        index (int): The zero-based target slot; clamped to the valid range.
+    """
+    index = max(0, min(index, len(ranks)))
+    before = ranks[index - 1] if index > 0 else None
+    after = ranks[index] if index < len(ranks) else None
+    return rank_between(before, after)
+
+
+def ranks_between(before: str = None, after: str = None, count: int = 1) -> list:
+    """
+    Returns `count` increasing ranks that all sort strictly between `before` and `after`,
+    e.g. for several rows dropped into the same gap.
+
+    The gap is split by bisection, so keys grow with log2(count) rather than with count.
+    """
+    if count <= 0:
+        return []
+    middle = rank_between(before, after)
+    left = (count - 1) // 2
+    return ranks_between(before, middle, left) + [middle] + ranks_between(middle, after, count - 1 - left)
+
+
+def spread_ranks(count: int) -> list:
+    """
+    Returns `count` short, evenly spaced, increasing ranks (used to rebalance siblings).
+    """
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+    step = BASE ** width // (count + 1)
+
+    ranks = []
+    for slot in range(1, count + 1):
+        value = slot * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        ranks.append(''.join(reversed(digits)).rstrip(DIGITS[0]))
+    return ranks
+
+
+def needs_rebalance(rank: str) -> bool:
+    return len(rank or '') > MAX_RANK_LENGTH
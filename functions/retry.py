@@ -0,0 +1,42 @@
+import random
+import time
+import httpx
+from gotrue.errors import AuthRetryableError
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a failed Supabase call is worth retrying: the request never got an answer
+    (connection or timeout errors) or the gateway in front of Supabase failed (502/503/504).
+    gotrue reports both as AuthRetryableError; postgrest lets the httpx errors through.
+    """
+    return isinstance(error, (AuthRetryableError, httpx.TransportError))
+
+
+def retry(fn, attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0, retry_on=is_transient):
+    """
+    Calls fn() until it succeeds, retrying errors accepted by `retry_on` with exponential backoff.
+
+    Each wait is drawn uniformly from [0, min(max_delay, base_delay * 2 ** n)] ("full jitter"),
+    so clients that failed together don't retry together.
+
+    Args:
+        fn (callable): The call to make; it must be safe to repeat after a transient failure.
+        attempts (int): Maximum number of calls, including the first.
+        base_delay (float): Upper bound in seconds of the first wait.
+        max_delay (float): Upper bound in seconds of any wait.
+        retry_on (callable): Takes the exception and returns whether to retry it.
+
+    Returns:
+        The result of the first successful call.
+
+    Raises:
+        The exception of the last attempt, or the first one `retry_on` rejects.
+    """
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts - 1 or not retry_on(e):
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the function and every
+    caller that arrives while it is running waits for it and receives the same result (or exception).
+    Nothing is cached; once the call returns, the next caller runs the function again.
+
+    Callers share the result object, so it must be treated as read-only.
+
+    Attributes:
+        calls (int): Number of times the function actually ran.
+        shared (int): Number of callers that received another caller's result.
+
+    ## Methods:
+        - do(key, fn):
+            Returns fn(), sharing an in-flight call with the same key.
+        - forget(match):
+            Detaches in-flight calls whose key matches, so later callers start a fresh call
+            (e.g. after a write that the in-flight read may have missed).
+        - stats():
+            Returns the counters and the number of calls in flight.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, match):
+        with self._lock:
+            for key in [key for key in self._calls if match(key)]:
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    SingleFlight for coroutines: `await do(key, fn)` runs `fn()` (a coroutine function) once per key
+    and event loop while callers overlap.
+
+    The call runs in its own task, so a caller that is cancelled (e.g. its client disconnected)
+    doesn't cancel the fetch the other callers are waiting for.
+    """
+    async def do(self, key, fn):
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self._lock:
+            task = self._calls.get(flight_key)
+            if task is None:
+                task = self._calls[flight_key] = loop.create_task(fn())
+                task.add_done_callback(lambda done: self._done(flight_key, done))
+                self.calls += 1
+            else:
+                self.shared += 1
+        return await asyncio.shield(task)
+
+    def _done(self, flight_key, task):
+        with self._lock:
+            if self._calls.get(flight_key) is task:
+                del self._calls[flight_key]
+
+    def forget(self, match):
+        super().forget(lambda flight_key: match(flight_key[1]))
@@ -1,13 +1,123 @@
+import threading
 from decouple import config
-from supabase import create_client, Client
+from gotrue.http_clients import SyncClient as AuthHttpClient
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient as PostgrestHttpClient
+from supabase import Client, ClientOptions
+from supabase._sync.auth_client import SyncSupabaseAuthClient
+from .http_pool import MeteredTransport, PoolSettings
 
 secret: str = config("SUPABASE_JWT_SECRET")
 url: str = config("SUPABASE_URL")
 anon_key: str = config("SUPABASE_ANON_KEY")
 service_role_key: str = config("SUPABASE_SERVICE_ROLE_KEY")
 
-# For authenticated user requests
-supabase_client: Client = create_client(url, anon_key)
+# Connection pool of the Supabase HTTP clients (see functions/http_pool.py)
+pool_settings = PoolSettings(
+    max_connections=config("SUPABASE_POOL_MAX_CONNECTIONS", default=50, cast=int),
+    max_keepalive=config("SUPABASE_POOL_MAX_KEEPALIVE", default=20, cast=int),
+    keepalive_expiry=config("SUPABASE_POOL_KEEPALIVE_EXPIRY", default=60.0, cast=float),
+    http2=config("SUPABASE_HTTP2", default=True, cast=bool),
+    connect_timeout=config("SUPABASE_CONNECT_TIMEOUT", default=5.0, cast=float),
+    read_timeout=config("SUPABASE_READ_TIMEOUT", default=30.0, cast=float),
+    write_timeout=config("SUPABASE_WRITE_TIMEOUT", default=30.0, cast=float),
+    pool_timeout=config("SUPABASE_POOL_TIMEOUT", default=10.0, cast=float),
+    retries=config("SUPABASE_CONNECT_RETRIES", default=1, cast=int),
+)
 
-# For server-side operations that need to bypass RLS
-supabase_admin: Client = create_client(url, service_role_key)
\ No newline at end of file
+# "shared": one client pair and one pool for every thread of the worker (the pool is thread-safe).
+# "thread": each thread gets its own client pair and pool, so auth sessions set on one thread's
+# client never leak into requests served by another thread.
+CLIENT_SCOPE: str = config("SUPABASE_CLIENT_SCOPE", default="shared")
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """
+    Postgrest client whose session sends requests through a shared MeteredTransport.
+    """
+    def __init__(self, base_url: str, transport: MeteredTransport, **kwargs):
+        # create_session() runs inside the base __init__, so the transport must be set first
+        self.transport = transport
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return PostgrestHttpClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=pool_settings.timeout,
+            follow_redirects=True,
+            transport=self.transport,
+        )
+
+
+class PooledClient(Client):
+    """
+    supabase-py Client whose postgrest and auth clients share one pooled, keep-alive transport.
+
+    supabase-py drops its postgrest client after every auth event (sign in, refresh, sign out);
+    since the transport outlives it, the next request still finds a warm connection.
+    """
+    def __init__(self, supabase_url: str, supabase_key: str, options: ClientOptions = None, transport: MeteredTransport = None):
+        self.transport = transport or MeteredTransport(pool_settings)
+        super().__init__(supabase_url, supabase_key, options)
+
+    @classmethod
+    def create(cls, supabase_url: str, supabase_key: str, options: ClientOptions = None, transport: MeteredTransport = None):
+        # Same as Client.create: a new client has no session yet, so requests authenticate with the key
+        client = cls(supabase_url, supabase_key, options, transport)
+        client.options.headers.update(client._get_auth_headers())
+        return client
+
+    def _init_supabase_auth_client(self, auth_url, client_options, verify=True, proxy=None):
+        return SyncSupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=AuthHttpClient(follow_redirects=True, timeout=pool_settings.timeout, transport=self.transport),
+        )
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return PooledPostgrestClient(rest_url, self.transport, headers=headers, schema=schema, verify=verify, proxy=proxy)
+
+
+def create_pooled_client(key: str, transport: MeteredTransport = None) -> PooledClient:
+    return PooledClient.create(url, key, ClientOptions(postgrest_client_timeout=pool_settings.timeout), transport)
+
+
+class ThreadLocalClient:
+    """
+    Stands in for a Client and forwards every attribute to the calling thread's own instance.
+    The clients of one thread share a transport, so the anon and admin clients reuse connections.
+    """
+    _local = threading.local()
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def _client(self) -> PooledClient:
+        local = self._local
+        if not hasattr(local, 'clients'):
+            local.clients = {}
+            local.transport = MeteredTransport(pool_settings)
+        if self.key not in local.clients:
+            local.clients[self.key] = create_pooled_client(self.key, local.transport)
+        return local.clients[self.key]
+
+    def __getattr__(self, name):
+        return getattr(self._client(), name)
+
+
+if CLIENT_SCOPE == "thread":
+    supabase_client = ThreadLocalClient(anon_key)
+    supabase_admin = ThreadLocalClient(service_role_key)
+else:
+    _transport = MeteredTransport(pool_settings)
+
+    # For authenticated user requests
+    supabase_client: Client = create_pooled_client(anon_key, _transport)
+
+    # For server-side operations that need to bypass RLS
+    supabase_admin: Client = create_pooled_client(service_role_key, _transport)
@@ -0,0 +1,123 @@
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from django.utils.text import slugify
+from .ranking import spread_ranks
+
+
+# Words used to build board, list and card titles
+WORDS = [
+    'roadmap', 'sprint', 'backlog', 'launch', 'design', 'research', 'hiring', 'budget',
+    'review', 'release', 'bugs', 'ideas', 'notes', 'planning', 'content', 'ops',
+]
+PRIORITIES = ['High', 'Medium', 'Low', '']
+
+
+class WorkspaceSpec:
+    """
+    Shape of a synthetic workspace: boards x lists x cards, each card with subtasks and comments.
+
+    Attributes:
+        boards (int): Boards owned by the user.
+        lists (int): Lists per board.
+        cards (int): Cards per list.
+        subtasks (int): Subtasks per card.
+        comments (int): Comments per card.
+    """
+    def __init__(self, boards: int, lists: int, cards: int, subtasks: int = 0, comments: int = 0):
+        self.boards = boards
+        self.lists = lists
+        self.cards = cards
+        self.subtasks = subtasks
+        self.comments = comments
+
+    @property
+    def label(self) -> str:
+        return f"{self.boards}x{self.lists}x{self.cards}"
+
+    @property
+    def total_rows(self) -> int:
+        cards = self.boards * self.lists * self.cards
+        return self.boards + self.boards * self.lists + cards * (1 + self.subtasks + self.comments)
+
+    def __repr__(self):
+        return f"WorkspaceSpec({self.label}, subtasks={self.subtasks}, comments={self.comments})"
+
+
+def generate_workspace(client, user_id: str, spec: WorkspaceSpec, seed: int = 0) -> dict:
+    """
+    Fills a stand-in backend (e.g. FakeSupabaseClient) with a synthetic workspace for one user.
+
+    Rows look like the ones Supabase stores for the boards app (slugs, ranks, priorities, due dates)
+    and are generated deterministically from the seed, so two runs produce the same workspace.
+
+    Args:
+        client: Backend exposing `seed(table, rows)`.
+        user_id (str): Owner of the boards and author of the comments.
+        spec (WorkspaceSpec): How many rows to generate at each level.
+        seed (int): Seed for ids, titles and timestamps.
+
+    Returns:
+        dict: The generated rows per table, e.g. {'boards': [...], 'lists': [...], ...}.
+    """
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    tick = iter(range(10 ** 9))
+
+    def new_id():
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    def created_at():
+        return (started + timedelta(seconds=next(tick))).isoformat()
+
+    def timestamps():
+        moment = created_at()
+        return {'created_at': moment, 'updated_at': moment}
+
+    def title(words: int = 2):
+        return ' '.join(rng.choice(WORDS) for _ in range(words)).title()
+
+    rows = {'boards': [], 'lists': [], 'cards': [], 'subtasks': [], 'comments': []}
+    slugs = set()
+    for _ in range(spec.boards):
+        name = title()
+        slug = base = slugify(name)
+        counter = 1
+        while slug in slugs:
+            slug = f"{base}-{counter}"
+            counter += 1
+        slugs.add(slug)
+        board = {
+            'id': new_id(), 'name': name, 'slug': slug, 'creator_id': user_id,
+            'description': '', 'favorite': rng.random() < 0.2, 'color': '', 'image': '',
+            **timestamps(),
+        }
+        rows['boards'].append(board)
+
+        for position, rank in enumerate(spread_ranks(spec.lists), start=1):
+            list_item = {
+                'id': new_id(), 'board_id': board['id'], 'title': title(1), 'position': position,
+                'rank': rank, **timestamps(),
+            }
+            rows['lists'].append(list_item)
+
+            for card_rank in spread_ranks(spec.cards):
+                card = {
+                    'id': new_id(), 'list_id': list_item['id'], 'title': title(3), 'rank': card_rank,
+                    'description': title(8), 'image_url': None, 'priority': rng.choice(PRIORITIES),
+                    'due_date': (started + timedelta(days=rng.randint(0, 90))).isoformat() if rng.random() < 0.5 else None,
+                    **timestamps(),
+                }
+                rows['cards'].append(card)
+                rows['subtasks'].extend(
+                    {'id': new_id(), 'card_id': card['id'], 'title': title(2), 'is_completed': rng.random() < 0.5, 'created_at': created_at()}
+                    for _ in range(spec.subtasks)
+                )
+                rows['comments'].extend(
+                    {'id': new_id(), 'card_id': card['id'], 'author_id': user_id, 'text': title(6), 'total_reactions': 0, 'created_at': created_at()}
+                    for _ in range(spec.comments)
+                )
+
+    for table, table_rows in rows.items():
+        client.seed(table, table_rows)
+    return rows
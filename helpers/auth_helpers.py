@@ -0,0 +1,298 @@
+import contextvars
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import jwt
+from django.conf import settings
+from django.core.cache import caches
+from gotrue.errors import AuthApiError
+from postgrest.exceptions import APIError
+from functions.cache import TTLCache
+from functions.db_actions import DBActions
+from functions.retry import retry
+from functions.single_flight import SingleFlight
+from functions.supabase_client import secret, supabase_client
+from helpers.user_helpers import fetch_user, get_user, remember_user, user_id_for_email
+
+
+# Signup and login flows behind the create_user/ and login/ endpoints.
+# Both talk to Supabase Auth and to the users table, so their latency is the sum of several remote calls;
+# independent calls are overlapped on a small thread pool instead:
+#
+#   signup: sign up -> (insert the users row | sign in)   - no sign in at all when sign-up returns a session
+#   login:  (sign in | read the profile by email)         - the profile is only returned once sign-in succeeds
+#
+# Calls that fail transiently (network errors, 502/503/504) are retried with bounded backoff
+# (functions/retry.py). Sign-up and the users insert aren't idempotent, so when a retry finds that an
+# earlier attempt went through after all, the flow carries on from there instead of failing.
+AUTH_RETRY_ATTEMPTS = getattr(settings, 'AUTH_RETRY_ATTEMPTS', 3)
+AUTH_RETRY_BASE_DELAY = getattr(settings, 'AUTH_RETRY_BASE_DELAY', 0.2)
+AUTH_RETRY_MAX_DELAY = getattr(settings, 'AUTH_RETRY_MAX_DELAY', 2.0)
+AUTH_FLOW_WORKERS = getattr(settings, 'AUTH_FLOW_WORKERS', 8)
+
+# Token refreshes (the auth/refresh/ endpoint): every open tab refreshes the same refresh token at
+# about the same time, e.g. when a laptop wakes up, and each upstream refresh rotates the token its
+# siblings hold. Refreshes of the same token are coalesced: concurrent ones share the in-flight call,
+# and the new tokens are kept for REFRESH_RESULT_TTL seconds for the tabs that arrive just after it.
+# They are kept in this worker, or, when REFRESH_CACHE_ALIAS names a cache shared by the workers
+# (e.g. Redis), there, together with a lock held while one worker refreshes, so tabs served by
+# different workers are coalesced too.
+#
+# Only callers that also present an access token of the same session (the tabs share it; it may have
+# expired) get tokens from another caller's refresh, so a leaked refresh token replayed after rotation
+# gets nothing it couldn't get from Supabase. The refresh token is only part of the cache key as a
+# hash, but the new tokens are stored as they are, so a shared cache must be as private as a session store.
+REFRESH_CACHE_ALIAS = getattr(settings, 'REFRESH_CACHE_ALIAS', None)
+REFRESH_RESULT_TTL = getattr(settings, 'REFRESH_RESULT_TTL', 5)
+REFRESH_WAIT_TIMEOUT = getattr(settings, 'REFRESH_WAIT_TIMEOUT', 5.0)
+REFRESH_POLL_INTERVAL = 0.05
+REFRESH_CACHE_MAX_ENTRIES = getattr(settings, 'REFRESH_CACHE_MAX_ENTRIES', 4096)
+
+# Postgres unique_violation
+DUPLICATE_KEY = '23505'
+
+logger = logging.getLogger(__name__)
+
+_pool = ThreadPoolExecutor(max_workers=AUTH_FLOW_WORKERS, thread_name_prefix='auth-flow')
+_refreshes = SingleFlight()
+# Recent refresh results of this worker, used when no REFRESH_CACHE_ALIAS is set
+_refreshed = TTLCache(maxsize=REFRESH_CACHE_MAX_ENTRIES, ttl=REFRESH_RESULT_TTL)
+
+
+class AuthFlowError(Exception):
+  # Fails a signup or login with the given message and HTTP status
+  def __init__(self, message, status=400):
+    super().__init__(message)
+    self.status = status
+
+
+def _retry(fn):
+  return retry(fn, AUTH_RETRY_ATTEMPTS, AUTH_RETRY_BASE_DELAY, AUTH_RETRY_MAX_DELAY)
+
+
+# Runs fn on the pool in a copy of the caller's context, so its round trips count towards the request
+def _submit(fn, *args):
+  return _pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+class _Attempts:
+  """
+  Retries a call that isn't idempotent. `done_error(error)` recognises the error a repeated call
+  gets when an earlier attempt succeeded although its response was lost; that error is then
+  returned instead of raised.
+  """
+  def __init__(self, fn, done_error):
+    self.fn = fn
+    self.done_error = done_error
+    self.failed = False
+
+  def __call__(self):
+    try:
+      return self.fn()
+    except Exception as e:
+      if self.failed and self.done_error(e):
+        return e
+      self.failed = True
+      raise
+
+
+def _sign_in(email, password, failure="Failed to login user"):
+  try:
+    response = _retry(lambda: supabase_client.auth.sign_in_with_password({'email': email, 'password': password}))
+  except AuthApiError:
+    raise AuthFlowError(failure)
+  if not (response and response.session):
+    raise AuthFlowError(failure)
+  return response
+
+
+def _insert_user(data: dict):
+  # Creates the users row; returns the row, which is also cached as the user's profile
+  insert = _Attempts(
+    lambda: DBActions(use_admin=True).create('users', data),
+    lambda e: isinstance(e, APIError) and e.code == DUPLICATE_KEY,
+  )
+  response = _retry(insert)
+  if isinstance(response, Exception):
+    response = fetch_user(data['id'])
+  row = response.data[0] if response and response.data else None
+  if row is None:
+    raise AuthFlowError("Failed to create user", status=500)
+  remember_user(row)
+  return row
+
+
+def sign_up(email, password, profile: dict):
+  """
+  Registers the user with Supabase Auth, creates their users row and signs them in.
+
+  Args:
+    profile (dict): The columns of the users row besides the id.
+
+  Returns:
+    tuple: (users row, session).
+
+  Raises:
+    AuthFlowError: If sign-up or the first sign-in fails.
+  """
+  display_name = f"{profile.get('first_name', '')}{profile.get('last_name', '')}"
+  signup = _Attempts(
+    lambda: supabase_client.auth.sign_up({
+      'email': email,
+      'password': password,
+      'options': {'data': {'displayName': display_name}},
+    }),
+    lambda e: isinstance(e, AuthApiError) and e.code == 'user_already_exists',
+  )
+  response = _retry(signup)
+
+  if isinstance(response, Exception):
+    # An earlier attempt registered the user: the password check of the sign-in gives us their id
+    response = _sign_in(email, password, "Failed to login user in Supabase Auth")
+    return _insert_user({**profile, 'id': response.user.id}), response.session
+  if not (response and response.user):
+    raise AuthFlowError("Failed to sign up user in Supabase Auth")
+
+  data = {**profile, 'id': response.user.id}
+  if response.session:
+    # Sign-up already signed the user in (no email confirmation)
+    return _insert_user(data), response.session
+
+  insert = _submit(_insert_user, data)
+  try:
+    session = _sign_in(email, password, "Failed to login user in Supabase Auth").session
+  except Exception:
+    # The sign-in error is the one to report; the insert is still waited for, whatever its outcome
+    wait([insert])
+    raise
+  return insert.result(), session
+
+
+def _profile_for_email(email):
+  # The user's profile looked up by email: from the cache when the email has been seen, else one read
+  user_id = user_id_for_email(email)
+  if user_id:
+    return get_user(user_id)
+  response = _retry(lambda: DBActions(use_admin=True).get_by_field('users', 'email', email))
+  row = response.data[0] if response and response.data else None
+  remember_user(row)
+  return row
+
+
+def log_in(email, password):
+  """
+  Signs the user in and reads their profile, overlapping the two.
+
+  Returns:
+    tuple: (users row, session).
+
+  Raises:
+    AuthFlowError: If the credentials are wrong or the user has no users row.
+  """
+  profile = _submit(_profile_for_email, email)
+  response = _sign_in(email, password)
+
+  user_id = str(response.user.id)
+  try:
+    row = profile.result()
+  except Exception as e:
+    logger.warning(f"Failed to read the profile of user {response.user.id} at login: {e}")
+    row = None
+  if row is None or str(row.get('id')) != user_id:
+    # The email lookup found nothing (e.g. different casing): read the profile by id
+    row = get_user(user_id)
+  if row is None:
+    raise AuthFlowError("Failed to login user")
+  return row, response.session
+
+
+def _session_id(access_token):
+  # The session of a validly signed access token, expired or not; None for anything else
+  if not access_token:
+    return None
+  try:
+    claims = jwt.decode(access_token, secret, algorithms=["HS256"], options={"verify_aud": False, "verify_exp": False})
+  except jwt.InvalidTokenError:
+    return None
+  return claims.get('session_id')
+
+
+def _refresh_key(refresh_token, session_id):
+  return f"auth:refresh:{hashlib.sha256(f'{session_id}:{refresh_token}'.encode()).hexdigest()}"
+
+
+# Waits for another worker's refresh of the token; None when it failed or took too long
+def _await_refresh(cache, key):
+  deadline = time.monotonic() + REFRESH_WAIT_TIMEOUT
+  while time.monotonic() < deadline:
+    time.sleep(REFRESH_POLL_INTERVAL)
+    tokens = cache.get(key)
+    if tokens is not None:
+      return tokens
+    if cache.get(f"{key}:lock") is None:
+      return cache.get(key)
+  return None
+
+
+def _refresh_upstream(refresh_token):
+  response = supabase_client.auth.refresh_session(refresh_token)
+  if not (response and response.session):
+    raise AuthFlowError("Failed to refresh session", status=401)
+  return {
+    'access_token': response.session.access_token,
+    'refresh_token': response.session.refresh_token,
+  }
+
+
+def _refresh(key, refresh_token):
+  if not REFRESH_CACHE_ALIAS:
+    tokens = _refreshed.get(key)
+    if tokens is None:
+      tokens = _refresh_upstream(refresh_token)
+      _refreshed.set(key, tokens, REFRESH_RESULT_TTL)
+    return tokens
+
+  cache = caches[REFRESH_CACHE_ALIAS]
+  tokens = cache.get(key)
+  if tokens is not None:
+    return tokens
+
+  locked = cache.add(f"{key}:lock", 1, REFRESH_WAIT_TIMEOUT)
+  if not locked:
+    tokens = _await_refresh(cache, key)
+    if tokens is not None:
+      return tokens
+
+  try:
+    tokens = _refresh_upstream(refresh_token)
+    cache.set(key, tokens, REFRESH_RESULT_TTL)
+    return tokens
+  finally:
+    if locked:
+      cache.delete(f"{key}:lock")
+
+
+def refresh_tokens(refresh_token, access_token=None):
+  """
+  Exchanges a refresh token for a new access and refresh token.
+
+  Concurrent refreshes of the same token by callers holding an access token of the same session
+  make one upstream call and all get its tokens, as do such callers for REFRESH_RESULT_TTL seconds
+  after it: in this worker, or in every worker sharing REFRESH_CACHE_ALIAS.
+  Callers without a valid access token always refresh upstream. Failures aren't cached.
+
+  Args:
+    access_token (str, optional): The caller's current access token; it may have expired.
+
+  Returns:
+    dict: {'access_token', 'refresh_token'}; shared between callers, so it must not be modified.
+
+  Raises:
+    AuthFlowError: If Supabase returns no session.
+  """
+  session_id = _session_id(access_token)
+  if session_id is None:
+    return _refresh_upstream(refresh_token)
+  key = _refresh_key(refresh_token, session_id)
+  return _refreshes.do(key, lambda: _refresh(key, refresh_token))
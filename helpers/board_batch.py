@@ -0,0 +1,242 @@
+import threading
+from boards.serializers import BoardSerializer, CardSerializer, ListSerializer
+from functions.db_actions import DBActions
+from functions.ranking import needs_rebalance, rank_for_index
+from helpers import board_cache
+from helpers.board_helpers import board_changed, rebalance_list_ranks, sort_by_rank
+from helpers.board_sync import stamp
+from helpers.card_helpers import CardError, list_boards
+
+
+# Ordered board mutations sent in one request (the boards/batch/ endpoint).
+# Each operation is validated with the same serializer as its single-operation endpoint.
+# Consecutive add-list operations on one board are written with a single bulk insert, and an
+# operation can use the id created by an earlier one with a "$<index>" reference, e.g.
+#
+#   [{"op": "create-board", "data": {"name": "Launch"}},
+#    {"op": "add-list", "data": {"title": "Todo", "boardId": "$0", "position": 1}}, ...]
+#
+# Operations run in order; one that fails (or refers to one that failed) doesn't stop the rest.
+MAX_BATCH_OPERATIONS = 100
+
+
+class BatchError(Exception):
+  # Fails one operation with the given message and HTTP status
+  def __init__(self, message, status=400, errors=None):
+    super().__init__(message)
+    self.status = status
+    self.errors = errors
+
+
+def _resolve(value, results):
+  # "$2" -> the id created by operation 2
+  if isinstance(value, str) and value.startswith('$') and value[1:].isdigit():
+    index = int(value[1:])
+    if index >= len(results) or not results[index]['ok']:
+      raise BatchError(f"Operation {index} did not succeed", status=424)
+    return results[index]['id']
+  return value
+
+
+def _check_owner(db, board_id, user_id):
+  owner = board_cache.board_owner(board_id, db)
+  if owner is None:
+    raise BatchError("Board not found", status=404)
+  if str(owner) != str(user_id):
+    raise BatchError("You are not authorized to update this board", status=401)
+
+
+def _create_board(db, user_id, data, results):
+  serializer = BoardSerializer(data={'name': data.get('name'), 'creator_id': user_id})
+  if not serializer.is_valid():
+    raise BatchError("Invalid board", errors=serializer.errors)
+  board = serializer.save().data[0]
+  return board['id'], board
+
+
+def _update_board(db, user_id, data, results):
+  board_id = _resolve(data.get('boardId'), results)
+  board = db.get('boards', board_id) if board_id else None
+  if not board or not board.data:
+    raise BatchError("Board not found", status=404)
+  if str(board.data[0]['creator_id']) != str(user_id):
+    raise BatchError("You are not authorized to update this board", status=401)
+
+  serializer = BoardSerializer(board.data[0], data={**board.data[0], **(data.get('updatedBoard') or {})})
+  if not serializer.is_valid():
+    raise BatchError("Invalid board", errors=serializer.errors)
+  board = serializer.save().data[0]
+  return board['id'], board
+
+
+def _create_card(db, user_id, data, results):
+  list_id = _resolve(data.get('listId'), results)
+  serializer = CardSerializer(data={
+    'title': data.get('title'),
+    'list_id': list_id,
+    'description': data.get('description', ''),
+    'priority': data.get('priority', ''),
+    'due_date': data.get('dueDate'),
+  })
+  if not serializer.is_valid():
+    raise BatchError("Invalid card", errors=serializer.errors)
+  try:
+    board_id = list_boards(db, [list_id], user_id)[str(list_id)]
+    card = serializer.save(
+      board_id=board_id,
+      prev_id=_resolve(data.get('prevId'), results),
+      next_id=_resolve(data.get('nextId'), results),
+      position=data.get('position'),
+    ).data[0]
+  except CardError as e:
+    raise BatchError(str(e), status=e.status)
+  return card['id'], card
+
+
+# Single-row operations: name -> handler(db, user_id, data, results) returning (id, row)
+OPERATIONS = {
+  'create-board': _create_board,
+  'update-board': _update_board,
+  'add-card': _create_card,
+}
+BULK_OPERATIONS = ('add-list',)
+
+
+def _validate_list(data, results):
+  serializer = ListSerializer(data={
+    'title': data.get('title'),
+    'board_id': _resolve(data.get('boardId'), results),
+    'position': data.get('position'),
+  })
+  if not serializer.is_valid():
+    raise BatchError("Invalid list", errors=serializer.errors)
+  item = dict(serializer.validated_data)
+  item['board_id'] = str(item['board_id'])
+  return item
+
+
+# Writes a run of add-list operations for one board with one read of its lists and one bulk insert.
+# Ranks are assigned as if the lists were added one after another. `known_ranks` holds the sorted
+# list ranks of boards already read or created in this batch, so they aren't read again.
+def _create_lists(db, user_id, board_id, items, known_ranks):
+  _check_owner(db, board_id, user_id)
+
+  board_id = str(board_id)
+  ranks = known_ranks.get(board_id)
+  if ranks is None:
+    response = db.query('lists').select('id', 'rank', 'position').eq('board_id', board_id).execute()
+    existing = sort_by_rank(response.data if response and response.data else [])
+    if any(not list_item.get('rank') for list_item in existing):
+      existing = rebalance_list_ranks(board_id, db)
+    ranks = [list_item['rank'] for list_item in existing]
+  # Ranked on a copy: the known ranks only change once the lists exist
+  ranks = list(ranks)
+
+  rows = []
+  for item in items:
+    index = max(0, min(item['position'] - 1, len(ranks)))
+    rank = rank_for_index(ranks, index)
+    ranks.insert(index, rank)
+    rows.append(stamp({**item, 'board_id': board_id, 'rank': rank}))
+
+  response = db.create('lists', rows)
+  if not (response and response.data):
+    return []
+  known_ranks[board_id] = ranks
+  if any(needs_rebalance(row['rank']) for row in rows):
+    threading.Thread(target=rebalance_list_ranks, args=(board_id,), daemon=True).start()
+  board_changed(board_id, user_id)
+  return response.data
+
+
+def _result(index, op, ok, status, id=None, data=None, error=None, errors=None):
+  result = {'index': index, 'op': op, 'ok': ok, 'status': status, 'id': id}
+  if ok:
+    result['data'] = data
+  else:
+    result['error'] = error
+    if errors:
+      result['errors'] = errors
+  return result
+
+
+def _parse(operations):
+  if not isinstance(operations, list) or not operations:
+    raise ValueError("operations must be a non-empty list")
+  if len(operations) > MAX_BATCH_OPERATIONS:
+    raise ValueError(f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+  for operation in operations:
+    if not isinstance(operation, dict) or not isinstance(operation.get('data', {}), dict):
+      raise ValueError("Each operation must be an object with 'op' and 'data'")
+
+
+def run_batch(user_id, operations, db: DBActions = None):
+  """
+  Runs the operations in order and returns one result per operation:
+  {'index', 'op', 'ok', 'status', 'id', 'data'} or {..., 'error', 'errors'}.
+
+  Raises:
+    ValueError: If the batch itself is malformed (nothing is run).
+  """
+  _parse(operations)
+  db = db or DBActions(use_admin=True)
+  results = []
+  known_ranks = {}
+
+  index = 0
+  while index < len(operations):
+    op = operations[index].get('op')
+    data = operations[index].get('data') or {}
+
+    if op in BULK_OPERATIONS:
+      # Collect the run of add-list operations that target the same board
+      run = []
+      board_id = None
+      while index + len(run) < len(operations) and operations[index + len(run)].get('op') == op:
+        position = index + len(run)
+        try:
+          item = _validate_list(operations[position].get('data') or {}, results)
+        except BatchError:
+          break
+        if board_id is not None and item['board_id'] != board_id:
+          break
+        board_id = item['board_id']
+        run.append(item)
+
+      if not run:
+        try:
+          _validate_list(data, results)
+        except BatchError as e:
+          results.append(_result(index, op, False, e.status, error=str(e), errors=e.errors))
+        index += 1
+        continue
+
+      try:
+        rows = _create_lists(db, user_id, board_id, run, known_ranks)
+        for offset in range(len(run)):
+          if offset < len(rows):
+            results.append(_result(index + offset, op, True, 201, id=rows[offset]['id'], data=rows[offset]))
+          else:
+            results.append(_result(index + offset, op, False, 400, error="List was not created"))
+      except Exception as e:
+        status = e.status if isinstance(e, BatchError) else 400
+        for offset in range(len(run)):
+          results.append(_result(index + offset, op, False, status, error=str(e)))
+      index += len(run)
+      continue
+
+    handler = OPERATIONS.get(op)
+    try:
+      if handler is None:
+        raise BatchError(f"Unknown operation: {op}")
+      record_id, row = handler(db, user_id, data, results)
+      if op == 'create-board':
+        known_ranks[str(record_id)] = []
+      results.append(_result(index, op, True, 201 if op.startswith(('create', 'add')) else 200, id=record_id, data=row))
+    except BatchError as e:
+      results.append(_result(index, op, False, e.status, error=str(e), errors=e.errors))
+    except Exception as e:
+      results.append(_result(index, op, False, 400, error=str(e)))
+    index += 1
+
+  return results
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.cache import caches
+from functions.cache import TTLCache
+
+
+# Per-user cache of the assembled board tree returned by get_full_boards_data.
+# Entries live in an in-process LRU by default. Setting BOARD_CACHE_ALIAS to a CACHES alias
+# (e.g. a shared Redis cache) stores them in Django's cache framework instead, so that
+# invalidations made by one gunicorn worker are seen by the others.
+# In-process entries are the trees themselves, shared by every reader without copying: like
+# the results of the single-flight reads, they must not be modified.
+BOARD_CACHE_TTL = getattr(settings, 'BOARD_CACHE_TTL', 30)
+BOARD_CACHE_MAX_ENTRIES = getattr(settings, 'BOARD_CACHE_MAX_ENTRIES', 1024)
+BOARD_CACHE_ALIAS = getattr(settings, 'BOARD_CACHE_ALIAS', None)
+
+_trees = TTLCache(maxsize=BOARD_CACHE_MAX_ENTRIES, ttl=BOARD_CACHE_TTL)
+
+# board_id -> creator_id, so list and card writes can find whose tree to drop.
+_board_owners = TTLCache(maxsize=BOARD_CACHE_MAX_ENTRIES * 16, ttl=24 * 60 * 60)
+
+# (creator_id, slug) -> board_id, so opening a board by slug is a primary-key lookup.
+# Entries can go stale across workers; readers must check the fetched row still matches.
+_slug_index = TTLCache(maxsize=BOARD_CACHE_MAX_ENTRIES * 16, ttl=24 * 60 * 60)
+
+
+def _tree_key(user_id):
+  return f"boards:tree:{user_id}"
+
+
+def _shared_cache():
+  return caches[BOARD_CACHE_ALIAS] if BOARD_CACHE_ALIAS else None
+
+
+# Returns the cached board tree for the user (read-only), or None on a miss.
+def get_boards(user_id):
+  shared = _shared_cache()
+  if shared is not None:
+    return shared.get(_tree_key(user_id))
+  return _trees.get(str(user_id))
+
+
+# Stores the board tree for the user and remembers who owns each board in it.
+# The tree is kept as it is, so the caller must not modify it afterwards.
+def set_boards(user_id, data: dict):
+  for board in data.get('boards', []):
+    remember_owner(board['id'], user_id)
+    if board.get('slug'):
+      remember_slug(user_id, board['slug'], board['id'])
+
+  shared = _shared_cache()
+  if shared is not None:
+    shared.set(_tree_key(user_id), data, BOARD_CACHE_TTL)
+  else:
+    _trees.set(str(user_id), data)
+
+
+def remember_owner(board_id, user_id):
+  _board_owners.set(str(board_id), str(user_id))
+
+
+# Returns the creator of the board, looking it up with the given DBActions when it isn't known yet.
+def board_owner(board_id, db=None):
+  owner = _board_owners.get(str(board_id))
+  if owner is None and db is not None:
+    board = db.get('boards', str(board_id))
+    if board and board.data:
+      owner = str(board.data[0]['creator_id'])
+      remember_owner(board_id, owner)
+  return owner
+
+
+# Drops the cached tree of the user.
+def invalidate_user(user_id):
+  if not user_id:
+    return
+  shared = _shared_cache()
+  if shared is not None:
+    shared.delete(_tree_key(user_id))
+  else:
+    _trees.delete(str(user_id))
+
+
+# Drops the cached tree of whoever owns the board (used by list and card writes).
+def invalidate_board(board_id, db=None):
+  invalidate_user(board_owner(board_id, db))
+
+
+def forget_board(board_id):
+  _board_owners.delete(str(board_id))
+
+
+# Records where a board lives after it's created, renamed or loaded.
+def remember_slug(user_id, slug, board_id):
+  _slug_index.set((str(user_id), slug), str(board_id))
+  remember_owner(board_id, user_id)
+
+
+def board_id_for_slug(user_id, slug):
+  return _slug_index.get((str(user_id), slug))
+
+
+def forget_slug(user_id, slug):
+  _slug_index.delete((str(user_id), slug))
+
+
+def stats():
+  return _trees.stats()
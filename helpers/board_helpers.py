@@ -1,36 +1,421 @@
+import base64
+import json
+import re
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
 from functions.db_actions import DBActions
+from functions.async_db_actions import AsyncDBActions
+from functions.ranking import spread_ranks
+from functions.single_flight import AsyncSingleFlight, SingleFlight
+from helpers import board_cache, board_versions
+from helpers.board_sync import now_iso
 
 
+# Columns every level of the board tree keeps under a `?fields=` projection, since
+# nesting, ordering, pagination and the ownership checks read them.
+REQUIRED_FIELDS = {
+  'boards': ('id', 'created_at', 'slug', 'creator_id'),
+  'lists': ('id', 'board_id', 'rank', 'position'),
+  'cards': ('id', 'list_id'),
+}
+FIELD_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
 
 
+# Reads `?fields=id,name,lists.title,cards.title` into the columns to select per table.
+# Unprefixed names are board columns; a level that isn't mentioned keeps every column.
+# Returns None when the request doesn't ask for a projection.
+def parse_fields(params):
+  raw = params.get('fields')
+  if not raw:
+    return None
+
+  requested = {}
+  for name in raw.split(','):
+    name = name.strip()
+    if not name:
+      continue
+    level, _, column = name.rpartition('.')
+    level = level or 'boards'
+    if level not in REQUIRED_FIELDS or (column != '*' and not FIELD_NAME.match(column)):
+      raise ValueError(f"Invalid field: {name}")
+    requested.setdefault(level, []).append(column)
+
+  fields = {}
+  for level, columns in requested.items():
+    if '*' in columns:
+      continue
+    fields[level] = ','.join(dict.fromkeys([*REQUIRED_FIELDS[level], *columns]))
+  return fields
+
+
+# The columns to select for one level of the tree under the given projection.
+def columns_for(fields, level: str):
+  return (fields or {}).get(level, '*')
+
+
+
+
+# Records a write to a board, its lists or its cards: drops the owner's cached tree
+# and bumps the ETag versions of the owner and the board.
+def board_changed(board_id=None, user_id=None, db: DBActions = None):
+  if not user_id and board_id:
+    user_id = board_cache.board_owner(board_id, db)
+  board_cache.invalidate_user(user_id)
+  board_versions.bump(user_id=user_id, board_id=board_id)
+  if user_id:
+    # Reads already in flight may have missed this write; later readers start a fresh one
+    _board_reads.forget(lambda key: key[0] == str(user_id))
+    _async_board_reads.forget(lambda key: key[0] == str(user_id))
+
+
+# Orders rows by their fractional rank (see functions/ranking.py).
+# Rows written before ranks existed have no rank and fall back to their stored position, then creation time.
+def sort_by_rank(rows: list):
+  return sorted(rows, key=lambda row: (row.get('rank') or '', row.get('position') or 0, str(row.get('created_at') or ''), str(row['id'])))
+
+
+# Gives every list on the board a fresh, evenly spaced rank and renumbers the positions.
+# Runs in the background once rank keys grow too long, and once for boards created before ranks existed.
+# Only the ordering columns are written, so edits made meanwhile to other columns are kept.
+def rebalance_list_ranks(board_id, db: DBActions = None):
+  db = db or DBActions(use_admin=True)
+  response = db.query('lists').select('id', 'rank', 'position', 'created_at').eq('board_id', str(board_id)).all()
+  lists = sort_by_rank(response.data if response and response.data else [])
+  if not lists:
+    return []
+
+  updated_at = now_iso()
+  updates = [
+    {'id': list_item['id'], 'rank': rank, 'position': index + 1, 'updated_at': updated_at}
+    for index, (list_item, rank) in enumerate(zip(lists, spread_ranks(len(lists))))
+  ]
+  db.batch_update('lists', updates)
+  board_changed(board_id, db=db)
+  return updates
+
+
+# Gives every card of the list a fresh, evenly spaced rank, like rebalance_list_ranks does for lists.
+def rebalance_card_ranks(list_id, board_id=None, db: DBActions = None):
+  db = db or DBActions(use_admin=True)
+  response = db.query('cards').select('id', 'rank', 'created_at').eq('list_id', str(list_id)).all()
+  cards = sort_by_rank(response.data if response and response.data else [])
+  if not cards:
+    return []
+
+  updated_at = now_iso()
+  updates = [
+    {'id': card['id'], 'rank': rank, 'updated_at': updated_at}
+    for card, rank in zip(cards, spread_ranks(len(cards)))
+  ]
+  db.batch_update('cards', updates)
+  if board_id is None:
+    list_item = db.query('lists').select('board_id').eq('id', str(list_id)).first()
+    board_id = list_item['board_id'] if list_item else None
+  board_changed(board_id, db=db)
+  return updates
+
+
+# Nests the fetched lists into their boards and the fetched cards into their lists.
+# Lists and cards are ordered by rank and list positions renumbered from 1, since a move only rewrites the moved row.
+def assemble_board_tree(boards: list, lists: list, cards: list):
+  lists_by_board = {board['id']: [] for board in boards}
+  cards_by_list = {}
+
+  for list_item in lists:
+    list_item['cards'] = cards_by_list.setdefault(list_item['id'], [])
+    lists_by_board.setdefault(list_item['board_id'], []).append(list_item)
+
+  for card in cards:
+    cards_by_list.setdefault(card['list_id'], []).append(card)
+
+  for board in boards:
+    board['lists'] = sort_by_rank(lists_by_board.get(board['id'], []))
+    for index, list_item in enumerate(board['lists']):
+      list_item['position'] = index + 1
+      list_item['cards'][:] = sort_by_rank(list_item['cards'])
+
+  return boards
+
+
+# The reads and shaping below are shared by the sync (DBActions) and async (AsyncDBActions) variants
+# of each board read, which only differ in how they wait for Supabase.
+def _rows(response):
+  return response.data if response and response.data else []
+
+
+# Drops the creator_id the board reads select for filtering and ownership checks.
+def _owned_boards(boards: list):
+  for board in boards:
+    board.pop('creator_id', None)
+  return boards
+
+
+def _lists_query(db, boards: list, fields: dict):
+  return db.get_in('lists', 'board_id', [board['id'] for board in boards], columns_for(fields, 'lists'))
+
+
+def _cards_query(db, lists: list, fields: dict):
+  return db.get_in('cards', 'list_id', [list_item['id'] for list_item in lists], columns_for(fields, 'cards'))
+
+
+# Attaches lists and cards to the given boards.
+# Children are fetched with one `in` query per level (lists, then cards) keyed by the parent ids,
+# so the number of round trips stays constant no matter how many boards or lists there are
+# (get_in pages a level past the MAX_ROWS rows a single response can hold).
+def attach_lists_and_cards(db: DBActions, boards: list, fields: dict = None):
+  lists = _rows(_lists_query(db, boards, fields)) if boards else []
+  cards = _rows(_cards_query(db, lists, fields)) if lists else []
+  return assemble_board_tree(boards, lists, cards)
+
+
+# Async counterpart of attach_lists_and_cards for AsyncDBActions.
+async def aattach_lists_and_cards(db, boards: list, fields: dict = None):
+  lists = _rows(await _lists_query(db, boards, fields)) if boards else []
+  cards = _rows(await _cards_query(db, lists, fields)) if lists else []
+  return assemble_board_tree(boards, lists, cards)
+
+
+# Concurrent identical reads of a user's board tree (several tabs open at once, retries, reconnects)
+# share one fetch per worker instead of each repeating the Supabase fan-out.
+_board_reads = SingleFlight()
+_async_board_reads = AsyncSingleFlight()
+
+
+def _read_key(id, use_cache: bool, fields: dict):
+  return (str(id), use_cache, json.dumps(fields, sort_keys=True) if fields else None)
+
+
+# Caches a tree loaded while the user's board version was `version`. Writes bump the version
+# (board_changed), so a tree whose load overlapped a write is returned but not cached: it may
+# predate the write, and the ETag of the new version would then be served with it.
+def _cache_tree(id, data: dict, version):
+  if board_versions.user_version(id) == version:
+    board_cache.set_boards(id, data)
+
+
+# Projected trees are partial, so they neither read nor fill the cache
+def _uses_cache(use_cache: bool, fields: dict):
+  return use_cache and not fields
+
+
+def _boards_query(db, id, fields: dict):
+  return db.get_where('boards', {'creator_id': id}, columns_for(fields, 'boards'))
+
+
+# The response for the user's board tree, given their boards with lists and cards attached.
+def _tree(boards: list):
+  if not boards:
+    return {"message": "No boards found"}
+  return {"message": "Request Successful", "boards": boards}
+
 
 # Function to help with getting boards data. 
 # This includes structuring the returned data to contain, lists, cards, etc, within the board detail.
-def get_full_boards_data(id: any):
+# Results are cached per user (see helpers/board_cache.py) until a board, list or card write invalidates them.
+# Concurrent callers share the returned dict, so it must not be modified.
+def get_full_boards_data(id: any, use_cache: bool = True, fields: dict = None):
+  use_cache = _uses_cache(use_cache, fields)
+  cached = board_cache.get_boards(id) if use_cache else None
+  if cached is not None:
+    return cached
+
+  return _board_reads.do(_read_key(id, use_cache, fields), lambda: _load_full_boards_data(id, use_cache, fields))
+
+
+def _load_full_boards_data(id: any, use_cache: bool, fields: dict):
   db = DBActions(use_admin=True)
-  data = {
-    "message": "Request Successful"
+  version = board_versions.user_version(id) if use_cache else None
+  boards = _owned_boards(_rows(_boards_query(db, id, fields)))
+  data = _tree(attach_lists_and_cards(db, boards, fields))
+  if use_cache:
+    _cache_tree(id, data, version)
+  return data
+
+
+# Page sizes for cursor-paginated and streamed board listings
+BOARD_PAGE_SIZE = 25
+MAX_BOARD_PAGE_SIZE = 100
+
+
+# Cursors are opaque to clients: the (created_at, id) of the last board of a page.
+def encode_cursor(board: dict):
+  raw = json.dumps([board['created_at'], str(board['id'])]).encode('utf-8')
+  return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str):
+  try:
+    created_at, board_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return str(created_at), str(board_id)
+  except (ValueError, TypeError):
+    raise ValueError("Invalid cursor")
+
+
+# Reads `limit`/`cursor` from the query string; returns None when the request isn't paginated.
+def parse_page_params(params):
+  if 'limit' not in params and 'cursor' not in params:
+    return None
+  limit = int(params.get('limit') or BOARD_PAGE_SIZE)
+  cursor = params.get('cursor') or None
+  if cursor:
+    decode_cursor(cursor)
+  return limit, cursor
+
+
+def wants_stream(params):
+  return params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+# One page of boards starting after `cursor`; one extra row tells whether another page follows.
+def _page_query(db, id, limit: int, cursor: str, fields: dict):
+  after = decode_cursor(cursor) if cursor else None
+  return db.get_page('boards', 'creator_id', id, limit + 1, after, columns_for(fields, 'boards'))
+
+
+def _page_size(limit: int):
+  return max(1, min(limit, MAX_BOARD_PAGE_SIZE))
+
+
+# Splits the rows read by _page_query into the page's boards and whether another page follows.
+def _page_boards(response, limit: int):
+  rows = _rows(response)
+  return _owned_boards(rows[:limit]), len(rows) > limit
+
+
+def _page(boards: list, has_more: bool):
+  return {
+    "message": "Request Successful" if boards else "No boards found",
+    "boards": boards,
+    "next_cursor": encode_cursor(boards[-1]) if has_more else None,
   }
-  all_boards = db.get_many('boards', 'creator_id', id)
-  
-  if not all_boards.data or len(all_boards.data) == 0:
-    data['message'] = "No boards found"
-    return data
 
-  for board in all_boards.data:
-    board.pop('creator_id')
-    lists_within_board = db.get_many('lists', 'board_id', board['id'])
-    board['lists'] = lists_within_board.data if lists_within_board and lists_within_board.data else []
-    
-    for list in lists_within_board.data:
-      cards_within_list = db.get_many('cards', 'list_id', list['id'])
-      list['cards'] = cards_within_list.data if cards_within_list and cards_within_list.data else []
-  
-  data['boards'] = all_boards.data
-  
+
+# Fetches one page of the user's boards with their lists and cards, ordered by creation.
+def get_boards_page(id: any, limit: int = BOARD_PAGE_SIZE, cursor: str = None, db: DBActions = None, fields: dict = None):
+  db = db or DBActions(use_admin=True)
+  limit = _page_size(limit)
+  boards, has_more = _page_boards(_page_query(db, id, limit, cursor, fields), limit)
+  return _page(attach_lists_and_cards(db, boards, fields), has_more)
+
+
+# The streamed document is the one get_full_boards_data returns, written one board at a time.
+TREE_JSON_START = '{"message": "Request Successful", "boards": ['
+TREE_JSON_END = ']}'
+
+
+# The JSON of a page's boards, each preceded by a separator unless it is the document's first board.
+def _boards_json(boards: list, first_page: bool):
+  return [
+    ('' if first_page and index == 0 else ', ') + json.dumps(board, cls=DjangoJSONEncoder)
+    for index, board in enumerate(boards)
+  ]
+
+
+# Yields the same JSON document as get_full_boards_data, one board at a time, fetching
+# BOARD_PAGE_SIZE boards (and their lists and cards) per step so memory stays bounded.
+# `first_page` lets the caller fetch the first page up front, e.g. to answer "no boards" with a 400.
+def iter_boards_json(id: any, first_page: dict = None, page_size: int = BOARD_PAGE_SIZE, fields: dict = None):
+  db = DBActions(use_admin=True)
+  page = first_page or get_boards_page(id, page_size, db=db, fields=fields)
+
+  yield TREE_JSON_START
+  opening = True
+  while True:
+    yield from _boards_json(page['boards'], opening)
+    opening = opening and not page['boards']
+    if not page['next_cursor']:
+      break
+    page = get_boards_page(id, page_size, page['next_cursor'], db=db, fields=fields)
+  yield TREE_JSON_END
+
+
+# Async counterpart of get_full_boards_data for the ASGI views.
+# The cache and version reads may go to a shared Django cache, so they run off the event loop.
+async def aget_full_boards_data(id: any, use_cache: bool = True, fields: dict = None):
+  use_cache = _uses_cache(use_cache, fields)
+  cached = await sync_to_async(board_cache.get_boards)(id) if use_cache else None
+  if cached is not None:
+    return cached
+
+  return await _async_board_reads.do(_read_key(id, use_cache, fields), lambda: _aload_full_boards_data(id, use_cache, fields))
+
+
+async def _aload_full_boards_data(id: any, use_cache: bool, fields: dict):
+  db = AsyncDBActions(use_admin=True)
+  version = await sync_to_async(board_versions.user_version)(id) if use_cache else None
+  boards = _owned_boards(_rows(await _boards_query(db, id, fields)))
+  data = _tree(await aattach_lists_and_cards(db, boards, fields))
+  if use_cache:
+    await sync_to_async(_cache_tree)(id, data, version)
   return data
 
 
+def _board_query(db, board_id, fields: dict):
+  return db.query('boards').select(columns_for(fields, 'boards')).eq('id', board_id)
+
+
+def _slug_query(db, user_id, slug: str, fields: dict):
+  return db.get_where('boards', {'creator_id': user_id, 'slug': slug}, columns_for(fields, 'boards'))
+
+
+# The board read by id through the slug index, if it still is the user's board with that slug.
+def _indexed_board(response, user_id, slug: str):
+  rows = _rows(response)
+  if rows and str(rows[0]['creator_id']) == str(user_id) and rows[0]['slug'] == slug:
+    return rows[0]
+  board_cache.forget_slug(user_id, slug)
+  return None
+
+
+# The board read by (creator_id, slug), which the slug index then knows.
+def _slug_board(response, user_id, slug: str):
+  rows = _rows(response)
+  if not rows:
+    return None
+  board_cache.remember_slug(user_id, slug, rows[0]['id'])
+  return rows[0]
+
+
+# Looks up one of the user's boards by slug.
+# Uses the slug -> id index when it knows the board and falls back to a query filtered on (creator_id, slug).
+def get_board_by_slug(db: DBActions, user_id, slug: str, fields: dict = None):
+  board_id = board_cache.board_id_for_slug(user_id, slug)
+  board = _indexed_board(_board_query(db, board_id, fields).execute(), user_id, slug) if board_id else None
+  return board or _slug_board(_slug_query(db, user_id, slug, fields), user_id, slug)
+
+
+# Async counterpart of get_board_by_slug for AsyncDBActions.
+async def aget_board_by_slug(db, user_id, slug: str, fields: dict = None):
+  board_id = board_cache.board_id_for_slug(user_id, slug)
+  board = _indexed_board(await _board_query(db, board_id, fields).execute(), user_id, slug) if board_id else None
+  return board or _slug_board(await _slug_query(db, user_id, slug, fields), user_id, slug)
+
+
+# Async counterpart of get_boards_page.
+async def aget_boards_page(id: any, limit: int = BOARD_PAGE_SIZE, cursor: str = None, db=None, fields: dict = None):
+  db = db or AsyncDBActions(use_admin=True)
+  limit = _page_size(limit)
+  boards, has_more = _page_boards(await _page_query(db, id, limit, cursor, fields), limit)
+  return _page(await aattach_lists_and_cards(db, boards, fields), has_more)
+
+
+# Async counterpart of iter_boards_json, for StreamingHttpResponse under ASGI.
+async def aiter_boards_json(id: any, first_page: dict = None, page_size: int = BOARD_PAGE_SIZE, fields: dict = None):
+  db = AsyncDBActions(use_admin=True)
+  page = first_page or await aget_boards_page(id, page_size, db=db, fields=fields)
+
+  yield TREE_JSON_START
+  opening = True
+  while True:
+    for chunk in _boards_json(page['boards'], opening):
+      yield chunk
+    opening = opening and not page['boards']
+    if not page['next_cursor']:
+      break
+    page = await aget_boards_page(id, page_size, page['next_cursor'], db=db, fields=fields)
+  yield TREE_JSON_END
+
+
 async def get_board_data(board_slug: str):
   db = DBActions(use_admin=True)
   data = {
@@ -43,13 +428,6 @@ async def get_board_data(board_slug: str):
     data['message'] = "No boards found"
     return data
   
-  lists_within_board = db.get_many('lists', 'board_id', board['id'])
-  board['lists'] = lists_within_board.data if lists_within_board and lists_within_board.data else []
+  data['board'] = attach_lists_and_cards(db, board.data[:1])[0]
   
-  for list in lists_within_board.data:
-    cards_within_list = db.get_many('cards', 'list_id', list['id'])
-    list['cards'] = cards_within_list.data if cards_within_list and cards_within_list.data else []
-  
-  data['board'] = board.data
-  
-  return data
\ No newline at end of file
+  return data
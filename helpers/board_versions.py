@@ -0,0 +1,89 @@
+import hashlib
+import secrets
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.http import parse_etags
+
+
+# Version counters behind the ETags of the board read endpoints.
+# Every write path bumps the version of the user (get-boards) and of the board (get-board-info),
+# so a client's If-None-Match can be answered with a 304 before any Supabase call is made.
+#
+# Counters live in the Django cache named by BOARD_VERSION_CACHE_ALIAS. A new or evicted counter
+# starts from a random value, so an ETag issued before it was lost can never match again.
+# When that cache is local to the process (LocMemCache), other workers don't see the bumps, so
+# the ETags also carry a time bucket of BOARD_CACHE_TTL seconds: a worker can't keep answering
+# 304 for longer than the board tree cache itself may stay stale.
+BOARD_VERSION_CACHE_ALIAS = getattr(settings, 'BOARD_VERSION_CACHE_ALIAS', 'default')
+BOARD_CACHE_TTL = getattr(settings, 'BOARD_CACHE_TTL', 30)
+VERSION_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _cache():
+  return caches[BOARD_VERSION_CACHE_ALIAS]
+
+
+def _is_shared(cache):
+  return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def _version(key):
+  cache = _cache()
+  version = cache.get(key)
+  if version is None:
+    cache.add(key, secrets.randbits(48), VERSION_TIMEOUT)
+    version = cache.get(key, 0)
+  return version
+
+
+def _bump(key):
+  cache = _cache()
+  try:
+    cache.incr(key)
+  except ValueError:
+    cache.add(key, secrets.randbits(48), VERSION_TIMEOUT)
+
+
+def user_version(user_id):
+  return _version(f"boards:version:user:{user_id}")
+
+
+def board_version(board_id):
+  return _version(f"boards:version:board:{board_id}")
+
+
+# Bumps the versions after a write to a board (and so to its owner's board list).
+def bump(user_id=None, board_id=None):
+  if user_id:
+    _bump(f"boards:version:user:{user_id}")
+  if board_id:
+    _bump(f"boards:version:board:{board_id}")
+
+
+# Builds a strong ETag for the given version and request (query parameters select different representations).
+def make_etag(kind: str, version, request) -> str:
+  parts = [kind, str(version), request.get_full_path()]
+  if not _is_shared(_cache()):
+    parts.append(str(int(time.time() // max(BOARD_CACHE_TTL, 1))))
+  digest = hashlib.sha256(":".join(parts).encode("utf-8")).hexdigest()[:32]
+  return f'"{digest}"'
+
+
+def user_etag(user_id, request) -> str:
+  return make_etag(f"user:{user_id}", user_version(user_id), request)
+
+
+def board_etag(board_id, request) -> str:
+  return make_etag(f"board:{board_id}", board_version(board_id), request)
+
+
+# True when the client's If-None-Match already holds the current ETag.
+def not_modified(request, etag: str) -> bool:
+  header = request.headers.get("If-None-Match")
+  if not header:
+    return False
+  etags = parse_etags(header)
+  return "*" in etags or etag in etags
@@ -0,0 +1,246 @@
+import threading
+from functions.db_actions import DBActions
+from functions.ranking import needs_rebalance, ranks_between
+from helpers import board_cache
+from helpers.board_helpers import board_changed, rebalance_card_ranks, sort_by_rank
+from helpers.board_sync import now_iso
+
+
+# Card placement for the add-card and move-cards endpoints.
+# Cards are ordered by a fractional rank (functions/ranking.py), so placing a card writes that card only:
+# it gets a rank between the ranks of its new neighbours. After a drag the client sends the ids of the
+# cards it was dropped between (`prevId`/`nextId`), which costs a lookup of those two rows however long
+# the list is. A 1-based `position` is accepted too and reads the ranks of the target list; with neither,
+# the card goes to the end of the list.
+MAX_CARDS_PER_MOVE = 100
+# The columns a move writes
+PLACEMENT_COLUMNS = ('list_id', 'rank', 'updated_at')
+
+
+class CardError(Exception):
+  # Fails a card write with the given message and HTTP status
+  def __init__(self, message, status=400):
+    super().__init__(message)
+    self.status = status
+
+
+def _rows(response):
+  return response.data if response and response.data else []
+
+
+# Returns {list_id: board_id} for the given lists after checking the user owns every board involved.
+def list_boards(db: DBActions, list_ids, user_id):
+  list_ids = list(dict.fromkeys(str(list_id) for list_id in list_ids))
+  boards = {str(row['id']): str(row['board_id']) for row in _rows(db.get_in('lists', 'id', list_ids, 'id,board_id'))}
+  if any(list_id not in boards for list_id in list_ids):
+    raise CardError("List not found", status=404)
+
+  for board_id in set(boards.values()):
+    owner = board_cache.board_owner(board_id, db)
+    if owner is None:
+      raise CardError("Board not found", status=404)
+    if str(owner) != str(user_id):
+      raise CardError("You are not authorized to update this board", status=401)
+  return boards
+
+
+class _Placement:
+  """
+  Works out ranks for the cards placed by one request.
+
+  Ranks are written once at the end of the request, so `placed` holds the cards already given a new
+  list and rank by earlier moves of the same request; lookups read the database and overlay them.
+  """
+  def __init__(self, db: DBActions, known: dict = None):
+    self.db = db
+    self.known = known or {}
+    self.placed = {}
+    self._lists = {}
+
+  def _overlay(self, rows, list_id, moving):
+    skip = set(moving) | set(self.placed)
+    rows = [row for row in rows if str(row['id']) not in skip]
+    return rows + [card for card in self.placed.values() if str(card['list_id']) == list_id and str(card['id']) not in moving]
+
+  # Rank of the nearest card after `rank` ('next'), or before it ('prev'; rank None = the last card).
+  def _adjacent_rank(self, list_id, rank, direction, moving):
+    query = self.db.query('cards').select('id', 'rank').eq('list_id', list_id)
+    if direction == 'next':
+      query = query.gt('rank', rank).order('rank')
+    else:
+      if rank is not None:
+        query = query.lt('rank', rank)
+      query = query.order('rank', desc=True)
+    rows = _rows(query.limit(len(moving) + len(self.placed) + 1).execute())
+
+    ranks = [row.get('rank') or '' for row in self._overlay(rows, list_id, moving)]
+    if direction == 'next':
+      ranks = [candidate for candidate in ranks if candidate > rank]
+      return min(ranks) if ranks else None
+    ranks = [candidate for candidate in ranks if rank is None or candidate < rank]
+    # Unranked cards sort first, so a gap after them starts at the beginning
+    return (max(ranks) or None) if ranks else None
+
+  # The cards of the list ordered by rank; lists from before ranks existed get ranks once.
+  def _list_cards(self, list_id, board_id, moving):
+    if list_id not in self._lists:
+      cards = sort_by_rank(_rows(self.db.query('cards').select('id', 'rank', 'created_at').eq('list_id', list_id).all()))
+      if any(not card.get('rank') for card in cards):
+        cards = rebalance_card_ranks(list_id, board_id, self.db)
+      self._lists[list_id] = cards
+    return sort_by_rank(self._overlay(self._lists[list_id], list_id, moving))
+
+  def _neighbour(self, card_id, list_id, moving):
+    if card_id in moving:
+      raise CardError("A card cannot be placed next to itself")
+    card = self.placed.get(card_id) or self.known.get(card_id)
+    if card is None:
+      raise CardError("Neighbour card not found", status=409)
+    if str(card['list_id']) != list_id:
+      raise CardError("Neighbour card is not in the target list", status=409)
+    return card
+
+  def gap(self, list_id, board_id, moving=(), prev_id=None, next_id=None, position=None):
+    """
+    Returns the (before, after) ranks the cards dropped into the list must sort between.
+
+    Raises:
+      CardError: With status 409 when the given neighbours no longer sit next to each other.
+    """
+    moving = set(moving)
+    prev = self._neighbour(prev_id, list_id, moving) if prev_id else None
+    next_card = self._neighbour(next_id, list_id, moving) if next_id else None
+
+    if (prev_id or next_id) and all(card.get('rank') for card in (prev, next_card) if card):
+      before = prev['rank'] if prev else self._adjacent_rank(list_id, next_card['rank'], 'prev', moving)
+      after = next_card['rank'] if next_card else self._adjacent_rank(list_id, prev['rank'], 'next', moving)
+      if after is not None and (before or '') >= after:
+        raise CardError("The neighbouring cards have moved, reload the list", status=409)
+      return before, after
+
+    if not (prev_id or next_id) and position is None:
+      return self._adjacent_rank(list_id, None, 'prev', moving), None
+
+    # Placed by index: also the fallback for neighbours written before ranks existed
+    cards = self._list_cards(list_id, board_id, moving)
+    ids = [str(card['id']) for card in cards]
+    if prev_id:
+      index = ids.index(prev_id) + 1 if prev_id in ids else len(ids)
+    elif next_id:
+      index = ids.index(next_id) if next_id in ids else len(ids)
+    else:
+      index = max(0, min(position - 1, len(ids)))
+    before = cards[index - 1]['rank'] if index > 0 else None
+    after = cards[index]['rank'] if index < len(cards) else None
+    return before, after
+
+  def place(self, cards: list, list_id, board_id, prev_id=None, next_id=None, position=None):
+    # Gives the cards, in order, consecutive ranks in the gap and remembers them for later moves
+    moving = [str(card['id']) for card in cards]
+    before, after = self.gap(list_id, board_id, moving, prev_id, next_id, position)
+    updated_at = now_iso()
+    for card, rank in zip(cards, ranks_between(before, after, len(cards))):
+      placed = {**card, 'list_id': list_id, 'rank': rank, 'updated_at': updated_at}
+      self.placed[str(card['id'])] = placed
+    return [self.placed[card_id] for card_id in moving]
+
+
+def _parse_moves(moves):
+  if not isinstance(moves, list) or not moves:
+    raise ValueError("moves must be a non-empty list")
+
+  parsed = []
+  seen = set()
+  for move in moves:
+    if not isinstance(move, dict):
+      raise ValueError("Each move must be an object")
+    card_ids = move.get('cardIds') or ([move['cardId']] if move.get('cardId') else [])
+    if not isinstance(card_ids, list) or not card_ids or not move.get('listId'):
+      raise ValueError("Each move needs cardIds and listId")
+    card_ids = [str(card_id) for card_id in card_ids]
+    if seen.intersection(card_ids) or len(set(card_ids)) != len(card_ids):
+      raise ValueError("A card can only be moved once per request")
+    seen.update(card_ids)
+
+    position = move.get('position')
+    if position is not None and (not isinstance(position, int) or isinstance(position, bool) or position < 1):
+      raise ValueError("position must be a positive integer")
+    parsed.append({
+      'card_ids': card_ids,
+      'list_id': str(move['listId']),
+      'prev_id': str(move['prevId']) if move.get('prevId') else None,
+      'next_id': str(move['nextId']) if move.get('nextId') else None,
+      'position': position,
+    })
+
+  if len(seen) > MAX_CARDS_PER_MOVE:
+    raise ValueError(f"At most {MAX_CARDS_PER_MOVE} cards per request")
+  return parsed
+
+
+def move_cards(user_id, moves, db: DBActions = None):
+  """
+  Moves cards within or between lists; only the moved cards' rows are written.
+
+  Each move drops its cards, in the given order, between the cards `prevId` and `nextId` of the target
+  list (omit one at either end of the list), at the 1-based `position`, or at the end of the list:
+
+    [{"cardIds": ["c1", "c2"], "listId": "l2", "prevId": "c7", "nextId": "c9"}, ...]
+
+  The request costs a read of the cards, a read of the lists and one write (plus one lookup per
+  missing neighbour), whatever the size of the lists.
+
+  Returns:
+    list: The moved cards with their new list_id and rank.
+
+  Raises:
+    ValueError: If the moves are malformed.
+    CardError: If a card, list or neighbour is missing or stale, or the user doesn't own a board.
+  """
+  moves = _parse_moves(moves)
+  db = db or DBActions(use_admin=True)
+
+  # The moved cards and the given neighbours in one read
+  ids = {card_id for move in moves for card_id in move['card_ids']}
+  ids.update(move[key] for move in moves for key in ('prev_id', 'next_id') if move[key])
+  known = {str(card['id']): card for card in _rows(db.get_in('cards', 'id', list(ids)))}
+  for move in moves:
+    if any(card_id not in known for card_id in move['card_ids']):
+      raise CardError("Card not found", status=404)
+
+  source_lists = {str(known[card_id]['list_id']) for move in moves for card_id in move['card_ids']}
+  boards = list_boards(db, source_lists | {move['list_id'] for move in moves}, user_id)
+
+  placement = _Placement(db, known)
+  for move in moves:
+    cards = [known[card_id] for card_id in move['card_ids']]
+    placement.place(cards, move['list_id'], boards[move['list_id']], move['prev_id'], move['next_id'], move['position'])
+
+  moved = list(placement.placed.values())
+  # Only the placement columns, so a concurrent edit of the cards' content isn't overwritten
+  if len(moved) == 1:
+    card = moved[0]
+    response = db.update('cards', {key: card[key] for key in PLACEMENT_COLUMNS}, card['id'])
+    failed = not _rows(response)
+  else:
+    results = db.batch_update('cards', [{'id': card['id'], **{key: card[key] for key in PLACEMENT_COLUMNS}} for card in moved]) or []
+    failed = any(not result['ok'] for result in results)
+
+  for list_id in {str(card['list_id']) for card in moved if needs_rebalance(card['rank'])}:
+    threading.Thread(target=rebalance_card_ranks, args=(list_id, boards[list_id]), daemon=True).start()
+  for board_id in {boards[list_id] for list_id in source_lists | {str(card['list_id']) for card in moved}}:
+    board_changed(board_id, user_id)
+
+  if failed:
+    raise CardError("Failed to move cards")
+  return moved
+
+
+# The rank of a new card at the given place (see _Placement.gap for the arguments).
+def rank_for_new_card(db: DBActions, list_id, board_id, prev_id=None, next_id=None, position=None):
+  neighbours = [str(card_id) for card_id in (prev_id, next_id) if card_id]
+  known = {str(card['id']): card for card in _rows(db.get_in('cards', 'id', neighbours))} if neighbours else {}
+  before, after = _Placement(db, known).gap(
+    str(list_id), board_id, (), str(prev_id) if prev_id else None, str(next_id) if next_id else None, position,
+  )
+  return ranks_between(before, after, 1)[0]
@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from functions.cache import TTLCache
+from functions.db_actions import DBActions
+from helpers.focus_rollups import read_all, rollup_id
+
+
+# Focus analytics (the focus/analytics/ endpoint): a year heatmap, the weekday x hour distribution,
+# daily and weekly trends with rolling averages, and per-block / per-path breakdowns.
+# A user's sessions are loaded once into columnar NumPy arrays and every figure is a vectorized pass
+# over them (bincount / convolve), so the cost follows the number of sessions, not Python loops per day.
+#
+# Results are cached per user under the `updated_at` of their all-time rollup, which every session
+# write stamps (helpers/focus_rollups.py): the next request after a write recomputes, on every worker,
+# and other requests only read that one rollup row.
+FOCUS_ANALYTICS_CACHE_TTL = getattr(settings, 'FOCUS_ANALYTICS_CACHE_TTL', 60 * 60)
+FOCUS_ANALYTICS_CACHE_MAX_ENTRIES = getattr(settings, 'FOCUS_ANALYTICS_CACHE_MAX_ENTRIES', 1024)
+HEATMAP_DAYS = 365
+ROLLING_DAYS = 7
+ROLLING_WEEKS = 4
+EPOCH = date(1970, 1, 1)
+
+_results = TTLCache(maxsize=FOCUS_ANALYTICS_CACHE_MAX_ENTRIES, ttl=FOCUS_ANALYTICS_CACHE_TTL)
+
+SESSION_COLUMNS = ('id', 'entry_date', 'start_time', 'minutes_focused', 'block_id', 'path_id')
+
+
+class SessionColumns:
+  """
+  A user's sessions as parallel arrays.
+
+  Attributes:
+    days (ndarray): Entry dates as days since the epoch (int64).
+    hours (ndarray): Start hours, -1 when the session has no start time (int8).
+    minutes (ndarray): Minutes focused (float64, so it can be used as bincount weights).
+    blocks, paths (ndarray): Index into `block_ids`/`path_ids`, -1 for none (int64).
+  """
+  def __init__(self, rows: list):
+    self.days = np.array([row['entry_date'][:10] for row in rows], dtype='datetime64[D]').astype(np.int64)
+    self.hours = np.array([int(row['start_time'][:2]) if row.get('start_time') else -1 for row in rows], dtype=np.int8)
+    self.minutes = np.array([row.get('minutes_focused') or 0 for row in rows], dtype=np.float64)
+    self.block_ids, self.blocks = self._codes(rows, 'block_id')
+    self.path_ids, self.paths = self._codes(rows, 'path_id')
+
+  @staticmethod
+  def _codes(rows, column):
+    values = np.array([row.get(column) or '' for row in rows], dtype=object)
+    ids, codes = np.unique(values.astype(str), return_inverse=True)
+    if len(ids) and ids[0] == '':
+      # '' sorts first: sessions without one get -1
+      return ids[1:].tolist(), codes.astype(np.int64) - 1
+    return ids.tolist(), codes.astype(np.int64)
+
+  def __len__(self):
+    return len(self.minutes)
+
+
+def _rolling(values: np.ndarray, window: int):
+  # Trailing mean over `window` entries (shorter at the start of the series)
+  sums = np.convolve(values, np.ones(window), mode='full')[:len(values)]
+  counts = np.minimum(np.arange(1, len(values) + 1), window)
+  return sums / counts
+
+
+def _breakdown(ids: list, codes: np.ndarray, minutes: np.ndarray):
+  mask = codes >= 0
+  totals = np.bincount(codes[mask], weights=minutes[mask], minlength=len(ids))
+  counts = np.bincount(codes[mask], minlength=len(ids))
+  order = np.argsort(-totals, kind='stable')
+  return [{'id': ids[index], 'total_time': int(totals[index]), 'sessions': int(counts[index])} for index in order]
+
+
+def compute_analytics(columns: SessionColumns, today: date, weeks: int = 12):
+  """
+  Computes every figure of the analytics endpoint from the session arrays.
+
+  Returns:
+    dict: heatmap (HEATMAP_DAYS daily totals ending today), distribution (7 x 24 minutes by weekday,
+          Monday first, and start hour), weekday and hour totals, daily and weekly trends with rolling
+          averages, and per-block / per-path breakdowns.
+  """
+  today_index = (today - EPOCH).days
+  first_day = today_index - HEATMAP_DAYS + 1
+  # Weeks start on Monday; the epoch was a Thursday
+  weekdays = (columns.days + 3) % 7
+  this_week = today_index - (today_index + 3) % 7
+  first_week = this_week - 7 * (weeks - 1)
+
+  in_year = (columns.days >= first_day) & (columns.days <= today_index)
+  daily = np.bincount(columns.days[in_year] - first_day, weights=columns.minutes[in_year], minlength=HEATMAP_DAYS)
+
+  timed = columns.hours >= 0
+  distribution = np.bincount(
+    weekdays[timed] * 24 + columns.hours[timed], weights=columns.minutes[timed], minlength=7 * 24,
+  ).reshape(7, 24)
+
+  week_index = (columns.days - (columns.days + 3) % 7 - first_week) // 7
+  in_weeks = (week_index >= 0) & (columns.days <= today_index)
+  weekly = np.bincount(week_index[in_weeks], weights=columns.minutes[in_weeks], minlength=weeks)[:weeks]
+
+  return {
+    'sessions': len(columns),
+    'total_time': int(columns.minutes.sum()),
+    'heatmap': {
+      'start': (EPOCH + timedelta(days=first_day)).isoformat(),
+      'minutes': daily.astype(int).tolist(),
+    },
+    'distribution': distribution.astype(int).tolist(),
+    'by_weekday': np.bincount(weekdays, weights=columns.minutes, minlength=7).astype(int).tolist(),
+    'by_hour': distribution.sum(axis=0).astype(int).tolist(),
+    'daily_trend': {
+      'minutes': daily[-28:].astype(int).tolist(),
+      f'rolling_{ROLLING_DAYS}d': np.round(_rolling(daily, ROLLING_DAYS)[-28:], 1).tolist(),
+    },
+    'weekly_trend': {
+      'start': (EPOCH + timedelta(days=first_week)).isoformat(),
+      'minutes': weekly.astype(int).tolist(),
+      f'rolling_{ROLLING_WEEKS}w': np.round(_rolling(weekly, ROLLING_WEEKS), 1).tolist(),
+    },
+    'blocks': _breakdown(columns.block_ids, columns.blocks, columns.minutes),
+    'paths': _breakdown(columns.path_ids, columns.paths, columns.minutes),
+  }
+
+
+def get_focus_analytics(user_id, weeks: int = 12, today: date = None, db: DBActions = None):
+  """
+  Returns the user's focus analytics, from the cache unless a session was written since they were computed.
+  """
+  db = db or DBActions(use_admin=True)
+  today = today or timezone.localdate()
+
+  stamp = db.query('focus_stats').select('updated_at').eq('id', rollup_id(user_id, 'all')).first()
+  key = (str(user_id), stamp['updated_at'] if stamp else None, today.isoformat(), weeks)
+  cached = _results.get(key)
+  if cached is not None:
+    return cached
+
+  rows = read_all(lambda: db.query('focus_sessions').select(*SESSION_COLUMNS).eq('user_id', str(user_id)))
+  data = compute_analytics(SessionColumns(rows), today, weeks)
+  _results.set(key, data)
+  return data
+
+
+# Returns hit/miss counters of the analytics cache.
+def stats():
+  return _results.stats()
@@ -0,0 +1,246 @@
+import uuid
+from datetime import date, timedelta
+from django.utils import timezone
+from functions.db_actions import IN_CHUNK_SIZE, MAX_ROWS, DBActions
+from helpers.board_sync import now_iso
+from helpers.focus_streaks import MAX_STREAK_RUNS, as_date, recompute_fields
+from helpers.user_helpers import invalidate_user
+
+
+# Pre-aggregated focus stats (the `focus_stats` table, core.models.FocusStat).
+# Every user has a rollup row per day and per week (starting Monday) in which they focused, plus one
+# all-time row, each holding the minutes focused and the number of sessions. Writing a session increments
+# the three rows it falls in, in Postgres (supabase/migrations), and the all-time totals are copied onto
+# users.total_time/total_focus_sessions. Stats screens read a handful of these rows instead of every
+# session; `manage.py backfill_focus_rollups` rebuilds them from the sessions.
+#
+# Rollup ids are derived from (user, period, date), so a rollup can be upserted without looking up its id.
+PERIODS = ('day', 'week', 'all')
+ROLLUP_NAMESPACE = uuid.UUID('6f1c8f63-4a0e-4d5e-9a53-2d8e61f0c7b4')
+# Supabase caps a response at MAX_ROWS rows, so the bulk reads of the rebuild jobs are paged
+READ_PAGE_SIZE = MAX_ROWS
+
+
+# The first day of the period that contains `day` (None for the all-time rollup).
+def period_start(period: str, day: date):
+  if period == 'day':
+    return day
+  if period == 'week':
+    return day - timedelta(days=day.weekday())
+  return None
+
+
+def rollup_id(user_id, period: str, start: date = None):
+  return str(uuid.uuid5(ROLLUP_NAMESPACE, f"{user_id}:{period}:{start.isoformat() if start else ''}"))
+
+
+def rollup_row(user_id, period: str, start: date, total_time: int, sessions: int, updated_at: str = None):
+  return {
+    'id': rollup_id(user_id, period, start),
+    'user_id': str(user_id),
+    'period': period,
+    'date': start.isoformat() if start else None,
+    'total_time': total_time,
+    'total_focus_sessions': sessions,
+    'updated_at': updated_at or now_iso(),
+  }
+
+
+def _rows(response):
+  return response.data if response and response.data else []
+
+
+# Every row matched by the query (built by `make_query`), read READ_PAGE_SIZE rows at a time.
+def read_all(make_query, page_size: int = READ_PAGE_SIZE):
+  return _rows(make_query().all(page_size))
+
+
+def apply_session(user_id, entry_date, minutes: int, sessions: int = 1, db: DBActions = None, session: dict = None):
+  """
+  Adds a session to the day, week and all-time rollups it falls in; pass negative values to take one out
+  (e.g. when a session is deleted or its minutes change). The user's totals are updated with it, and
+  their streak when the session makes the day reach `mins_for_streak` (helpers/focus_streaks.py).
+
+  Everything is written in Postgres by the apply_focus_session function (supabase/migrations), which
+  also inserts `session` when given, in one transaction and one round trip.
+
+  Returns:
+    tuple: (the inserted session row or None, the day, week and all-time rollup rows as written).
+
+  Raises:
+    APIError: If the session or the rollups couldn't be written; then nothing was.
+  """
+  db = db or DBActions(use_admin=True)
+  day = as_date(entry_date)
+  updated_at = now_iso()
+  rollups = [rollup_row(user_id, period, period_start(period, day), minutes, sessions, updated_at) for period in PERIODS]
+  response = db.rpc('apply_focus_session', {
+    'p_user_id': str(user_id),
+    'p_rollups': rollups,
+    'p_minutes': minutes,
+    'p_sessions': sessions,
+    'p_session': session,
+    'p_max_streak_runs': MAX_STREAK_RUNS,
+  }, table='focus_stats')
+  result = response.data if response and response.data else {}
+
+  written = {row['id']: row for row in result.get('rollups') or []}
+  rows = [written.get(row['id'], row) for row in rollups]
+  invalidate_user(user_id)
+  return result.get('session'), rows
+
+
+def get_rollups(user_id, days: int = 30, weeks: int = 12, today: date = None, db: DBActions = None):
+  """
+  Returns the user's totals and the rollups of the last `days` days and `weeks` weeks, oldest first,
+  with zeroed entries for periods without sessions. Reads the rollups in one query.
+  """
+  db = db or DBActions(use_admin=True)
+  today = today or timezone.localdate()
+  first_day = today - timedelta(days=days - 1)
+  first_week = period_start('week', today) - timedelta(weeks=weeks - 1)
+
+  response = (
+    db.query('focus_stats')
+    .select('period', 'date', 'total_time', 'total_focus_sessions')
+    .eq('user_id', str(user_id))
+    .or_(f"date.gte.{min(first_day, first_week).isoformat()},period.eq.all")
+    .execute()
+  )
+  found = {(row['period'], row['date'][:10] if row['date'] else None): row for row in _rows(response)}
+
+  def series(period, start, count, step):
+    entries = []
+    for index in range(count):
+      key = (start + step * index).isoformat()
+      row = found.get((period, key), {})
+      entries.append({
+        'date': key,
+        'total_time': row.get('total_time', 0),
+        'total_focus_sessions': row.get('total_focus_sessions', 0),
+      })
+    return entries
+
+  totals = found.get(('all', None), {})
+  return {
+    'total_time': totals.get('total_time', 0),
+    'total_focus_sessions': totals.get('total_focus_sessions', 0),
+    'days': series('day', first_day, days, timedelta(days=1)),
+    'weeks': series('week', first_week, weeks, timedelta(weeks=1)),
+  }
+
+
+def build_rollups(sessions: list, updated_at: str = None):
+  """
+  Aggregates sessions ({'user_id', 'entry_date', 'minutes_focused'}) into rollup rows, for backfills.
+
+  Returns:
+    dict: Rollup rows keyed by their id.
+  """
+  updated_at = updated_at or now_iso()
+  totals = {}
+  for session in sessions:
+    day = as_date(session['entry_date'])
+    minutes = session.get('minutes_focused') or 0
+    for period in PERIODS:
+      key = (str(session['user_id']), period, period_start(period, day))
+      time_total, count = totals.get(key, (0, 0))
+      totals[key] = (time_total + minutes, count + 1)
+
+  rows = {}
+  for (user_id, period, start), (time_total, count) in totals.items():
+    row = rollup_row(user_id, period, start, time_total, count, updated_at)
+    rows[row['id']] = row
+  return rows
+
+
+def rebuild_rollups(user_ids: list, db: DBActions = None, dry_run: bool = False):
+  """
+  Recomputes the rollups, focus totals and streaks of the given users from their sessions.
+
+  Uses a fixed number of bulk queries per call (one more per READ_PAGE_SIZE rows read or BATCH_CHUNK_SIZE written):
+  the sessions, the existing rollups and the users are read in bulk; the rollups are written back with bulk
+  upserts and only the users' total and streak columns with a partial bulk update.
+  Rollups of periods left without sessions are zeroed rather than deleted.
+
+  Returns:
+    dict: {'users', 'sessions', 'rollups'} counts.
+  """
+  db = db or DBActions(use_admin=True)
+  user_ids = [str(user_id) for user_id in user_ids]
+  updated_at = now_iso()
+
+  sessions = read_all(lambda: db.query('focus_sessions').select('id', 'user_id', 'entry_date', 'minutes_focused').in_('user_id', user_ids))
+  rows = build_rollups(sessions, updated_at)
+  for existing in read_all(lambda: db.query('focus_stats').select('id', 'user_id', 'period', 'date').in_('user_id', user_ids)):
+    if existing['id'] not in rows:
+      start = as_date(existing['date']) if existing.get('date') else None
+      rows[existing['id']] = {**rollup_row(existing['user_id'], existing['period'], start, 0, 0, updated_at), 'id': existing['id']}
+
+  day_totals = {}
+  for row in rows.values():
+    if row['period'] == 'day':
+      day_totals.setdefault(row['user_id'], {})[row['date']] = row['total_time']
+
+  # Only the id and the recomputed columns are written, so concurrent edits of the rest of the row survive
+  users = []
+  for user in _rows(db.get_in('users', 'id', user_ids, 'id,mins_for_streak')):
+    totals = rows.get(rollup_id(user['id'], 'all'), {})
+    users.append({
+      'id': user['id'],
+      'total_time': totals.get('total_time', 0),
+      'total_focus_sessions': totals.get('total_focus_sessions', 0),
+      **recompute_fields(user, day_totals.get(str(user['id']), {})),
+    })
+
+  if not dry_run:
+    db.upsert('focus_stats', list(rows.values()))
+    db.batch_update('users', users)
+    for user in users:
+      invalidate_user(user['id'])
+  return {'users': len(users), 'sessions': len(sessions), 'rollups': len(rows)}
+
+
+def recompute_streaks(user_ids: list, db: DBActions = None, dry_run: bool = False):
+  """
+  Rebuilds the streaks of the given users from their daily rollups rather than their sessions,
+  e.g. after `mins_for_streak` changed. Reads the users and their day rollups in bulk and writes
+  only the streak columns back with a partial bulk update.
+
+  Returns:
+    dict: {'users', 'days'} counts.
+  """
+  db = db or DBActions(use_admin=True)
+  user_ids = [str(user_id) for user_id in user_ids]
+
+  days = read_all(lambda: db.query('focus_stats').select('id', 'user_id', 'date', 'total_time').in_('user_id', user_ids).eq('period', 'day'))
+  day_totals = {}
+  for row in days:
+    day_totals.setdefault(str(row['user_id']), {})[row['date']] = row['total_time']
+
+  users = [
+    {'id': user['id'], **recompute_fields(user, day_totals.get(str(user['id']), {}))}
+    for user in _rows(db.get_in('users', 'id', user_ids, 'id,mins_for_streak'))
+  ]
+  if not dry_run:
+    db.batch_update('users', users)
+    for user in users:
+      invalidate_user(user['id'])
+  return {'users': len(users), 'days': len(days)}
+
+
+# Batches of user ids for the rebuild jobs: the given ids, or every user paged by id.
+def user_batches(db: DBActions, user_ids: list = None, batch_size: int = IN_CHUNK_SIZE):
+  if user_ids:
+    for start in range(0, len(user_ids), batch_size):
+      yield user_ids[start:start + batch_size]
+    return
+
+  start = 0
+  while True:
+    rows = _rows(db.query('users').select('id').order('id').range(start, start + batch_size - 1).execute())
+    if rows:
+      yield [row['id'] for row in rows]
+    if len(rows) < batch_size:
+      return
+    start += batch_size
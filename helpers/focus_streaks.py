@@ -0,0 +1,112 @@
+from datetime import date, datetime, timedelta
+from django.utils import timezone
+
+
+# Focus streaks: consecutive days on which the user focused at least `mins_for_streak` minutes in total.
+# Each user keeps a compact run-length record of their qualifying days in users.focus_days, e.g.
+#
+#   [["2026-09-01", "2026-09-04"], ["2026-09-10", "2026-10-02"]]
+#
+# with `focus_streak` = the length of the latest run and `longest_focus_streak` = the longest run seen.
+# A session that makes today qualify extends or starts the latest run, which is O(1); backdated days
+# are merged into the runs. Only the latest MAX_STREAK_RUNS runs are kept, since the longest streak is
+# stored on its own. `manage.py recompute_focus_streaks` rebuilds the records from the daily rollups.
+MAX_STREAK_RUNS = 64
+DEFAULT_MINS_FOR_STREAK = 10
+
+
+def as_date(value):
+  if isinstance(value, datetime):
+    return value.date()
+  if isinstance(value, date):
+    return value
+  return date.fromisoformat(str(value)[:10])
+
+
+def _run_length(run):
+  return (as_date(run[1]) - as_date(run[0])).days + 1
+
+
+def add_day(runs: list, day: date):
+  """
+  Returns the runs with `day` marked as qualifying, and the run that now contains it.
+  The input list is not modified.
+  """
+  runs = [list(run) for run in runs or []]
+  day_iso = day.isoformat()
+  if not runs or day > as_date(runs[-1][1]) + timedelta(days=1):
+    runs.append([day_iso, day_iso])
+    return runs[-MAX_STREAK_RUNS:], runs[-1]
+  if day == as_date(runs[-1][1]) + timedelta(days=1):
+    runs[-1][1] = day_iso
+    return runs, runs[-1]
+
+  # Backdated day: merge it with the runs around it
+  merged = []
+  placed = None
+  for run in sorted(runs + [[day_iso, day_iso]], key=lambda run: run[0]):
+    if merged and as_date(run[0]) <= as_date(merged[-1][1]) + timedelta(days=1):
+      merged[-1][1] = max(merged[-1][1], run[1])
+    else:
+      merged.append(list(run))
+    if as_date(merged[-1][0]) <= day <= as_date(merged[-1][1]):
+      placed = merged[-1]
+  return merged[-MAX_STREAK_RUNS:], placed
+
+
+def runs_from_days(days) -> list:
+  # Run-length record of the given qualifying days (any order)
+  runs = []
+  for day in sorted(set(days)):
+    if runs and day == as_date(runs[-1][1]) + timedelta(days=1):
+      runs[-1][1] = day.isoformat()
+    else:
+      runs.append([day.isoformat(), day.isoformat()])
+  return runs
+
+
+def streak_fields(user: dict, day, total_before: int, total_after: int):
+  """
+  Returns the users columns to write after a session moved the day's focus time from
+  `total_before` to `total_after` minutes, or {} when the streak is unchanged.
+
+  Args:
+    user (dict): The user's mins_for_streak, longest_focus_streak and focus_days.
+  """
+  threshold = user.get('mins_for_streak') or DEFAULT_MINS_FOR_STREAK
+  if not (total_before < threshold <= total_after):
+    return {}
+
+  runs, run = add_day(user.get('focus_days') or [], as_date(day))
+  return {
+    'focus_days': runs,
+    'focus_streak': _run_length(runs[-1]),
+    'longest_focus_streak': max(user.get('longest_focus_streak') or 0, _run_length(run)),
+  }
+
+
+def recompute_fields(user: dict, day_totals: dict):
+  """
+  Rebuilds the streak columns of a user from their daily focus minutes ({date: minutes}).
+  """
+  threshold = user.get('mins_for_streak') or DEFAULT_MINS_FOR_STREAK
+  runs = runs_from_days(as_date(day) for day, minutes in day_totals.items() if minutes >= threshold)
+  return {
+    'focus_days': runs[-MAX_STREAK_RUNS:],
+    'focus_streak': _run_length(runs[-1]) if runs else 0,
+    'longest_focus_streak': max((_run_length(run) for run in runs), default=0),
+  }
+
+
+def current_streak(user: dict, today: date = None):
+  """
+  The streak to show today: the latest run counts while it ends today or yesterday.
+  """
+  runs = user.get('focus_days') or []
+  if not runs:
+    return 0
+  today = today or timezone.localdate()
+  if as_date(runs[-1][1]) < today - timedelta(days=1):
+    return 0
+  return user.get('focus_streak') or 0
+
@@ -0,0 +1,112 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from functions.cache import TTLCache
+from functions.db_actions import DBActions
+from functions.single_flight import SingleFlight
+
+
+# Reads of the users table behind the user/ and login endpoints.
+# The SPA fetches user/ on every page load, so opening several tabs or reconnecting sends bursts of
+# identical lookups; concurrent lookups of the same user share one Supabase request per worker.
+#
+# Profiles are then cached per user id: in an in-process LRU by default, or in Django's cache framework
+# when USER_CACHE_ALIAS names a CACHES alias (e.g. a shared Redis cache), so that invalidations made by
+# one gunicorn worker are seen by the others. Ids with no users row are cached too, for a shorter
+# time, so unknown or half-registered users don't reach Supabase on every request.
+# Every write of a users row must call invalidate_user (or remember_user with the new row).
+USER_CACHE_TTL = getattr(settings, 'USER_CACHE_TTL', 5 * 60)
+USER_CACHE_MISSING_TTL = getattr(settings, 'USER_CACHE_MISSING_TTL', 30)
+USER_CACHE_MAX_ENTRIES = getattr(settings, 'USER_CACHE_MAX_ENTRIES', 4096)
+USER_CACHE_ALIAS = getattr(settings, 'USER_CACHE_ALIAS', None)
+
+# Cached in place of the row of a user that doesn't exist
+MISSING = 'missing'
+
+_user_reads = SingleFlight()
+_profiles = TTLCache(maxsize=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL)
+
+# email -> user id, so login can look the profile up while the password is being checked
+_emails = TTLCache(maxsize=USER_CACHE_MAX_ENTRIES, ttl=24 * 60 * 60)
+
+# user_id -> when the profile was last invalidated, so a read that started earlier isn't cached
+_invalidated = TTLCache(maxsize=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL)
+
+
+def _profile_key(user_id):
+  return f"users:profile:{user_id}"
+
+
+def _shared_cache():
+  return caches[USER_CACHE_ALIAS] if USER_CACHE_ALIAS else None
+
+
+def _cached(user_id):
+  shared = _shared_cache()
+  if shared is not None:
+    return shared.get(_profile_key(user_id))
+  return _profiles.get(user_id)
+
+
+def _store(user_id, value):
+  if value != MISSING and value.get('email'):
+    _emails.set(value['email'].lower(), user_id)
+  ttl = USER_CACHE_MISSING_TTL if value == MISSING else USER_CACHE_TTL
+  shared = _shared_cache()
+  if shared is not None:
+    shared.set(_profile_key(user_id), value, ttl)
+  else:
+    _profiles.set(user_id, value, ttl)
+
+
+# Returns the users response for the user (its data is a list with at most one row), bypassing the cache.
+# Concurrent callers share the response, so its rows must not be modified.
+def fetch_user(user_id):
+  return _user_reads.do(str(user_id), lambda: DBActions(use_admin=True).get('users', str(user_id)))
+
+
+def get_user(user_id):
+  """
+  Returns the user's row from the users table, or None if there is none.
+  Served from the profile cache when possible; the row is shared, so it must not be modified.
+  """
+  user_id = str(user_id)
+  cached = _cached(user_id)
+  if cached is not None:
+    return None if cached == MISSING else cached
+
+  started = time.monotonic()
+  response = fetch_user(user_id)
+  row = response.data[0] if response and response.data else None
+  if response is not None and _invalidated.get(user_id, 0) < started:
+    _store(user_id, row if row is not None else MISSING)
+  return row
+
+
+# Caches the user's row after it was written, e.g. by signup (which also clears a cached miss).
+def remember_user(row: dict):
+  if row and row.get('id'):
+    _store(str(row['id']), row)
+
+
+def user_id_for_email(email):
+  return _emails.get(email.lower()) if email else None
+
+
+# Drops the cached profile of the user; call it after any write to their users row.
+def invalidate_user(user_id):
+  if not user_id:
+    return
+  user_id = str(user_id)
+  _invalidated.set(user_id, time.monotonic())
+  _user_reads.forget(lambda key: key == user_id)
+  shared = _shared_cache()
+  if shared is not None:
+    shared.delete(_profile_key(user_id))
+  else:
+    _profiles.delete(user_id)
+
+
+# Returns hit/miss counters of the in-process profile cache.
+def stats():
+  return _profiles.stats()
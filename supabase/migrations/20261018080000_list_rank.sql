@@ -0,0 +1,10 @@
+-- Fractional list ordering (functions/ranking.py, ListSerializer).
+--
+-- lists.rank is a base-36 sort key; a list sorts between its neighbours by rank alone, so moving a
+-- list rewrites only its own row. The "C" collation makes the database order ranks byte by byte,
+-- exactly as the backend compares them. Lists written before ranks existed keep an empty rank and
+-- are ranked once, on the first list write to their board (helpers/board_helpers.rebalance_list_ranks).
+alter table public.lists
+  add column if not exists rank text collate "C" not null default '';
+
+create index if not exists lists_board_id_rank_idx on public.lists (board_id, rank);
@@ -0,0 +1,51 @@
+-- Delta sync of the board tree (helpers/board_sync.py, the changes-since endpoint).
+--
+-- Boards, lists and cards carry an updated_at that changes-since filters on. The backend stamps it on
+-- every write (stamp()); the trigger below stamps it too, so rows written by anything else (the
+-- dashboard, SQL, a script) still reach synced clients instead of silently staying out of every delta.
+-- now() is the transaction start, which the sync's SYNC_OVERLAP_SECONDS window allows for.
+alter table public.boards add column if not exists updated_at timestamptz not null default now();
+alter table public.lists add column if not exists updated_at timestamptz not null default now();
+alter table public.cards add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists boards_creator_id_updated_at_idx on public.boards (creator_id, updated_at);
+create index if not exists lists_board_id_updated_at_idx on public.lists (board_id, updated_at);
+create index if not exists cards_list_id_updated_at_idx on public.cards (list_id, updated_at);
+
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+create or replace trigger boards_touch_updated_at
+  before insert or update on public.boards
+  for each row execute function public.touch_updated_at();
+create or replace trigger lists_touch_updated_at
+  before insert or update on public.lists
+  for each row execute function public.touch_updated_at();
+create or replace trigger cards_touch_updated_at
+  before insert or update on public.cards
+  for each row execute function public.touch_updated_at();
+
+-- One row per deleted board, list or card (record_deletion()). Lists and cards deleted with their
+-- board are covered by the board's tombstone.
+create table if not exists public.tombstones (
+  id uuid primary key default gen_random_uuid(),
+  table_name text not null check (table_name in ('boards', 'lists', 'cards')),
+  record_id uuid not null,
+  owner_id uuid not null references public.users (id) on delete cascade,
+  board_id uuid,
+  deleted_at timestamptz not null default now()
+);
+
+create index if not exists tombstones_owner_id_deleted_at_idx on public.tombstones (owner_id, deleted_at);
+
+-- Server-side only: the backend reads and writes tombstones with the service role key
+alter table public.tombstones enable row level security;
+revoke all on table public.tombstones from public, anon, authenticated;
+grant select, insert, delete on table public.tombstones to service_role;
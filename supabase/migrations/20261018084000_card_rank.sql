@@ -0,0 +1,10 @@
+-- Fractional card ordering within a list (functions/ranking.py, helpers/card_helpers.py).
+--
+-- Like lists.rank: moving a card gives it a rank between its new neighbours and rewrites only its own
+-- row. Cards written before ranks existed keep an empty rank until their list is first rebalanced
+-- (helpers/board_helpers.rebalance_card_ranks). Neighbour lookups compare ranks in SQL (rank > x order by
+-- rank), which is why the column uses the "C" collation.
+alter table public.cards
+  add column if not exists rank text collate "C" not null default '';
+
+create index if not exists cards_list_id_rank_idx on public.cards (list_id, rank);
@@ -0,0 +1,44 @@
+-- Partial bulk update behind DBActions.batch_update.
+--
+-- p_rows is a JSON array of objects, each with the "id" of the row to change and only the columns
+-- to write, e.g. [{"id": "...", "rank": "i"}, {"id": "...", "rank": "k", "list_id": "..."}].
+-- Unlike an upsert, a row never goes through the insert path, so columns it doesn't carry are
+-- neither checked nor touched. Rows with the same set of columns are written by one UPDATE.
+-- Returns the updated rows; ids that don't exist are skipped.
+create or replace function public.bulk_update(p_table text, p_rows jsonb)
+returns setof jsonb
+language plpgsql
+as $$
+declare
+  target regclass := format('public.%I', p_table)::regclass;
+  columns text[];
+  assignments text;
+begin
+  for columns in
+    select distinct array(select jsonb_object_keys(row_data) order by 1)
+    from jsonb_array_elements(p_rows) as row_data
+  loop
+    select string_agg(format('%I = source.%I', column_name, column_name), ', ')
+      into assignments
+      from unnest(columns) as column_name
+     where column_name <> 'id';
+    continue when assignments is null or not ('id' = any(columns));
+
+    return query execute format(
+      'update %s as target set %s
+         from jsonb_populate_recordset(null::%s, $1) as source
+        where target.id = source.id
+        returning to_jsonb(target.*)',
+      target, assignments, target
+    ) using (
+      select jsonb_agg(row_data)
+        from jsonb_array_elements(p_rows) as row_data
+       where array(select jsonb_object_keys(row_data) order by 1) = columns
+    );
+  end loop;
+end;
+$$;
+
+-- Server-side only: the backend calls it with the service role key
+revoke execute on function public.bulk_update(text, jsonb) from public, anon, authenticated;
+grant execute on function public.bulk_update(text, jsonb) to service_role;
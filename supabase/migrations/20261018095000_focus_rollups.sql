@@ -0,0 +1,25 @@
+-- Focus rollups (helpers/focus_rollups.py, core.models.FocusStat).
+--
+-- focus_stats used to hold a row per session; it now holds one row per user and day, per user and week
+-- (starting Monday) and one all-time row (period 'all', no date). Row ids are derived from
+-- (user, period, date) by the backend, which upserts on id; the unique index keeps a second row per
+-- period out even if something else writes the table.
+--
+-- The per-session rows can't be turned into rollups here (they'd collide on the new key), so they are
+-- dropped: run `python manage.py backfill_focus_rollups` after applying this migration to rebuild the
+-- rollups and the users' totals from focus_sessions.
+delete from public.focus_stats;
+
+alter table public.focus_stats
+  drop column if exists focus_session_id,
+  add column if not exists period text not null default 'day' check (period in ('day', 'week', 'all')),
+  add column if not exists updated_at timestamptz not null default now(),
+  alter column date drop default,
+  alter column date drop not null;
+
+create unique index if not exists focus_stats_user_id_period_date_key
+  on public.focus_stats (user_id, period, date) nulls not distinct;
+
+-- All-time totals, copied from the user's 'all' rollup on every session write
+alter table public.users
+  add column if not exists total_focus_sessions integer not null default 0;
@@ -0,0 +1,8 @@
+-- Run-length focus streaks (helpers/focus_streaks.py).
+--
+-- users.focus_days holds the days that reached mins_for_streak as [start, end] ISO date pairs, e.g.
+-- [["2026-10-01", "2026-10-05"], ["2026-10-07", "2026-10-07"]]; focus_streak and longest_focus_streak
+-- are derived from it. Existing users start without runs: `python manage.py recompute_focus_streaks`
+-- fills them in from the daily rollups.
+alter table public.users
+  add column if not exists focus_days jsonb not null default '[]'::jsonb;
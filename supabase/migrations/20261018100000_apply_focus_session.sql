@@ -0,0 +1,67 @@
+-- Focus session write behind helpers/focus_rollups.apply_session.
+--
+-- Inserts the session (p_session, optional: omit it to only adjust the rollups, e.g. when a session is
+-- deleted) and adds p_minutes and p_sessions to its day, week and all-time rollups in one transaction.
+-- p_rollups holds the three rollup rows as they are inserted when they don't exist yet; existing rows
+-- are incremented in place (total = total + n), so concurrent sessions of a user never lose an update.
+-- The user's total_time/total_focus_sessions are then copied from the all-time rollup.
+--
+-- Returns {"session": <inserted row or null>, "rollups": [<rows as written>], "user": <streak columns>}.
+create or replace function public.apply_focus_session(
+  p_user_id uuid,
+  p_rollups jsonb,
+  p_minutes integer,
+  p_sessions integer,
+  p_session jsonb default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+  inserted jsonb;
+  written jsonb;
+  profile jsonb;
+  columns text;
+begin
+  if p_session is not null then
+    select string_agg(format('%I', column_name), ', ')
+      into columns
+      from jsonb_object_keys(p_session) as column_name;
+    execute format(
+      'insert into public.focus_sessions (%s)
+       select %s from jsonb_populate_record(null::public.focus_sessions, $1)
+       returning to_jsonb(focus_sessions.*)',
+      columns, columns
+    ) into inserted using p_session;
+  end if;
+
+  with upserted as (
+    insert into public.focus_stats as stat (id, user_id, period, date, total_time, total_focus_sessions, updated_at)
+    select id, user_id, period, date, greatest(0, total_time), greatest(0, total_focus_sessions), updated_at
+      from jsonb_populate_recordset(null::public.focus_stats, p_rollups)
+    on conflict (id) do update set
+      total_time = greatest(0, stat.total_time + p_minutes),
+      total_focus_sessions = greatest(0, stat.total_focus_sessions + p_sessions),
+      updated_at = excluded.updated_at
+    returning stat.*
+  )
+  select jsonb_agg(to_jsonb(upserted.*)) into written from upserted;
+
+  update public.users as target
+     set total_time = totals.total_time,
+         total_focus_sessions = totals.total_focus_sessions
+    from jsonb_to_recordset(written) as totals(period text, total_time integer, total_focus_sessions integer)
+   where target.id = p_user_id and totals.period = 'all'
+  returning jsonb_build_object(
+    'mins_for_streak', target.mins_for_streak,
+    'longest_focus_streak', target.longest_focus_streak,
+    'focus_days', target.focus_days
+  ) into profile;
+
+  return jsonb_build_object('session', inserted, 'rollups', coalesce(written, '[]'::jsonb), 'user', profile);
+end;
+$$;
+
+-- Server-side only: the backend calls it with the service role key
+revoke execute on function public.apply_focus_session(uuid, jsonb, integer, integer, jsonb) from public, anon, authenticated;
+grant execute on function public.apply_focus_session(uuid, jsonb, integer, integer, jsonb) to service_role;
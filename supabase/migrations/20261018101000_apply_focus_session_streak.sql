@@ -0,0 +1,110 @@
+-- Moves the focus streak update into apply_focus_session (helpers/focus_rollups.apply_session), so a
+-- session, its rollups, the user's totals and their streak are written in one transaction.
+--
+-- When the session makes its day reach the user's mins_for_streak (default 10), the day is added to
+-- users.focus_days, the run-length record of qualifying days ([start, end] ISO date pairs, see
+-- helpers/focus_streaks.py). The runs are merged as a datemultirange, which joins adjacent days the
+-- same way focus_streaks.add_day does; only the latest p_max_streak_runs runs are kept. focus_streak
+-- becomes the length of the latest run, longest_focus_streak the longest run seen.
+--
+-- Returns {"session": <inserted row or null>, "rollups": [<rows as written>], "user": <streak columns>}.
+drop function if exists public.apply_focus_session(uuid, jsonb, integer, integer, jsonb);
+
+create or replace function public.apply_focus_session(
+  p_user_id uuid,
+  p_rollups jsonb,
+  p_minutes integer,
+  p_sessions integer,
+  p_session jsonb default null,
+  p_max_streak_runs integer default 64
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+  inserted jsonb;
+  written jsonb;
+  profile public.users%rowtype;
+  columns text;
+  day date;
+  day_total integer;
+  threshold integer;
+  runs datemultirange;
+  day_run daterange;
+begin
+  if p_session is not null then
+    select string_agg(format('%I', column_name), ', ')
+      into columns
+      from jsonb_object_keys(p_session) as column_name;
+    execute format(
+      'insert into public.focus_sessions (%s)
+       select %s from jsonb_populate_record(null::public.focus_sessions, $1)
+       returning to_jsonb(focus_sessions.*)',
+      columns, columns
+    ) into inserted using p_session;
+  end if;
+
+  with upserted as (
+    insert into public.focus_stats as stat (id, user_id, period, date, total_time, total_focus_sessions, updated_at)
+    select id, user_id, period, date, greatest(0, total_time), greatest(0, total_focus_sessions), updated_at
+      from jsonb_populate_recordset(null::public.focus_stats, p_rollups)
+    on conflict (id) do update set
+      total_time = greatest(0, stat.total_time + p_minutes),
+      total_focus_sessions = greatest(0, stat.total_focus_sessions + p_sessions),
+      updated_at = excluded.updated_at
+    returning stat.*
+  )
+  select jsonb_agg(to_jsonb(upserted.*)) into written from upserted;
+
+  -- Also locks the user's row until the transaction ends, so concurrent sessions update the streak in turn
+  update public.users as target
+     set total_time = totals.total_time,
+         total_focus_sessions = totals.total_focus_sessions
+    from jsonb_to_recordset(written) as totals(period text, total_time integer, total_focus_sessions integer)
+   where target.id = p_user_id and totals.period = 'all'
+  returning target.* into profile;
+
+  if profile.id is null then
+    return jsonb_build_object('session', inserted, 'rollups', coalesce(written, '[]'::jsonb), 'user', null);
+  end if;
+
+  select (totals.date)::date, totals.total_time
+    into day, day_total
+    from jsonb_to_recordset(written) as totals(period text, date text, total_time integer)
+   where totals.period = 'day';
+  threshold := coalesce(nullif(profile.mins_for_streak, 0), 10);
+
+  if day is not null and day_total - p_minutes < threshold and threshold <= day_total then
+    select coalesce(range_agg(daterange((run->>0)::date, (run->>1)::date, '[]')), '{}'::datemultirange)
+      into runs
+      from jsonb_array_elements(coalesce(profile.focus_days, '[]'::jsonb)) as run;
+    runs := runs + datemultirange(daterange(day, day, '[]'));
+    select run into day_run from unnest(runs) as run where run @> day;
+
+    update public.users as target
+       set focus_days = (
+             select jsonb_agg(jsonb_build_array(lower(run), upper(run) - 1) order by lower(run))
+               from (select run from unnest(runs) as run order by lower(run) desc limit p_max_streak_runs) as latest
+           ),
+           focus_streak = (select upper(run) - lower(run) from unnest(runs) as run order by lower(run) desc limit 1),
+           longest_focus_streak = greatest(coalesce(target.longest_focus_streak, 0), upper(day_run) - lower(day_run))
+     where target.id = p_user_id
+    returning target.* into profile;
+  end if;
+
+  return jsonb_build_object(
+    'session', inserted,
+    'rollups', coalesce(written, '[]'::jsonb),
+    'user', jsonb_build_object(
+      'mins_for_streak', profile.mins_for_streak,
+      'focus_streak', profile.focus_streak,
+      'longest_focus_streak', profile.longest_focus_streak,
+      'focus_days', profile.focus_days
+    )
+  );
+end;
+$$;
+
+-- Server-side only: the backend calls it with the service role key
+revoke execute on function public.apply_focus_session(uuid, jsonb, integer, integer, jsonb, integer) from public, anon, authenticated;
+grant execute on function public.apply_focus_session(uuid, jsonb, integer, integer, jsonb, integer) to service_role;